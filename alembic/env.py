@@ -9,14 +9,14 @@ from alembic import context
 # Ensure the project root is on sys.path before importing app modules
 sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
 from app.models import Base
-from app.database import settings
+from app.config import settings
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 # Ensure Alembic uses a synchronous database URL (convert from async if needed)
 db_url = None
 if settings:
-    db_url = getattr(settings, 'alembic_database_url', None) or getattr(settings, 'DATABASE_URL', None)
+    db_url = getattr(settings, 'alembic_database_url', None) or getattr(settings, 'database_url', None)
 
 if db_url:
     # Convert async driver URLs to a synchronous equivalent for Alembic
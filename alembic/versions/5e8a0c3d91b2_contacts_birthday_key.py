@@ -0,0 +1,41 @@
+"""indexed MMDD birthday key on contacts
+
+Revision ID: 5e8a0c3d91b2
+Revises: c27d5e91f4a8
+Create Date: 2026-10-16 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8a0c3d91b2'
+down_revision: Union[str, Sequence[str], None] = 'c27d5e91f4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('birthday_key', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "UPDATE contacts SET birthday_key = CAST(strftime('%m%d', birthday) AS INTEGER) "
+            "WHERE birthday IS NOT NULL"
+        )
+    else:
+        op.execute(
+            "UPDATE contacts SET birthday_key = "
+            "CAST(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) AS SMALLINT) "
+            "WHERE birthday IS NOT NULL"
+        )
+    op.create_index('ix_contacts_user_birthday_key', 'contacts', ['user_id', 'birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
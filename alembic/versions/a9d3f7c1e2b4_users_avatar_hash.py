@@ -0,0 +1,28 @@
+"""content hash of the current avatar on users
+
+Revision ID: a9d3f7c1e2b4
+Revises: e4f9a2b6c8d3
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3f7c1e2b4'
+down_revision: Union[str, Sequence[str], None] = 'e4f9a2b6c8d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'avatar_hash')
@@ -0,0 +1,28 @@
+"""per-row version counter on contacts for ETag / If-Match
+
+Revision ID: b6e1c4d8f2a7
+Revises: a9d3f7c1e2b4
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1c4d8f2a7'
+down_revision: Union[str, Sequence[str], None] = 'a9d3f7c1e2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('contacts', 'version')
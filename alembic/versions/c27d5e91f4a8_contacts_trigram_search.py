@@ -0,0 +1,47 @@
+"""Per-user pg_trgm GIN indexes for contact search
+
+Revision ID: c27d5e91f4a8
+Revises: 8b4e6d2f0a31
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27d5e91f4a8'
+down_revision: Union[str, Sequence[str], None] = '8b4e6d2f0a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # btree_gin дає GIN-оператори для user_id: (user_id, column) в одному індексі
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    # CONCURRENTLY не блокує запис у contacts, але не може виконуватися в транзакції.
+    # Якщо побудова впала, невалідний індекс треба видалити вручну перед повтором.
+    with op.get_context().autocommit_block():
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                f'ix_contacts_user_{column}_trgm', 'contacts', ['user_id', column], unique=False,
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for column in SEARCH_COLUMNS:
+            op.drop_index(f'ix_contacts_user_{column}_trgm', table_name='contacts', postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""per-user composite indexes on contacts, drop unused single-column ones
+
+Revision ID: e4f9a2b6c8d3
+Revises: 5e8a0c3d91b2
+Create Date: 2026-10-16 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f9a2b6c8d3'
+down_revision: Union[str, Sequence[str], None] = '5e8a0c3d91b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SINGLE_COLUMN_INDEXES = ('id', 'first_name', 'last_name', 'email', 'phone')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_email', 'contacts', ['user_id', 'email'], unique=False)
+    op.create_index('ix_contacts_user_phone', 'contacts', ['user_id', 'phone'], unique=False)
+    for column in SINGLE_COLUMN_INDEXES:
+        op.drop_index(op.f(f'ix_contacts_{column}'), table_name='contacts')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in SINGLE_COLUMN_INDEXES:
+        op.create_index(op.f(f'ix_contacts_{column}'), 'contacts', [column], unique=False)
+    op.drop_index('ix_contacts_user_phone', table_name='contacts')
+    op.drop_index('ix_contacts_user_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
@@ -1,71 +1,106 @@
+import asyncio
+import json
+import logging
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pydantic_settings import BaseSettings
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-import redis.asyncio as redis
-import pickle
+from redis.exceptions import RedisError
 from app.config import settings
 
 from app.database import get_db
 from app.models import User
+from app.services.cache import RedisCache, TTLCache
+from app.services.redis_pool import get_redis
+from app.services.hashing import PasswordHasher
+from app.services.metrics import count_user_cache
 import app.crud as crud
 
+logger = logging.getLogger(__name__)
 
-class Settings(BaseSettings):
-    """
-    Завантажує секрети з .env для auth.
-    """
-    SECRET_KEY: str
-    ALGORITHM: str
-    ACCESS_TOKEN_EXPIRE_MINUTES: int
-    REFRESH_TOKEN_EXPIRE_DAYS: int
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
 
-settings = Settings()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+USER_CACHE_VERSION = 2
+USER_INVALIDATION_CHANNEL = "user-cache:invalidate"
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+def dump_user_snapshot(user: User) -> bytes:
+    """
+    Серіалізує лише ті колонки User, які потрібні застосунку після автентифікації.
+    Хеш пароля в кеш не потрапляє.
+    """
+    return json.dumps(
+        {
+            "v": USER_CACHE_VERSION,
+            "id": user.id,
+            "email": user.email,
+            "confirmed": user.confirmed,
+            "avatar": user.avatar,
+            "avatar_hash": user.avatar_hash,
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def load_user_snapshot(raw: bytes) -> Optional[dict]:
+    """Розбирає знімок з dump_user_snapshot. Записи іншої версії чи формату вважаються промахом."""
+    try:
+        snapshot = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.pop("v", None) != USER_CACHE_VERSION:
+        return None
+    return snapshot
 
 
 class AuthService:
 
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=1,
-            decode_responses=False
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.redis_cache = RedisCache(redis_client)
+        # L1: знімки користувачів у пам'яті воркера, перед Redis (L2)
+        self.user_cache = TTLCache(
+            maxsize=settings.user_cache_local_size,
+            ttl=settings.user_cache_local_ttl,
         )
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Перевіряє, чи збігається пароль з хешем."""
-        return pwd_context.verify(plain_password, hashed_password)
+    @property
+    def redis_client(self):
+        # None — спільний клієнт воркера з app/services/redis_pool.py
+        return self._redis_client if self._redis_client is not None else get_redis()
 
-    def get_password_hash(self, password: str) -> str:
-        """Створює хеш пароля."""
-        return pwd_context.hash(password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Перевіряє, чи збігається пароль з хешем (у пулі потоків, не блокуючи event loop)."""
+        return await password_hasher.verify(plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str) -> str:
+        """Створює хеш пароля (у пулі потоків, не блокуючи event loop)."""
+        return await password_hasher.hash(password)
 
     def create_email_token(self, data: dict) -> str:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire})
-        # Використовуємо SECRET_KEY та ALGORITHM з settings
-        token = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        # Використовуємо secret_key та algorithm з settings
+        token = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
         return token
 
     async def get_email_from_token(self, token: str):
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
             email = payload.get("sub")
             return email
         except JWTError:
@@ -77,7 +112,7 @@ class AuthService:
         expire = datetime.now(timezone.utc) + expires_delta
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+            to_encode, settings.secret_key, algorithm=settings.algorithm
         )
         return encoded_jwt
 
@@ -88,16 +123,16 @@ class AuthService:
         expire = datetime.now(timezone.utc) + timedelta(hours=1)
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(
-            to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+            to_encode, settings.secret_key, algorithm=settings.algorithm
         )
         return encoded_jwt
 
     async def create_access_token(self, data: dict) -> str:
-        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expires_delta = timedelta(minutes=settings.access_token_expire_minutes)
         return await self.create_token(data, expires_delta)
 
     async def create_refresh_token(self, data: dict) -> str:
-        expires_delta = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        expires_delta = timedelta(days=settings.refresh_token_expire_days)
         return await self.create_token(data, expires_delta)
 
     async def decode_token(self, token: str) -> Optional[str]:
@@ -106,7 +141,7 @@ class AuthService:
         """
         try:
             payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+                token, settings.secret_key, algorithms=[settings.algorithm]
             )
             email: str = payload.get("sub")
             if email is None:
@@ -121,6 +156,14 @@ class AuthService:
                 detail="Invalid authentication credentials"
             )
 
+    def token_subject(self, token: str) -> Optional[str]:
+        """Email з валідного токена або None. Без винятків і звернень до БД/Redis — для rate limiting."""
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        except JWTError:
+            return None
+        return payload.get("sub")
+
     async def get_current_user(
             self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ) -> User:
@@ -139,21 +182,69 @@ class AuthService:
             raise credentials_exception
 
         user_key = f"user:{email}"
-        user_cache = await self.redis_client.get(user_key)
+        snapshot = self.user_cache.get(user_key)
+        if snapshot is not None:
+            return User(**snapshot)
 
+        try:
+            user_cache = await self.redis_client.get(user_key)
+        except RedisError as err:
+            # Redis недоступний або не відповів за redis_socket_timeout — читаємо з БД
+            logger.debug("User cache read failed: %s", err)
+            user_cache = None
         if user_cache:
-            user = pickle.loads(user_cache)
-            if user:
-                return user
+            snapshot = load_user_snapshot(user_cache)
+            if snapshot is not None:
+                count_user_cache(hit=True)
+                self.user_cache.set(user_key, snapshot)
+                return User(**snapshot)
+        count_user_cache(hit=False)
 
         user = await crud.get_user_by_email(db, email=email)
 
         if user is None:
             raise credentials_exception
 
-        await self.redis_client.set(user_key, pickle.dumps(user), ex=900)
+        raw = dump_user_snapshot(user)
+        try:
+            await self.redis_client.set(user_key, raw, ex=settings.user_cache_ttl)
+        except RedisError as err:
+            logger.debug("User cache write failed: %s", err)
+        self.user_cache.set(user_key, load_user_snapshot(raw))
 
         return user
 
+    async def invalidate_user(self, email: str) -> None:
+        """
+        Видаляє користувача з кешу: локально, у Redis та (через pub/sub) в L1 решти воркерів.
+        Видалення й публікація — один pipeline. Якщо Redis недоступний, запис у L2
+        доживе до user_cache_ttl (у знімку немає хеша пароля).
+        """
+        user_key = f"user:{email}"
+        self.user_cache.pop(user_key)
+        try:
+            await self.redis_cache.delete_many(
+                [user_key], channel=USER_INVALIDATION_CHANNEL, messages=[email],
+            )
+        except RedisError as err:
+            logger.warning("User cache invalidation failed for %s: %s", email, err)
+
+    async def listen_for_invalidations(self) -> None:
+        """
+        Фонова задача воркера: отримує email-и з каналу інвалідації та викидає їх з L1.
+        При обриві з'єднання перепідписується; повідомлення, пропущені за цей час,
+        покриває короткий TTL локального кешу.
+        """
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.user_cache.pop(f"user:{message['data'].decode()}")
+            except RedisError as err:
+                logger.warning("User cache invalidation listener disconnected: %s", err)
+                await asyncio.sleep(1)
+
 
 auth_service = AuthService()
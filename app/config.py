@@ -1,9 +1,35 @@
+"""
+Єдині налаштування застосунку (змінні оточення та .env).
+
+.env читається один раз, при першому зверненні до app.config.settings або
+get_settings(); сам імпорт модуля нічого не читає.
+"""
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
+
 class Settings(BaseSettings):
-    sqlalchemy_database_uri: str
+    # База даних (app/database.py)
+    database_url: str
+    # Необов'язкова репліка для читань (GET-ендпоінти контактів)
+    database_replica_url: str | None = None
+    alembic_database_url: str | None = None
+
+    # Пул з'єднань (на один процес-воркер). Для SQLite ігноруються.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # секунд очікування вільного з'єднання
+    db_pool_recycle: int = 1800  # секунд життя з'єднання
+    db_pool_pre_ping: bool = True
+    # Кеш підготовлених запитів asyncpg на з'єднання; 0 — вимкнено (потрібно за pgbouncer у transaction mode)
+    db_statement_cache_size: int = 100
+
+    # JWT (app/auth.py)
     secret_key: str
     algorithm: str
+    access_token_expire_minutes: int
+    refresh_token_expire_days: int
 
     # Mail
     mail_username: str
@@ -11,10 +37,98 @@ class Settings(BaseSettings):
     mail_from: str
     mail_port: int
     mail_server: str
+    mail_from_name: str = "GoIT Homework"
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_use_credentials: bool = True
+    mail_validate_certs: bool = True
 
-    # Redis
+    # Поштовий воркер (app/services/mail_worker.py)
+    mail_worker_connections: int = 2  # постійних SMTP-з'єднань у пулі
+    mail_worker_batch_size: int = 20  # листів, що забираються з черги за раз
+    mail_max_attempts: int = 5  # після цього лист іде в dead-letter
+    mail_retry_base_delay: float = 5.0  # секунд; подвоюється з кожною спробою
+    mail_retry_max_delay: float = 900.0
+    mail_worker_heartbeat_ttl: int = 30  # секунд; задачі воркера без heartbeat забирає інший воркер
+
+    # Redis: один пул з'єднань на воркер (app/services/redis_pool.py)
     redis_host: str = "localhost"
     redis_port: int = 6379
+    redis_db: int = 0
+    redis_max_connections: int = 32
+    redis_pool_timeout: float = 1.0  # секунд очікування вільного з'єднання, коли всі зайняті
+    redis_socket_timeout: float = 0.5  # секунд на відповідь; кеші вважають таймаут промахом
+    redis_socket_connect_timeout: float = 0.5
+    redis_health_check_interval: int = 30  # з'єднання, що простояло довше, перевіряється PING
+
+    # Кеш користувачів для AuthService.get_current_user
+    user_cache_ttl: int = 900  # секунд у Redis
+    user_cache_local_size: int = 10_000  # записів у in-process LRU кожного воркера
+    user_cache_local_ttl: int = 30  # секунд; верхня межа застарілості, якщо pub/sub-повідомлення загубилось
+
+    # Кеш читань контактів (app/services/cache.py, ContactsCache)
+    contacts_cache_enabled: bool = True
+    contacts_cache_ttl: int = 300  # секунд
+    contacts_cache_max_entry_bytes: int = 256 * 1024
+
+    # Списки контактів: кортежі колонок + orjson замість ORM-об'єктів і валідації ContactResponse
+    contacts_fast_serialization: bool = False
+
+    # Скільки секунд після запису читання користувача йдуть на primary замість репліки
+    replica_read_after_write_seconds: int = 5
+
+    # bcrypt виконується в окремому пулі потоків (app/services/hashing.py)
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
+
+    # Rate limiting (app/services/rate_limit.py): "запитів/секунд" або "off".
+    # Ключі rate_limits — "МЕТОД шаблон-шляху"; решта маршрутів отримує rate_limit_default.
+    rate_limit_enabled: bool = True
+    rate_limit_default: str = "120/60"
+    rate_limits: dict[str, str] = {
+        "POST /api/contacts/": "10/60",
+        "POST /api/contacts/import": "5/60",
+        "GET /api/contacts/export": "5/60",
+        "POST /api/auth/register": "5/60",
+        "POST /api/auth/login": "10/60",
+        "POST /api/auth/request_reset_password": "5/300",
+        "PATCH /api/auth/avatar": "10/60",
+        "GET /api/users/{user_id}/avatar": "600/60",
+        "GET /": "off",
+        "GET /metrics": "off",
+    }
+    rate_limit_sync_interval: float = 1.0  # секунд між синхронізаціями з Redis
+    # Анонімні маршрути рахуються по обліковому запису з тіла запиту (поле форми/JSON),
+    # а не по IP: за NAT чи проксі всі клієнти мали б один bucket. Додатково на IP діє
+    # rate_limit_default, щоб один клієнт не перебирав облікові записи без обмежень.
+    rate_limit_account_fields: dict[str, str] = {
+        "POST /api/auth/login": "username",
+        "POST /api/auth/register": "email",
+        "POST /api/auth/request_reset_password": "email",
+    }
+    # Маршрути, де ключ — пара (обліковий запис, IP). Для входу інакше будь-хто заблокував би
+    # вхід чужому акаунту кількома запитами на хвилину. Реєстрація й скидання пароля лишаються
+    # по обліковому запису: там ліміт захищає скриньку від потоку листів з різних адрес.
+    rate_limit_account_ip_routes: list[str] = ["POST /api/auth/login"]
+    # Адреси/мережі reverse proxy (напр. ["10.0.0.0/8"]). Лише від них береться
+    # X-Forwarded-For — найправіша адреса, що не є проксі; інакше IP — адреса з'єднання.
+    # Порожньо — заголовок ігнорується (його може підробити клієнт). Альтернатива —
+    # uvicorn --forwarded-allow-ips=<проксі>: тоді request.client вже містить адресу клієнта.
+    rate_limit_trusted_proxies: list[str] = []
+
+    # Масові зміна/видалення за фільтром: більше рядків — 422 без змін (ids і так обмежені схемою)
+    contacts_bulk_max_rows: int = 10_000
+
+    # Масовий імпорт контактів
+    contacts_import_batch_size: int = 1000
+    contacts_import_max_errors: int = 1000
+    contacts_import_max_line_bytes: int = 64 * 1024  # довший рядок — помилка рядка, у пам'ять не читається
+
+    # Аватари (app/services/avatars.py)
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_storage: str = "cloudinary"  # "cloudinary" або "local"
+    avatar_local_dir: str = "media/avatars"
+    avatar_cache_max_age: int = 3600  # секунд для Cache-Control на GET /api/users/{id}/avatar
 
     # Cloudinary
     cloudinary_name: str
@@ -26,4 +140,14 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         extra = "ignore"
 
-settings = Settings()
\ No newline at end of file
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # `from app.config import settings` створює Settings лише тоді, коли модуль справді його імпортує
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,32 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_, extract, and_
+from sqlalchemy import or_, and_, tuple_, func, insert, update, delete, any_, bindparam, Integer, Row
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import date, timedelta
-from typing import List, Optional
+from typing import Any, AsyncIterator, Collection, Iterable, List, Optional, Sequence, Set, Tuple, Union
+import base64
+import calendar
+import json
 
-from app.models import Contact, User
-from app.schemas import ContactCreate, ContactUpdate
+from app.models import Contact, User, birthday_key_for
+from app.schemas import ContactCreate, ContactUpdate, ContactSelector, ContactBulkChanges, ContactResponse
+from app import database
+from app.services.cache import contacts_cache, recent_writes
 
 
+async def _contacts_changed(user: User) -> None:
+    """
+    Викликається після кожного запису контактів: вмикає read-your-writes і інвалідує кеш читань.
+    Позначка й bump — один pipeline, позначка в ньому першою: читання, що побачило нову
+    версію, вже йде на primary.
+    """
+    await contacts_cache.bump(user.id, recent_writes if database.ReplicaSessionLocal is not None else None)
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """Отримує користувача за id."""
+    return await db.get(User, user_id)
+
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Отримує користувача за email."""
@@ -39,14 +58,56 @@ async def get_contact_by_email_or_phone(db: AsyncSession, email: str, phone: str
 
 
 async def create_contact(db: AsyncSession, contact: ContactCreate, user: User) -> Contact:
-    """Створює новий контакт, прив'язаний до користувача."""
-    db_contact = Contact(**contact.model_dump(), user_id=user.id)  # Прив'язка до user.id
-    db.add(db_contact)
+    """Створює новий контакт, прив'язаний до користувача. Один INSERT ... RETURNING замість INSERT + SELECT."""
+    values = contact.model_dump()
+    values["birthday_key"] = birthday_key_for(values["birthday"])
+    result = await db.execute(
+        insert(Contact).values(**values, user_id=user.id).returning(Contact)  # Прив'язка до user.id
+    )
+    db_contact = result.scalar_one()
     await db.commit()
-    await db.refresh(db_contact)
+    await _contacts_changed(user)
     return db_contact
 
 
+async def get_existing_contact_keys(
+        db: AsyncSession, emails: Iterable[str], phones: Iterable[str], user: User
+) -> Tuple[Set[str], Set[str]]:
+    """Одним запитом повертає, які з email-ів і телефонів уже є серед контактів користувача."""
+    emails, phones = list(emails), list(phones)
+    if not emails and not phones:
+        return set(), set()
+    result = await db.execute(
+        select(Contact.email, Contact.phone).where(
+            and_(
+                Contact.user_id == user.id,
+                or_(Contact.email.in_(emails), Contact.phone.in_(phones)),
+            )
+        )
+    )
+    existing_emails, existing_phones = set(), set()
+    for email, phone in result.all():
+        existing_emails.add(email)
+        existing_phones.add(phone)
+    return existing_emails, existing_phones
+
+
+async def bulk_create_contacts(db: AsyncSession, contacts: List[ContactCreate], user: User) -> int:
+    """Вставляє пачку контактів багаторядковим INSERT в одній транзакції. Повертає кількість рядків."""
+    if not contacts:
+        return 0
+    rows = []
+    for contact in contacts:
+        row = contact.model_dump()
+        row["birthday_key"] = birthday_key_for(row["birthday"])
+        row["user_id"] = user.id
+        rows.append(row)
+    await db.execute(insert(Contact), rows)
+    await db.commit()
+    await _contacts_changed(user)
+    return len(rows)
+
+
 async def get_contact(db: AsyncSession, contact_id: int, user: User) -> Optional[Contact]:
     """Отримує контакт за ID, але тільки якщо він належить користувачу."""
     result = await db.execute(
@@ -57,85 +118,294 @@ async def get_contact(db: AsyncSession, contact_id: int, user: User) -> Optional
     return result.scalars().first()
 
 
-async def get_contacts(db: AsyncSession, skip: int, limit: int, user: User) -> List[Contact]:
-    """Отримує список всіх контактів, що належать користувачу."""
-    result = await db.execute(
-        select(Contact).where(Contact.user_id == user.id).offset(skip).limit(limit)
+def encode_cursor(last_name: str, first_name: str, contact_id: int) -> str:
+    """Пакує ключ сортування останнього контакту сторінки у непрозорий курсор."""
+    raw = json.dumps([last_name, first_name, contact_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    """Розпаковує курсор з encode_cursor. Кидає ValueError, якщо курсор пошкоджений."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_name, first_name, contact_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as err:
+        raise ValueError("Invalid cursor") from err
+    if not isinstance(contact_id, int):
+        raise ValueError("Invalid cursor")
+    return last_name, first_name, contact_id
+
+
+def contact_columns(names: Iterable[str]) -> tuple:
+    """Колонки Contact за іменами — для вузьких select у get_contacts / search_contacts / get_upcoming_birthdays."""
+    return tuple(getattr(Contact, name) for name in names)
+
+
+# Колонки ContactResponse у порядку полів схеми: для читань кортежами без ORM-об'єктів
+RESPONSE_COLUMNS = contact_columns(ContactResponse.model_fields)
+
+
+def _select_contacts(columns: Optional[Sequence[Any]]):
+    return select(*columns) if columns else select(Contact)
+
+
+async def _fetch_contacts(db: AsyncSession, stmt, columns: Optional[Sequence[Any]]) -> Sequence[Union[Contact, Row]]:
+    result = await db.execute(stmt)
+    return result.all() if columns else result.scalars().all()
+
+
+async def get_contacts(
+        db: AsyncSession,
+        skip: int,
+        limit: int,
+        user: User,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[Any]] = None,
+) -> Sequence[Union[Contact, Row]]:
+    """
+    Отримує список контактів, що належать користувачу, впорядкований за (last_name, first_name, id).
+    Якщо передано cursor, використовується keyset-пагінація (skip ігнорується):
+    запит читає індекс ix_contacts_user_name_id одразу з потрібного місця, тому
+    вартість сторінки не залежить від її глибини.
+    З columns повертаються рядки-кортежі лише цих колонок замість об'єктів Contact
+    (так само в search_contacts і get_upcoming_birthdays).
+    """
+    stmt = _select_contacts(columns).where(Contact.user_id == user.id)
+    if cursor is not None:
+        stmt = stmt.where(
+            tuple_(Contact.last_name, Contact.first_name, Contact.id) > tuple_(*decode_cursor(cursor))
+        )
+    else:
+        stmt = stmt.offset(skip)
+    stmt = stmt.order_by(Contact.last_name, Contact.first_name, Contact.id).limit(limit)
+    return await _fetch_contacts(db, stmt, columns)
+
+
+EXPORT_COLUMNS = ("id", "first_name", "last_name", "email", "phone", "birthday", "additional_data")
+
+
+async def stream_contact_rows(
+        db: AsyncSession, user: User, batch_size: int = 1000
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Потоково віддає контакти користувача пачками кортежів (колонки EXPORT_COLUMNS).
+    На PostgreSQL використовується серверний курсор, тож у пам'яті лише одна пачка;
+    ORM-об'єкти не створюються.
+    """
+    columns = [getattr(Contact, name) for name in EXPORT_COLUMNS]
+    result = await db.stream(
+        select(*columns)
+        .where(Contact.user_id == user.id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
     )
-    return result.scalars().all()
+    async for partition in result.partitions():
+        yield partition
+
+
+def _contact_condition(contact_id: int, user: User, expected_versions: Optional[Collection[int]]):
+    condition = and_(Contact.id == contact_id, Contact.user_id == user.id)
+    if expected_versions is not None:
+        condition = and_(condition, Contact.version.in_(expected_versions))
+    return condition
 
 
 async def update_contact(
-        db: AsyncSession, contact_id: int, contact_update: ContactUpdate, user: User
+        db: AsyncSession,
+        contact_id: int,
+        contact_update: ContactUpdate,
+        user: User,
+        expected_versions: Optional[Collection[int]] = None,
 ) -> Optional[Contact]:
-    """Оновлює контакт, якщо він належить користувачу."""
-    db_contact = await get_contact(db, contact_id, user)
-    if db_contact:
-        update_data = contact_update.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_contact, key, value)
+    """
+    Оновлює контакт, якщо він належить користувачу. Один UPDATE ... RETURNING.
+    З expected_versions (з If-Match) оновлення відбувається лише за збігу версії рядка;
+    інакше повертається None, як і для відсутнього контакту.
+    """
+    update_data = contact_update.model_dump(exclude_unset=True)
+    if not update_data:
+        db_contact = await get_contact(db, contact_id, user)
+        if db_contact is not None and expected_versions is not None and db_contact.version not in expected_versions:
+            return None
+        return db_contact
+    if "birthday" in update_data:
+        update_data["birthday_key"] = birthday_key_for(update_data["birthday"])
 
+    result = await db.execute(
+        update(Contact)
+        .where(_contact_condition(contact_id, user, expected_versions))
+        .values(**update_data, version=Contact.version + 1)
+        .returning(Contact)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    db_contact = result.scalar_one_or_none()
+    if db_contact:
         await db.commit()
-        await db.refresh(db_contact)
+        await _contacts_changed(user)
     return db_contact
 
 
-async def delete_contact(db: AsyncSession, contact_id: int, user: User) -> Optional[Contact]:
-    """Видаляє контакт, якщо він належить користувачу."""
-    db_contact = await get_contact(db, contact_id, user)  # Використовує вже захищену функцію
+async def delete_contact(
+        db: AsyncSession, contact_id: int, user: User, expected_versions: Optional[Collection[int]] = None
+) -> Optional[Contact]:
+    """Видаляє контакт, якщо він належить користувачу (і має одну з expected_versions). Один DELETE ... RETURNING."""
+    result = await db.execute(
+        delete(Contact)
+        .where(_contact_condition(contact_id, user, expected_versions))
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    db_contact = result.scalar_one_or_none()
     if db_contact:
-        await db.delete(db_contact)
         await db.commit()
+        await _contacts_changed(user)
     return db_contact
 
 
-async def search_contacts(db: AsyncSession, query: str, user: User) -> List[Contact]:
-    """Пошук серед контактів, що належать користувачу."""
-    search = f"%{query}%"
+def _selector_condition(db: AsyncSession, selector: ContactSelector, user: User, max_rows: Optional[int] = None):
+    """
+    WHERE для масових операцій; завжди обмежений контактами користувача.
+    Фільтр може вибрати всю адресну книгу, тож з max_rows він відбирає не більше
+    max_rows + 1 рядків — перевищення видно за RETURNING, а робота запиту обмежена.
+    """
+    conditions = [Contact.user_id == user.id]
+    if selector.ids:
+        if db.get_bind().dialect.name == "postgresql":
+            # Один параметр-масив замість IN з тисячами плейсхолдерів
+            conditions.append(Contact.id == any_(bindparam("ids", selector.ids, type_=ARRAY(Integer))))
+        else:
+            conditions.append(Contact.id.in_(selector.ids))
+    if selector.filter:
+        for key, value in selector.filter.model_dump(exclude_none=True).items():
+            conditions.append(getattr(Contact, key) == value)
+        if max_rows is not None:
+            limited = select(Contact.id).where(*conditions).limit(max_rows + 1)
+            return and_(Contact.user_id == user.id, Contact.id.in_(limited))
+    return and_(*conditions)
+
+
+async def _check_bulk_rows(db: AsyncSession, ids: List[int], max_rows: Optional[int]) -> None:
+    if max_rows is not None and len(ids) > max_rows:
+        await db.rollback()
+        raise ValueError(f"Selection matches more than {max_rows} contacts")
+
+
+async def bulk_update_contacts(
+        db: AsyncSession,
+        selector: ContactSelector,
+        changes: ContactBulkChanges,
+        user: User,
+        max_rows: Optional[int] = None,
+) -> List[int]:
+    """
+    Оновлює всі вибрані контакти користувача одним UPDATE ... RETURNING. Повертає змінені id.
+    Якщо фільтр вибрав більше max_rows контактів — відкат і ValueError.
+    """
+    values = changes.model_dump(exclude_unset=True)
+    if "birthday" in values:
+        values["birthday_key"] = birthday_key_for(values["birthday"])
     result = await db.execute(
-        select(Contact).where(
-            and_(
-                Contact.user_id == user.id,
-                or_(
-                    Contact.first_name.ilike(search),
-                    Contact.last_name.ilike(search),
-                    Contact.email.ilike(search),
-                )
-            )
-        )
+        update(Contact)
+        .where(_selector_condition(db, selector, user, max_rows))
+        .values(**values, version=Contact.version + 1)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
     )
-    return result.scalars().all()
+    ids = list(result.scalars().all())
+    await _check_bulk_rows(db, ids, max_rows)
+    await db.commit()
+    if ids:
+        await _contacts_changed(user)
+    return ids
 
 
-async def get_upcoming_birthdays(db: AsyncSession, user: User) -> List[Contact]:
-    """Дні народження серед контактів, що належать користувачу."""
-    today = date.today()
-    end_date = today + timedelta(days=7)
+async def bulk_delete_contacts(
+        db: AsyncSession, selector: ContactSelector, user: User, max_rows: Optional[int] = None
+) -> List[int]:
+    """
+    Видаляє всі вибрані контакти користувача одним DELETE ... RETURNING. Повертає видалені id.
+    Якщо фільтр вибрав більше max_rows контактів — відкат і ValueError.
+    """
+    result = await db.execute(
+        delete(Contact)
+        .where(_selector_condition(db, selector, user, max_rows))
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = list(result.scalars().all())
+    await _check_bulk_rows(db, ids, max_rows)
+    await db.commit()
+    if ids:
+        await _contacts_changed(user)
+    return ids
 
-    birthday_month = extract('month', Contact.birthday)
-    birthday_day = extract('day', Contact.birthday)
 
-    if today.month == end_date.month:
-        condition = and_(
-            birthday_month == today.month,
-            birthday_day >= today.day,
-            birthday_day <= end_date.day
-        )
-    else:
-        condition_this_month = and_(
-            birthday_month == today.month,
-            birthday_day >= today.day
+async def search_contacts(
+        db: AsyncSession, query: str, user: User, limit: int = 50, columns: Optional[Sequence[Any]] = None
+) -> Sequence[Union[Contact, Row]]:
+    """
+    Пошук серед контактів, що належать користувачу.
+    На PostgreSQL умову user_id AND ILIKE обслуговують GIN-індекси (user_id, колонка
+    gin_trgm_ops), а результати сортуються за схожістю (pg_trgm similarity), тож
+    найкращі збіги йдуть першими. Запит коротший за 3 символи не дає trigram'ів:
+    тоді план іде індексом по user_id і перевіряє лише рядки цього користувача.
+    На інших СУБД (SQLite у тестах) — простий ILIKE без ранжування.
+    """
+    search = f"%{query}%"
+    stmt = _select_contacts(columns).where(
+        and_(
+            Contact.user_id == user.id,
+            or_(
+                Contact.first_name.ilike(search),
+                Contact.last_name.ilike(search),
+                Contact.email.ilike(search),
+            )
         )
-        condition_next_month = and_(
-            birthday_month == end_date.month,
-            birthday_day <= end_date.day
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        rank = func.greatest(
+            func.similarity(Contact.first_name, query),
+            func.similarity(Contact.last_name, query),
+            func.similarity(Contact.email, query),
         )
-        condition = or_(condition_this_month, condition_next_month)
+        stmt = stmt.order_by(rank.desc(), Contact.id)
+    else:
+        stmt = stmt.order_by(Contact.id)
+    return await _fetch_contacts(db, stmt.limit(limit), columns)
+
+
+async def get_upcoming_birthdays(
+        db: AsyncSession, user: User, days: int = 7, columns: Optional[Sequence[Any]] = None
+) -> Sequence[Union[Contact, Row]]:
+    """
+    Дні народження серед контактів, що належать користувачу, на найближчі `days` днів
+    (включно з сьогоднішнім). Запит — діапазон по індексу (user_id, birthday_key);
+    якщо вікно переходить через новий рік, діапазон розбивається на два.
+    Народжені 29 лютого в невисокосний рік святкують 28 лютого.
+    """
+    today = date.today()
+    if days >= 365:
+        condition = Contact.birthday_key.is_not(None)
+        start_key = birthday_key_for(today)
+    else:
+        end_date = today + timedelta(days=days)
+        start_key = birthday_key_for(today)
+        end_key = birthday_key_for(end_date)
+        if end_key == 228 and not calendar.isleap(end_date.year):
+            end_key = 229
+
+        if start_key <= end_key:
+            condition = Contact.birthday_key.between(start_key, end_key)
+        else:
+            condition = or_(Contact.birthday_key >= start_key, Contact.birthday_key <= end_key)
 
     final_condition = and_(Contact.user_id == user.id, condition)
 
-    result = await db.execute(select(Contact).where(final_condition))
-    return result.scalars().all()
+    # Спершу дні народження цього року, потім — ті, що після переходу через 31 грудня
+    stmt = _select_contacts(columns).where(final_condition).order_by(
+        Contact.birthday_key < start_key, Contact.birthday_key
+    )
+    return await _fetch_contacts(db, stmt, columns)
 
 async def confirm_email(email: str, db: AsyncSession) -> None:
     """Підтверджує електронну пошту користувача, встановлюючи прапорець confirmed = True."""
@@ -144,11 +414,14 @@ async def confirm_email(email: str, db: AsyncSession) -> None:
         user.confirmed = True
         await db.commit()
 
-async def update_avatar_url(email: str, url: str, db: AsyncSession) -> Optional[User]:
-    """Оновлює посилання на аватар користувача."""
+async def update_avatar_url(
+        email: str, key: str, db: AsyncSession, avatar_hash: Optional[str] = None
+) -> Optional[User]:
+    """Оновлює ключ аватара у сховищі (app/services/avatars.py) та хеш файлу, з якого його отримано."""
     user = await get_user_by_email(db, email)
     if user:
-        user.avatar = url
+        user.avatar = key
+        user.avatar_hash = avatar_hash
         await db.commit()
         await db.refresh(user)
     return user
@@ -1,29 +1,78 @@
-from pydantic_settings import BaseSettings
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
+from app.config import get_settings
+from app.services.metrics import instrument_queries
+from app.services.pool_metrics import PoolMetrics, forget, instrument_engine
 
-class Settings(BaseSettings):
-    """
-    Класс для загрузки настроек из .env файла.
-    """
-    DATABASE_URL: str
-    alembic_database_url: str | None = None
 
-    class Config:
-        env_file = ".env"
-        env_file_encoding = "utf-8"
-        extra = "ignore"
+def engine_options(url: str) -> dict:
+    """Параметри create_async_engine з налаштувань, з урахуванням драйвера."""
+    settings = get_settings()
+    url = make_url(url)
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+        }
+    return options
+
+
+# Engine'и створюються не при імпорті, а в lifespan застосунку (connect()) або при
+# першій сесії — імпорт не тягне драйвер БД і не читає налаштування пулу.
+engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+pool_metrics: Optional[PoolMetrics] = None
+replica_engine: Optional[AsyncEngine] = None
+ReplicaSessionLocal: Optional[async_sessionmaker] = None
+replica_pool_metrics: Optional[PoolMetrics] = None
+
 
+def connect() -> None:
+    """Створює engine'и primary і (якщо задано database_replica_url) репліки. Повторний виклик нічого не робить."""
+    global engine, AsyncSessionLocal, pool_metrics, replica_engine, ReplicaSessionLocal, replica_pool_metrics
+    if engine is not None:
+        return
+    settings = get_settings()
+    engine = create_async_engine(settings.database_url, **engine_options(settings.database_url))
+    pool_metrics = instrument_engine(engine, "primary")
+    instrument_queries(engine)
+    AsyncSessionLocal = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
 
-settings = Settings()
+    if settings.database_replica_url:
+        replica_engine = create_async_engine(
+            settings.database_replica_url, **engine_options(settings.database_replica_url)
+        )
+        replica_pool_metrics = instrument_engine(replica_engine, "replica")
+        instrument_queries(replica_engine)
+        ReplicaSessionLocal = async_sessionmaker(
+            replica_engine, class_=AsyncSession, expire_on_commit=False
+        )
 
-engine = create_async_engine(settings.DATABASE_URL)
 
-AsyncSessionLocal = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+async def dispose() -> None:
+    """Закриває пули з'єднань (завершення lifespan)."""
+    global engine, AsyncSessionLocal, pool_metrics, replica_engine, ReplicaSessionLocal, replica_pool_metrics
+    for current in (engine, replica_engine):
+        if current is not None:
+            forget(current)
+            await current.dispose()
+    engine = AsyncSessionLocal = pool_metrics = None
+    replica_engine = ReplicaSessionLocal = replica_pool_metrics = None
+
 
 Base = declarative_base()
 
@@ -32,5 +81,28 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Зависимость (dependency) FastAPI для получения сессии базы данных.
     """
+    if AsyncSessionLocal is None:
+        connect()
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        try:
+            yield session
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+
+
+async def get_replica_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Сесія до репліки для читань. Без DATABASE_REPLICA_URL — звичайна сесія до primary.
+    Рішення, чи можна читати з репліки конкретному користувачу, приймає get_read_db у роутері.
+    """
+    if AsyncSessionLocal is None:
+        connect()
+    session_factory = ReplicaSessionLocal or AsyncSessionLocal
+    metrics = replica_pool_metrics or pool_metrics
+    async with session_factory() as session:
+        try:
+            yield session
+        except exc.TimeoutError:
+            metrics.timeouts += 1
+            raise
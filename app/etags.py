@@ -0,0 +1,30 @@
+from typing import Optional
+
+
+def _parse_etags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True, якщо If-None-Match збігається з etag (слабке порівняння, RFC 9110 13.1.2)."""
+    if not header:
+        return False
+    tags = _parse_etags(header)
+    return "*" in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+
+
+def parse_if_match(header: Optional[str]) -> Optional[list[str]]:
+    """
+    Сильні теги з If-Match. None — умови немає (заголовок відсутній або "*");
+    слабкі теги відкидаються, бо If-Match порівнює лише сильно (RFC 9110 13.1.1).
+    """
+    if not header:
+        return None
+    tags = _parse_etags(header)
+    if "*" in tags:
+        return None
+    return [tag for tag in tags if not tag.startswith("W/")]
@@ -1,18 +1,73 @@
-import os
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-import redis.asyncio as redis
-from fastapi_limiter import FastAPILimiter
+from redis.exceptions import RedisError
 
+from app import database
 from app.config import settings
+from app.auth import auth_service, password_hasher
+from app.middleware import BodySizeLimitMiddleware, RateLimitHeadersMiddleware
+from app.services import redis_pool
+from app.services.rate_limit import SubjectResolver, rate_limit_dependency, rate_limiter
+from app.services.avatars import get_avatar_storage
+from app.services.metrics import MetricsMiddleware, metrics_payload
+from app.services.metrics import snapshots as metrics_snapshots, store as metrics_store
 from app.router_contacts import router as contacts_router
 from app.router_auth import router as auth_router
+from app.router_users import router as users_router
+
+
+enforce_rate_limit = rate_limit_dependency(rate_limiter, SubjectResolver(
+    auth_service.token_subject,
+    account_fields=settings.rate_limit_account_fields,
+    account_ip_routes=settings.rate_limit_account_ip_routes,
+    trusted_proxies=settings.rate_limit_trusted_proxies,
+))
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Старт і зупинка воркера. Пули БД і Redis і сховище аватарів створюються тут, а не при
+    імпорті, тож імпорт застосунку не тягне драйвер БД і SDK Cloudinary.
+    Пул Redis відкриває з'єднання при першій команді й закривається тут останнім.
+    """
+    database.connect()
+    redis_pool.connect()
+    get_avatar_storage()
+    app.state.user_invalidation_listener = asyncio.create_task(auth_service.listen_for_invalidations())
+    if rate_limiter.enabled:
+        app.state.rate_limit_sync = asyncio.create_task(rate_limiter.run_sync_loop())
+    if metrics_snapshots is not None:
+        app.state.metrics_flush = asyncio.create_task(metrics_snapshots.run_flush_loop())
+
+    yield
+
+    for name in ("user_invalidation_listener", "rate_limit_sync", "metrics_flush"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    if rate_limiter.enabled:
+        # Віддаємо в спільні лічильники витрату за останній інтервал
+        with contextlib.suppress(RedisError):
+            await rate_limiter.sync()
+    password_hasher.shutdown()
+    if metrics_snapshots is not None:
+        metrics_snapshots.flush()
+    await database.dispose()
+    await redis_pool.close()
 
 
 app = FastAPI(
     title="Contacts API",
     description="API для управління телефонною книгою",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Ліміти для всіх маршрутів; значення по маршрутах — settings.rate_limits
+    dependencies=[Depends(enforce_rate_limit)],
 )
 
 
@@ -30,27 +85,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-@app.on_event("startup")
-async def startup():
-    if os.getenv("DISABLE_RATE_LIMITER") == "1":
-        # Skip Redis/FastAPILimiter initialization in tests or when explicitly disabled
-        return
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True
-    )
-
-    await FastAPILimiter.init(r)
+app.add_middleware(RateLimitHeadersMiddleware)
+# Запас понад сам файл на multipart-заголовки та межі частин
+app.add_middleware(BodySizeLimitMiddleware, limits={"/api/auth/avatar": settings.avatar_max_bytes + 64 * 1024})
+# Доданий останнім, тобто зовнішній: латентність включає решту middleware
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(auth_router, prefix="/api")
 app.include_router(contacts_router, prefix="/api")
+app.include_router(users_router, prefix="/api")
 
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Contacts API!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Метрики у форматі Prometheus (див. app/services/metrics.py).
+    Знімок береться на event loop, файли й рендеринг — у потоці.
+    """
+    body, content_type = await asyncio.to_thread(metrics_payload, metrics_store.snapshot())
+    return Response(body, media_type=content_type)
@@ -0,0 +1,93 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """
+    Обмежує розмір тіла запиту для окремих шляхів ще під час читання потоку,
+    до того як multipart-парсер збереже файл на диск.
+    """
+
+    def __init__(self, app: ASGIApp, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(
+                {"detail": "Request body too large"},
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI прокидає HTTPException з читання тіла як є
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail="Request body too large",
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Додає RateLimit-* заголовки з request.state.rate_limit (див. app/services/rate_limit.py)
+    до будь-якої відповіді, зокрема тих, що ендпоінт повертає як готовий Response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+
+        async def send_with_headers(message: Message) -> None:
+            decision = state.get("rate_limit")
+            if message["type"] == "http.response.start" and decision is not None:
+                headers = MutableHeaders(scope=message)
+                for name, value in decision.headers().items():
+                    if name not in headers:
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """
+    Шаблон шляху маршруту з префіксами include_router, напр. "/api/contacts/{contact_id}".
+    route.path у FastAPI не містить префіксу, з яким роутер підключено, тому префікс
+    береться з фактичного шляху: все, що передує відрендереному route.path.
+    None — маршрут не знайдено (404).
+    """
+    route = scope.get("route")
+    if route is None:
+        return None
+    path = scope["path"]
+    rendered = route.path_format.format(**scope.get("path_params", {}))
+    if rendered and path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + route.path
+    return route.path
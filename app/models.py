@@ -1,8 +1,18 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, ForeignKey, Boolean, Index
+from sqlalchemy.orm import relationship, validates
 from app.database import Base
 
 
+def birthday_key_for(birthday: Optional[date]) -> Optional[int]:
+    """Ключ дня народження у форматі MMDD (напр. 1 березня -> 301), незалежний від року."""
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
 class User(Base):
     """
     Модель SQLAlchemy для користувача.
@@ -17,6 +27,8 @@ class User(Base):
 
     confirmed = Column(Boolean, nullable=False, default=False)
     avatar = Column(String(255), nullable=True)
+    # sha256 вихідного файлу аватара: однаковий файл повторно не завантажується
+    avatar_hash = Column(String(64), nullable=True)
 
 
 class Contact(Base):
@@ -25,17 +37,45 @@ class Contact(Base):
     """
     __tablename__ = "contacts"
 
-    id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String, index=True)
-    last_name = Column(String, index=True)
-    email = Column(String, index=True)
-    phone = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    first_name = Column(String)
+    last_name = Column(String)
+    email = Column(String)
+    phone = Column(String)
     birthday = Column(Date)
+    # Похідне від birthday (MMDD), синхронізується в validates нижче; обслуговує crud.get_upcoming_birthdays
+    birthday_key = Column(SmallInteger, nullable=True)
     additional_data = Column(String, nullable=True)
+    # Лічильник змін рядка: збільшується кожним UPDATE у crud, з нього будується ETag контакту
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # --- Нове поле ---
     # Зовнішній ключ, що посилається на 'users.id'
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     # Зв'язок: контакт належить одному користувачеві
-    user = relationship("User", back_populates="contacts")
\ No newline at end of file
+    user = relationship("User", back_populates="contacts")
+
+    @validates("birthday")
+    def _sync_birthday_key(self, key, value):
+        self.birthday_key = birthday_key_for(value)
+        return value
+
+    # Усі запити в crud обмежені user_id, тому індекси складені й починаються з нього
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_email", "user_id", "email"),
+        Index("ix_contacts_user_phone", "user_id", "phone"),
+        # Покриває сортування та keyset-пагінацію в crud.get_contacts
+        Index("ix_contacts_user_name_id", "user_id", "last_name", "first_name", "id"),
+        Index("ix_contacts_user_birthday_key", "user_id", "birthday_key"),
+        # Trigram-індекси для ILIKE '%q%' у crud.search_contacts (тільки PostgreSQL, розширення
+        # pg_trgm і btree_gin): user_id в тому ж GIN-індексі, тож скан зачіпає лише рядки користувача
+        *(
+            Index(
+                f"ix_contacts_user_{column}_trgm", "user_id", column,
+                postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+            ).ddl_if(dialect="postgresql")
+            for column in ("first_name", "last_name", "email")
+        ),
+    )
@@ -1,23 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, UploadFile, File
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app import schemas, crud
-from app.auth import auth_service
+from app.auth import auth_service, oauth2_scheme
+from app.services.avatars import (
+    AvatarStorage, avatar_key, content_hash, get_avatar_storage, is_legacy_avatar, read_upload, render_variants,
+)
 from app.services.email import send_email, send_reset_password_email
-import cloudinary
-import cloudinary.uploader
 from app.config import settings
 from app.models import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
         user_data: schemas.UserCreate,
-        background_tasks: BackgroundTasks,
         request: Request,
         db: AsyncSession = Depends(get_db)
 ):
@@ -31,10 +36,10 @@ async def register_user(
             detail="User with this email already exists"
         )
 
-    hashed_password = auth_service.get_password_hash(user_data.password)
+    hashed_password = await auth_service.get_password_hash(user_data.password)
     new_user = await crud.create_user(db, email=user_data.email, password=hashed_password)
 
-    background_tasks.add_task(send_email, new_user.email, new_user.email, str(request.base_url))
+    await send_email(new_user.email, new_user.email, str(request.base_url))
 
     return new_user
 
@@ -49,7 +54,7 @@ async def login_for_access_token(
     """
     user = await crud.get_user_by_email(db, email=form_data.username)
 
-    if not user or not auth_service.verify_password(form_data.password, user.hashed_password):
+    if not user or not await auth_service.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -68,14 +73,13 @@ async def login_for_access_token(
 
 @router.get("/refresh", response_model=schemas.Token)
 async def refresh_access_token(
-        refresh_token: str = Depends(auth_service.oauth2_scheme),
+        refresh_token: str = Depends(oauth2_scheme),
         db: AsyncSession = Depends(get_db)
 ):
     """
     Оновлює access_token за допомогою refresh_token.
     """
-    email = await auth_service.decode_refresh_token(
-        refresh_token)
+    email = await auth_service.decode_token(refresh_token)
     user = await crud.get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
@@ -102,6 +106,8 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
         return {"message": "Your email is already confirmed"}
 
     await crud.confirm_email(email, db)
+    # confirmed входить у закешований знімок користувача
+    await auth_service.invalidate_user(email)
     return {"message": "Email confirmed"}
 
 
@@ -109,43 +115,42 @@ async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
 async def update_avatar_user(
         file: UploadFile = File(),
         current_user: User = Depends(auth_service.get_current_user),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db),
+        storage: AvatarStorage = Depends(get_avatar_storage),
 ):
     """
-    Оновлює аватар користувача, завантажуючи файл у Cloudinary.
+    Оновлює аватар користувача: нарізає файл на варіанти розмірів і зберігає їх у сховищі.
+    Якщо файл не змінився з минулого разу, обробка пропускається.
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    public_id = f'goit-pyweb-hw-13/{current_user.email}'
+    data = await read_upload(file, settings.avatar_max_bytes)
+    digest = content_hash(data)
+    if current_user.avatar and current_user.avatar_hash == digest:
+        return current_user
+
     try:
-        r = cloudinary.uploader.upload(
-            file.file,
-            public_id=public_id,
-            overwrite=True,
-            folder='goit-pyweb-hw-13'
-        )
+        variants = await asyncio.to_thread(render_variants, data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    key = avatar_key(current_user.id, digest)
+    try:
+        await asyncio.to_thread(storage.save, key, variants)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Cloudinary upload failed: {e}"
+            detail=f"Avatar upload failed: {e}"
         )
 
-    src_url = cloudinary.CloudinaryImage(r['public_id']).build_url(
-        width=250,
-        height=250,
-        crop='fill',
-        version=r.get('version')
-    )
-    user = await crud.update_avatar_url(current_user.email, src_url, db)
+    previous = current_user.avatar
+    user = await crud.update_avatar_url(current_user.email, key, db, avatar_hash=digest)
 
+    await auth_service.invalidate_user(current_user.email)
 
-    user_key = f"user:{current_user.email}"
-    await auth_service.redis_client.delete(user_key)
+    if previous and previous != key and not is_legacy_avatar(previous):
+        try:
+            await asyncio.to_thread(storage.delete, previous)
+        except Exception:
+            logger.exception("Failed to delete previous avatar %s", previous)
 
     return user
 
@@ -153,7 +158,6 @@ async def update_avatar_user(
 @router.post("/request_reset_password", status_code=status.HTTP_202_ACCEPTED)
 async def request_reset_password(
         email_data: schemas.RequestReset,  
-        background_tasks: BackgroundTasks,
         request: Request,
         db: AsyncSession = Depends(get_db)
 ):
@@ -165,13 +169,7 @@ async def request_reset_password(
     if user:
         reset_token = await auth_service.create_reset_token({"sub": user.email})
 
-        background_tasks.add_task(
-            send_reset_password_email,
-            user.email,
-            user.email,  
-            reset_token,
-            str(request.base_url)
-        )
+        await send_reset_password_email(user.email, user.email, reset_token, str(request.base_url))
 
 
     return {"message": "If the user exists, a password reset email has been sent."}
@@ -196,10 +194,10 @@ async def reset_password(
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    hashed_password = auth_service.get_password_hash(new_password_data.password)
+    hashed_password = await auth_service.get_password_hash(new_password_data.password)
 
     await crud.update_password(user, hashed_password, db)
 
-    await auth_service.redis_client.delete(f"user:{user.email}")
+    await auth_service.invalidate_user(user.email)
 
     return {"message": "Password successfully reset."}
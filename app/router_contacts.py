@@ -1,23 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from fastapi_limiter.depends import RateLimiter
+from typing import List, Literal, Optional, Tuple
+from datetime import date
+import orjson
 
 from app import crud, schemas
-from app.database import get_db
+from app import database
+from app.config import settings
+from app.database import get_db, get_replica_db
+from app.etags import if_none_match, parse_if_match
 from app.auth import auth_service
 from app.models import User
+from app.services import contacts_io
+from app.services.cache import contacts_cache, recent_writes
 
 get_current_user = auth_service.get_current_user
 
 router = APIRouter(prefix="/contacts", tags=["Contacts"])
 
+# Позначка в AsyncSession.info сесії, яку get_read_db спрямував на репліку
+REPLICA = "replica"
+
+
+async def get_read_db(
+    db: AsyncSession = Depends(get_db),
+    replica_db: AsyncSession = Depends(get_replica_db),
+    current_user: User = Depends(get_current_user),
+) -> AsyncSession:
+    """
+    Сесія для GET-ендпоінтів: репліка, якщо вона налаштована і користувач нещодавно
+    нічого не змінював; інакше primary, щоб він одразу бачив власні зміни.
+    Сесії ліниві, тож невикористана не бере з'єднання з пулу.
+    """
+    if database.ReplicaSessionLocal is None or await recent_writes.is_recent(current_user.id):
+        return db
+    replica_db.info[REPLICA] = True
+    return replica_db
+
+
+def _from_replica(db: AsyncSession) -> bool:
+    """Прочитане з репліки не кешується: вона може відставати від поточної версії кешу."""
+    return db.info.get(REPLICA, False)
+
+
+def _dump_contacts(contacts) -> List[dict]:
+    """ORM-контакти -> JSON-сумісні словники для відповіді та кешу."""
+    return [schemas.ContactResponse.model_validate(c).model_dump(mode="json") for c in contacts]
+
+
+# Потрібні для X-Next-Cursor, тому завжди читаються зі списком, навіть якщо не запитані
+KEYSET_FIELDS = ("last_name", "first_name", "id")
+
+
+def _parse_fields(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    try:
+        return schemas.parse_contact_fields(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _rows_loader(query, select_fields: Optional[Tuple[str, ...]] = None):
+    """
+    loader для кешу списків. query(columns) виконує запит crud.
+    З select_fields (?fields=) читаються лише ці колонки. Інакше звичайний шлях — ORM-об'єкти
+    через ContactResponse, а швидкий (contacts_fast_serialization) — кортежі всіх колонок
+    одразу в словники, без побудови моделей на кожен рядок.
+    """
+    async def load():
+        if select_fields is not None:
+            return [row._asdict() for row in await query(crud.contact_columns(select_fields))]
+        if settings.contacts_fast_serialization:
+            return [row._asdict() for row in await query(crud.RESPONSE_COLUMNS)]
+        return _dump_contacts(await query(None))
+    return load
+
+
+def _list_response(contacts: List[dict], response: Response, fields: Optional[Tuple[str, ...]] = None):
+    """
+    Відповідь зі списком. Повні контакти на звичайному шляху проходять через response_model.
+    Вибрані поля валідуються динамічною моделлю (schemas.contact_fields_adapter), а на швидкому
+    шляху словники серіалізуються orjson без валідації.
+    """
+    if fields is None and not settings.contacts_fast_serialization:
+        return contacts
+    if fields is not None:
+        contacts = [{name: contact[name] for name in fields} for contact in contacts]
+    if settings.contacts_fast_serialization:
+        body = orjson.dumps(contacts)
+    else:
+        adapter = schemas.contact_fields_adapter(fields)
+        body = adapter.dump_json(adapter.validate_python(contacts))
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Відповіді персональні, а свіжість завжди перевіряється через ETag
+REVALIDATE = "private, no-cache"
+
+
+def _conditional_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": REVALIDATE}
+
+
+def _contact_etag(contact_id: int, version: int) -> str:
+    return f'"{contact_id}.{version}"'
+
+
+def _expected_versions(request: Request, contact_id: int) -> Optional[List[int]]:
+    """
+    Версії рядка, допустимі за If-Match. None — умови немає.
+    Якщо жоден тег не стосується цього контакту, 412 повертається без запиту до БД.
+    """
+    tags = parse_if_match(request.headers.get("if-match"))
+    if tags is None:
+        return None
+    prefix = f'"{contact_id}.'
+    versions = [
+        int(tag[len(prefix):-1]) for tag in tags
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()
+    ]
+    if not versions:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been modified")
+    return versions
+
+
+async def _conditional_list(
+    request: Request,
+    response: Response,
+    user: User,
+    db: AsyncSession,
+    namespace: str,
+    params: dict,
+    loader,
+):
+    """
+    Кешоване читання списку зі слабким ETag від версії адресної книги користувача.
+    Якщо If-None-Match збігається, повертає 304 без звернення до БД і кешу записів.
+    Результат з репліки не кешується, а ETag не віддається, якщо під час читання
+    користувач щось змінив: тіло могло прийти старше за версію в ETag.
+    """
+    from_replica = _from_replica(db)
+    version = await contacts_cache.current_version(user.id)
+    if version is None:
+        return await contacts_cache.fetch(user.id, namespace, params, loader, store=not from_replica)
+
+    headers = _conditional_headers(contacts_cache.list_etag(user.id, version, namespace, params))
+    if if_none_match(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    contacts = await contacts_cache.fetch(user.id, namespace, params, loader, version=version, store=not from_replica)
+    if not (from_replica and await recent_writes.is_recent(user.id)):
+        response.headers.update(headers)
+    return contacts
+
 @router.post(
     "/",
     response_model=schemas.ContactResponse,
     status_code=status.HTTP_201_CREATED,
-    # Додаємо залежність RateLimiter: 10 запитів за 60 секунд
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))]
+    # Ліміт (10 запитів за 60 секунд) — settings.rate_limits["POST /api/contacts/"]
 )
 async def create_contact(
     contact: schemas.ContactCreate, # Змінено ім'я з contact_data на contact для відповідності існуючому коду
@@ -34,74 +174,250 @@ async def create_contact(
     return await crud.create_contact(db=db, contact=contact, user=current_user)
 
 
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_contacts(
+    request: Request,
+    fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user) # ЗАХИСТ
+):
+    """
+    Масовий імпорт контактів з потокового тіла запиту (CSV з заголовком або NDJSON).
+    Формат береться з ?format=, інакше з Content-Type (text/csv -> CSV, решта -> NDJSON).
+    Повертає звіт з кількістю імпортованих рядків і помилками по кожному рядку.
+    """
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    return await contacts_io.import_contacts(db, request.stream(), fmt, current_user)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+    fmt: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user) # ЗАХИСТ
+):
+    """
+    Експортує всю адресну книгу користувача потоком CSV або NDJSON.
+    Пам'ять сервера не залежить від кількості контактів.
+    """
+    return StreamingResponse(
+        contacts_io.export_contacts(db, fmt, current_user),
+        media_type=contacts_io.EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{fmt}"'},
+    )
+
+
 @router.get("/", response_model=List[schemas.ContactResponse])
 async def read_contacts(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated subset of: {', '.join(schemas.CONTACT_FIELDS)}"
+    ),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    contacts = await crud.get_contacts(db, skip=skip, limit=limit, user=current_user) # Передаємо user
-    return contacts
+    """
+    Повертає сторінку контактів. Якщо сторінка повна, курсор наступної сторінки
+    передається в заголовку X-Next-Cursor; його можна передати як ?cursor=...
+    замість skip, щоб глибокі сторінки не сканували всі попередні рядки.
+    """
+    selected = _parse_fields(fields)
+    select_fields = None
+    if selected is not None:
+        select_fields = selected + tuple(name for name in KEYSET_FIELDS if name not in selected)
+    load = _rows_loader(
+        lambda columns: crud.get_contacts(
+            db, skip=skip, limit=limit, user=current_user, cursor=cursor, columns=columns
+        ), # Передаємо user
+        select_fields,
+    )
+
+    if cursor is not None:
+        try:
+            crud.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    params = {"skip": skip, "limit": limit, "cursor": cursor}
+    if selected is not None:
+        params["fields"] = selected
+    contacts = await _conditional_list(request, response, current_user, db, "list", params, load)
+    if isinstance(contacts, Response):
+        return contacts
+    if len(contacts) == limit:
+        last = contacts[-1]
+        response.headers["X-Next-Cursor"] = crud.encode_cursor(last["last_name"], last["first_name"], last["id"])
+    return _list_response(contacts, response, selected)
 
 
 @router.get("/search", response_model=List[schemas.ContactResponse])
 async def search_contacts(
+    request: Request,
+    response: Response,
     query: str = Query(..., min_length=1),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(50, ge=1, le=100),
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated subset of: {', '.join(schemas.CONTACT_FIELDS)}"
+    ),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    contacts = await crud.search_contacts(db, query=query, user=current_user) # Передаємо user
-    return contacts
+    selected = _parse_fields(fields)
+    load = _rows_loader(
+        lambda columns: crud.search_contacts(db, query=query, user=current_user, limit=limit, columns=columns),
+        selected,
+    )
+
+    params = {"query": query, "limit": limit}
+    if selected is not None:
+        params["fields"] = selected
+    contacts = await _conditional_list(request, response, current_user, db, "search", params, load)
+    if isinstance(contacts, Response):
+        return contacts
+    return _list_response(contacts, response, selected)
 
 
 @router.get("/birthdays", response_model=List[schemas.ContactResponse])
 async def get_upcoming_birthdays(
+    request: Request,
+    response: Response,
+    days: int = Query(7, ge=0, le=366),
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated subset of: {', '.join(schemas.CONTACT_FIELDS)}"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user) # ЗАХИСТ
+):
+    selected = _parse_fields(fields)
+    load = _rows_loader(
+        lambda columns: crud.get_upcoming_birthdays(db, user=current_user, days=days, columns=columns),
+        selected,
+    )
+
+    # Результат залежить від поточної дати, тому вона входить у ключ кешу
+    params = {"days": days, "today": date.today().isoformat()}
+    if selected is not None:
+        params["fields"] = selected
+    contacts = await _conditional_list(request, response, current_user, db, "birthdays", params, load)
+    if isinstance(contacts, Response):
+        return contacts
+    return _list_response(contacts, response, selected)
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult)
+async def bulk_update_contacts(
+    body: schemas.ContactBulkUpdate,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    contacts = await crud.get_upcoming_birthdays(db, user=current_user) # Передаємо user
-    return contacts
+    """
+    Масово змінює контакти, вибрані за ids та/або filter, одним запитом до БД.
+    Фільтр, що вибирає більше contacts_bulk_max_rows контактів, — 422 без змін.
+    """
+    try:
+        ids = await crud.bulk_update_contacts(
+            db, selector=body, changes=body.changes, user=current_user, max_rows=settings.contacts_bulk_max_rows,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return schemas.BulkResult(affected=len(ids), ids=ids)
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult)
+async def bulk_delete_contacts(
+    body: schemas.ContactSelector,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user) # ЗАХИСТ
+):
+    """
+    Масово видаляє контакти, вибрані за ids та/або filter, одним запитом до БД.
+    Фільтр, що вибирає більше contacts_bulk_max_rows контактів, — 422 без змін.
+    """
+    try:
+        ids = await crud.bulk_delete_contacts(
+            db, selector=body, user=current_user, max_rows=settings.contacts_bulk_max_rows,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return schemas.BulkResult(affected=len(ids), ids=ids)
 
 
 @router.get("/{contact_id}", response_model=schemas.ContactResponse)
 async def read_contact(
     contact_id: int,
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    db_contact = await crud.get_contact(db, contact_id=contact_id, user=current_user) # Передаємо user
-    if db_contact is None:
+    """
+    Повертає контакт із сильним ETag від версії рядка.
+    При влучанні в кеш 304 на If-None-Match віддається без запиту до БД.
+    """
+    async def load():
+        contact = await crud.get_contact(db, contact_id=contact_id, user=current_user) # Передаємо user
+        if contact is None:
+            return None
+        return {"contact": _dump_contacts([contact])[0], "version": contact.version}
+
+    entry = await contacts_cache.fetch(
+        current_user.id, "contact_row", {"id": contact_id}, load, store=not _from_replica(db),
+    )
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
         )
-    return db_contact
+    headers = _conditional_headers(_contact_etag(contact_id, entry["version"]))
+    if if_none_match(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return entry["contact"]
+
+
+async def _missing_or_modified(db: AsyncSession, contact_id: int, user: User, expected: Optional[List[int]]):
+    """Запис не відбувся: 412, якщо контакт існує, але його версія інша; інакше 404."""
+    if expected is not None and await crud.get_contact(db, contact_id=contact_id, user=user) is not None:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been modified")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
 
 
 @router.put("/{contact_id}", response_model=schemas.ContactResponse)
 async def update_contact(
     contact_id: int,
     contact: schemas.ContactUpdate,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    db_contact = await crud.update_contact(db, contact_id=contact_id, contact_update=contact, user=current_user) # Передаємо user
+    """Оновлює контакт. З If-Match оновлення застосовується лише до вказаної версії (інакше 412)."""
+    expected = _expected_versions(request, contact_id)
+    db_contact = await crud.update_contact(
+        db, contact_id=contact_id, contact_update=contact, user=current_user, expected_versions=expected
+    ) # Передаємо user
     if db_contact is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
-        )
+        await _missing_or_modified(db, contact_id, current_user, expected)
+    response.headers["ETag"] = _contact_etag(db_contact.id, db_contact.version)
     return db_contact
 
 
 @router.delete("/{contact_id}", response_model=schemas.ContactResponse)
 async def delete_contact(
     contact_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user) # ЗАХИСТ
 ):
-    db_contact = await crud.delete_contact(db, contact_id=contact_id, user=current_user) # Передаємо user
+    """Видаляє контакт. З If-Match видалення відбувається лише для вказаної версії (інакше 412)."""
+    expected = _expected_versions(request, contact_id)
+    db_contact = await crud.delete_contact(
+        db, contact_id=contact_id, user=current_user, expected_versions=expected
+    ) # Передаємо user
     if db_contact is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
-        )
-    return db_contact
\ No newline at end of file
+        await _missing_or_modified(db, contact_id, current_user, expected)
+    return db_contact
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.config import settings
+from app.database import get_db
+from app.etags import if_none_match
+from app.services.avatars import (
+    AVATAR_MEDIA_TYPE, AVATAR_SIZES, DEFAULT_AVATAR_SIZE, AvatarStorage, get_avatar_storage, is_legacy_avatar,
+)
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+@router.get(
+    "/{user_id}/avatar",
+    response_class=FileResponse,
+    responses={304: {"description": "Not Modified"}, 404: {"description": "No avatar"}},
+)
+async def get_user_avatar(
+        user_id: int,
+        request: Request,
+        size: int = Query(DEFAULT_AVATAR_SIZE, description=f"One of {AVATAR_SIZES}"),
+        db: AsyncSession = Depends(get_db),
+        storage: AvatarStorage = Depends(get_avatar_storage),
+):
+    """
+    Віддає аватар користувача потрібного розміру.
+    Ключ аватара містить хеш вмісту, тому ETag сильний і обчислюється без читання файлу.
+    """
+    if size not in AVATAR_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size must be one of {list(AVATAR_SIZES)}",
+        )
+
+    user = await crud.get_user(db, user_id)
+    if user is None or not user.avatar:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+
+    if is_legacy_avatar(user.avatar):
+        return RedirectResponse(user.avatar)
+
+    etag = f'"{user.avatar.replace("/", "-")}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.avatar_cache_max_age}"}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    url = storage.url(user.avatar, size)
+    if url is not None:
+        return RedirectResponse(url, headers={"Cache-Control": headers["Cache-Control"]})
+
+    path = storage.path(user.avatar, size)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    # FileResponse віддає файл через sendfile / http.response.pathsend, без копіювання в Python
+    return FileResponse(path, media_type=AVATAR_MEDIA_TYPE, headers=headers)
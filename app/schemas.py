@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, create_model, model_validator
 from datetime import date
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 
 class ContactBase(BaseModel):
@@ -30,6 +31,85 @@ class ContactResponse(ContactBase):
         from_attributes = True
 
 
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+
+
+def parse_contact_fields(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Розбирає ?fields=id,first_name,... у кортеж полів ContactResponse (у порядку схеми,
+    щоб однакові набори давали однаковий ключ кешу). None — потрібні всі поля.
+    """
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    if not requested:
+        raise ValueError("fields must name at least one field")
+    unknown = requested.difference(CONTACT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(CONTACT_FIELDS)}")
+    return tuple(name for name in CONTACT_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=256)
+def contact_fields_adapter(fields: Tuple[str, ...]) -> TypeAdapter:
+    """TypeAdapter списку моделі з підмножиною полів ContactResponse; будується один раз на набір полів."""
+    model = create_model(
+        "ContactFields",
+        **{name: (info.annotation, info) for name, info in ContactResponse.model_fields.items() if name in fields},
+    )
+    return TypeAdapter(List[model])
+
+
+class ContactFilter(BaseModel):
+    """Точний збіг по полях; задані поля поєднуються через AND."""
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    birthday: Optional[date] = None
+
+class ContactSelector(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10_000)
+    filter: Optional[ContactFilter] = None
+
+    @model_validator(mode="after")
+    def require_ids_or_filter(self):
+        if not self.ids and not (self.filter and self.filter.model_dump(exclude_none=True)):
+            raise ValueError("Either ids or a non-empty filter is required")
+        return self
+
+class ContactBulkChanges(BaseModel):
+    """Поля, які можна масово змінити. email і phone унікальні для контакту, тому їх тут немає."""
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    birthday: Optional[date] = None
+    additional_data: Optional[str] = None
+
+class ContactBulkUpdate(ContactSelector):
+    changes: ContactBulkChanges
+
+    @model_validator(mode="after")
+    def require_changes(self):
+        if not self.changes.model_dump(exclude_unset=True):
+            raise ValueError("At least one field must be changed")
+        return self
+
+class BulkResult(BaseModel):
+    affected: int
+    ids: List[int]
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str = Field(min_length=6)
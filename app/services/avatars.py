@@ -0,0 +1,201 @@
+"""
+Підготовка та зберігання аватарів.
+
+Файл читається з обмеженням розміру й локально нарізається на квадратні
+WebP-варіанти (AVATAR_SIZES); назовні йдуть лише вони. В User.avatar
+зберігається нейтральний до бекенду ключ "<user_id>/<hash>", де hash —
+префікс sha256 вихідного файлу, тож той самий файл повторно не обробляється,
+а ключ змінюється разом із вмістом.
+"""
+import hashlib
+import shutil
+from abc import ABC, abstractmethod
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.config import settings
+
+AVATAR_SIZES = (64, 128, 250)
+DEFAULT_AVATAR_SIZE = 250
+AVATAR_FORMAT = "WEBP"
+AVATAR_MEDIA_TYPE = "image/webp"
+READ_CHUNK_SIZE = 64 * 1024
+# Захист від "декомпресійних бомб": маленький файл з величезною роздільністю
+MAX_SOURCE_PIXELS = 40_000_000
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Читає файл частинами й обриває читання з 413, щойно розмір перевищив max_bytes."""
+    chunks = []
+    total = 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail=f"Avatar must not exceed {max_bytes} bytes",
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def avatar_key(user_id: int, digest: str) -> str:
+    return f"{user_id}/{digest[:16]}"
+
+
+def is_legacy_avatar(value: str) -> bool:
+    """До появи ключів у User.avatar зберігався повний URL Cloudinary."""
+    return value.startswith(("http://", "https://"))
+
+
+def render_variants(data: bytes, sizes: tuple[int, ...] = AVATAR_SIZES) -> dict[int, bytes]:
+    """
+    Обрізає зображення по центру до квадрата й кодує у WebP для кожного розміру.
+    Синхронна й CPU-bound: викликати через asyncio.to_thread.
+    Кидає ValueError, якщо дані не є зображенням.
+    """
+    # Pillow потрібен лише при завантаженні аватара — не імпортуємо його при старті воркера
+    from PIL import Image, ImageOps
+
+    largest = max(sizes)
+    try:
+        with Image.open(BytesIO(data)) as img:
+            if img.width * img.height > MAX_SOURCE_PIXELS:
+                raise ValueError("Image resolution is too large")
+            # Для JPEG декодер одразу зменшує масштаб, не розпаковуючи повний кадр
+            img.draft("RGB", (largest * 2, largest * 2))
+            img = ImageOps.exif_transpose(img)
+            mode = "RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB"
+            base = ImageOps.fit(img.convert(mode), (largest, largest), Image.Resampling.LANCZOS)
+    except (OSError, Image.DecompressionBombError) as err:
+        raise ValueError("File is not a valid image") from err
+
+    variants = {}
+    for size in sizes:
+        thumb = base if size == largest else base.resize((size, size), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        thumb.save(out, AVATAR_FORMAT, quality=85)
+        variants[size] = out.getvalue()
+    return variants
+
+
+class AvatarStorage(ABC):
+    """
+    Бекенд зберігання аватарів. Методи синхронні (мережа/диск) —
+    викликаються з пулу потоків.
+    """
+
+    def configure(self) -> None:
+        """Викликається один раз перед першим використанням сховища (get_avatar_storage)."""
+
+    @abstractmethod
+    def save(self, key: str, variants: dict[int, bytes]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def url(self, key: str, size: int) -> Optional[str]:
+        """Зовнішня адреса варіанта, якщо бекенд роздає файли сам."""
+        return None
+
+    def path(self, key: str, size: int) -> Optional[Path]:
+        """Локальний файл варіанта, якщо бекенд зберігає файли на диску."""
+        return None
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    SDK cloudinary (разом з urllib3) імпортується й налаштовується при першому
+    зверненні до сховища, а не при старті воркера.
+    """
+
+    folder = "goit-pyweb-hw-13"
+
+    def __init__(self):
+        self._sdk = None
+
+    def sdk(self):
+        if self._sdk is None:
+            import cloudinary
+            import cloudinary.api
+            import cloudinary.uploader
+
+            cloudinary.config(
+                cloud_name=settings.cloudinary_name,
+                api_key=settings.cloudinary_api_key,
+                api_secret=settings.cloudinary_api_secret,
+                secure=True,
+            )
+            self._sdk = cloudinary
+        return self._sdk
+
+    def _public_id(self, key: str, size: int) -> str:
+        return f"{self.folder}/{key}/{size}"
+
+    def save(self, key: str, variants: dict[int, bytes]) -> None:
+        for size, data in variants.items():
+            self.sdk().uploader.upload(data, public_id=self._public_id(key, size), overwrite=True)
+
+    def delete(self, key: str) -> None:
+        self.sdk().api.delete_resources([self._public_id(key, size) for size in AVATAR_SIZES])
+
+    def url(self, key: str, size: int) -> Optional[str]:
+        return self.sdk().CloudinaryImage(self._public_id(key, size)).build_url(format=AVATAR_FORMAT.lower())
+
+
+class LocalAvatarStorage(AvatarStorage):
+    """Зберігає варіанти у <root>/<key>/<size>.webp; роздаються ендпоінтом застосунку."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def configure(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str, size: int) -> Optional[Path]:
+        return self.root / key / f"{size}.webp"
+
+    def save(self, key: str, variants: dict[int, bytes]) -> None:
+        directory = self.root / key
+        directory.mkdir(parents=True, exist_ok=True)
+        for size, data in variants.items():
+            # Запис через тимчасовий файл: паралельний GET не побачить обрізаний файл
+            tmp = directory / f".{size}.webp.tmp"
+            tmp.write_bytes(data)
+            tmp.replace(directory / f"{size}.webp")
+
+    def delete(self, key: str) -> None:
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+
+def storage_from_settings() -> AvatarStorage:
+    if settings.avatar_storage == "local":
+        return LocalAvatarStorage(Path(settings.avatar_local_dir))
+    if settings.avatar_storage == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown avatar storage backend: {settings.avatar_storage}")
+
+
+_avatar_storage: Optional[AvatarStorage] = None
+
+
+def get_avatar_storage() -> AvatarStorage:
+    """
+    Залежність FastAPI; у тестах підміняється через dependency_overrides.
+    Сховище створюється й налаштовується при першому виклику (зазвичай у lifespan).
+    """
+    global _avatar_storage
+    if _avatar_storage is None:
+        storage = storage_from_settings()
+        storage.configure()
+        _avatar_storage = storage
+    return _avatar_storage
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from time import monotonic, time_ns
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.services.metrics import count_contacts_cache
+from app.services.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    In-process LRU-кеш з обмеженням розміру та TTL для кожного запису.
+    Не потокобезпечний: розрахований на використання з event loop одного воркера.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Повертає значення або None, якщо запису немає чи він прострочений."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Зберігає значення, витісняючи найдавніше використані записи понад maxsize."""
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Операції над кількома ключами Redis за один round trip: видалення разом із
+    публікацією — одним pipeline без транзакції. Помилки Redis не перехоплюються.
+    """
+
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+
+    @property
+    def redis_client(self):
+        # None — спільний клієнт воркера з app/services/redis_pool.py
+        return self._redis_client if self._redis_client is not None else get_redis()
+
+    async def delete_many(self, keys: Iterable[str], channel: Optional[str] = None, messages: Iterable[str] = ()) -> None:
+        """Видаляє ключі й тим самим pipeline публікує messages у channel (напр. для інвалідації L1 інших воркерів)."""
+        keys = list(keys)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.delete(*keys)
+            if channel is not None:
+                for message in messages:
+                    pipe.publish(channel, message)
+            await pipe.execute()
+
+
+class ContactsCache:
+    """
+    Кеш результатів читання контактів у Redis з версіонуванням по користувачу.
+
+    Ключ запису містить поточну версію адресної книги користувача (лічильник
+    contacts:ver:{user_id}). Будь-який запис у crud викликає bump(), після чого всі старі
+    записи просто перестають читатися і зникають за TTL — інвалідація O(1) без SCAN.
+    Лічильники версій не мають TTL, тож при maxmemory-policy volatile-lru Redis
+    витісняє лише записи кешу. Результати, більші за max_entry_bytes, не кешуються.
+    Будь-яка помилка Redis вважається промахом: кеш ніколи не ламає запит.
+    """
+
+    def __init__(self, redis_client=None, *, ttl: int, max_entry_bytes: int, enabled: bool = True):
+        self._redis_client = redis_client
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+
+    @property
+    def redis_client(self):
+        # None — спільний клієнт воркера з app/services/redis_pool.py
+        return self._redis_client if self._redis_client is not None else get_redis()
+
+    @staticmethod
+    def version_key(user_id: int) -> str:
+        return f"contacts:ver:{user_id}"
+
+    @staticmethod
+    def _params_digest(params: dict) -> str:
+        return hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:16]
+
+    @classmethod
+    def entry_key(cls, user_id: int, version: int, namespace: str, params: dict) -> str:
+        return f"contacts:{user_id}:{version}:{namespace}:{cls._params_digest(params)}"
+
+    @classmethod
+    def list_etag(cls, user_id: int, version: int, namespace: str, params: dict) -> str:
+        """Слабкий ETag результату читання: змінюється разом із версією адресної книги."""
+        return f'W/"{user_id}.{version}.{namespace}.{cls._params_digest(params)}"'
+
+    @staticmethod
+    def _initial_version() -> int:
+        # Лічильник стартує з часу, а не з 0: після втрати даних Redis нові версії
+        # не збігатимуться зі старими ETag, що лишились у клієнтів
+        return time_ns() // 1000
+
+    async def version(self, user_id: int) -> int:
+        """Поточна версія; відсутній лічильник створюється тим самим pipeline (SET NX + GET)."""
+        key = self.version_key(user_id)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key, self._initial_version(), nx=True)
+            pipe.get(key)
+            _, raw = await pipe.execute()
+        return int(raw)
+
+    async def current_version(self, user_id: int) -> Optional[int]:
+        """Версія для ETag або None, якщо кеш вимкнено (версії тоді не ведуться) чи Redis недоступний."""
+        if not self.enabled:
+            return None
+        try:
+            return await self.version(user_id)
+        except RedisError as err:
+            logger.debug("Contacts cache version read failed: %s", err)
+            return None
+
+    async def fetch(
+            self,
+            user_id: int,
+            namespace: str,
+            params: dict,
+            loader: Callable[[], Awaitable[Any]],
+            version: Optional[int] = None,
+            store: bool = True,
+    ) -> Any:
+        """
+        Повертає закешований результат або викликає loader() і зберігає його.
+        loader має повертати JSON-сумісні дані. Уже прочитану версію можна передати в version.
+        store=False — результат не зберігається (loader читає з репліки, яка може відставати
+        від версії, під якою його збережено б).
+        """
+        if not self.enabled:
+            return await loader()
+
+        key = None
+        try:
+            if version is None:
+                version = await self.version(user_id)
+            key = self.entry_key(user_id, version, namespace, params)
+            raw = await self.redis_client.get(key)
+        except RedisError as err:
+            logger.debug("Contacts cache read failed: %s", err)
+            raw = None
+        if raw is not None:
+            count_contacts_cache(hit=True)
+            return json.loads(raw)["d"]
+
+        count_contacts_cache(hit=False)
+        value = await loader()
+        if key is not None and store:
+            payload = json.dumps({"d": value}, separators=(",", ":"), default=str).encode("utf-8")
+            if len(payload) <= self.max_entry_bytes:
+                try:
+                    await self.redis_client.set(key, payload, ex=self.ttl)
+                except RedisError as err:
+                    logger.debug("Contacts cache write failed: %s", err)
+        return value
+
+    async def bump(self, user_id: int, recent_writes: Optional["RecentWrites"] = None) -> None:
+        """
+        Робить недійсними всі закешовані читання контактів користувача.
+        recent_writes — позначка read-your-writes іде тим самим pipeline перед bump:
+        один round trip на запис, і читання, що побачило нову версію, вже бачить позначку.
+        """
+        if recent_writes is not None:
+            recent_writes.mark_local(user_id)
+        elif not self.enabled:
+            return
+        key = self.version_key(user_id)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                if recent_writes is not None:
+                    recent_writes.queue_mark(pipe, user_id)
+                if self.enabled:
+                    pipe.set(key, self._initial_version(), nx=True)
+                    pipe.incr(key)
+                await pipe.execute()
+        except RedisError as err:
+            logger.warning("Contacts cache version bump failed for user %s: %s", user_id, err)
+
+
+class RecentWrites:
+    """
+    Пам'ятає користувачів, які щойно змінювали контакти, щоб їхні читання йшли на primary,
+    доки репліка не наздожене (read-your-writes). Позначка живе `window` секунд у Redis
+    (видно всім воркерам) і локально (спрацьовує, навіть якщо Redis недоступний).
+    """
+
+    def __init__(self, redis_client=None, *, window: int):
+        self._redis_client = redis_client
+        self.window = window
+        self._local = TTLCache(maxsize=100_000, ttl=window)
+
+    @property
+    def redis_client(self):
+        # None — спільний клієнт воркера з app/services/redis_pool.py
+        return self._redis_client if self._redis_client is not None else get_redis()
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"contacts:w:{user_id}"
+
+    def mark_local(self, user_id: int) -> None:
+        self._local.set(user_id, True)
+
+    def queue_mark(self, pipe, user_id: int) -> None:
+        """Додає позначку в чужий pipeline (ContactsCache.bump)."""
+        pipe.set(self.key(user_id), b"1", ex=self.window)
+
+    async def is_recent(self, user_id: int) -> bool:
+        if self._local.get(user_id):
+            return True
+        try:
+            return bool(await self.redis_client.exists(self.key(user_id)))
+        except RedisError as err:
+            # Не знаємо напевно — безпечніше читати з primary
+            logger.debug("Recent write check failed for user %s: %s", user_id, err)
+            return True
+
+
+contacts_cache = ContactsCache(
+    ttl=settings.contacts_cache_ttl,
+    max_entry_bytes=settings.contacts_cache_max_entry_bytes,
+    enabled=settings.contacts_cache_enabled,
+)
+
+recent_writes = RecentWrites(window=settings.replica_read_after_write_seconds)
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.config import settings
+from app.models import User
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+@dataclass(frozen=True)
+class BadLine:
+    """Рядок, який не вдалося прочитати; error потрапляє у звіт імпорту як помилка рядка."""
+    error: str
+
+
+async def iter_lines(
+        stream: AsyncIterator[bytes], max_line_bytes: Optional[int] = None
+) -> AsyncIterator[Union[str, BadLine]]:
+    """
+    Розбиває потік байтів на рядки UTF-8, не тримаючи в пам'яті більше одного рядка.
+    Рядок, довший за max_line_bytes, не накопичується, а рядок з невалідним UTF-8 не
+    декодується: замість них повертається BadLine, і потік читається далі.
+    Кожен шматок переглядається один раз — байт \n не трапляється всередині символів UTF-8.
+    """
+    parts: List[bytes] = []
+    size = 0
+    too_long = False
+    encoding = "utf-8-sig"  # BOM можливий лише на початку файлу
+
+    def line() -> Union[str, BadLine]:
+        nonlocal encoding
+        current, encoding = encoding, "utf-8"
+        if too_long:
+            return BadLine("Line is too long")
+        try:
+            return b"".join(parts).decode(current).rstrip("\r")
+        except UnicodeDecodeError as err:
+            return BadLine(f"Invalid UTF-8 at byte {err.start}")
+
+    async for chunk in stream:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            piece = chunk[start:end]
+            start = end + 1
+            if max_line_bytes is not None and size + len(piece) > max_line_bytes:
+                too_long = True
+            if not too_long:
+                parts.append(piece)
+            yield line()
+            parts, size, too_long = [], 0, False
+        rest = chunk[start:]
+        if too_long or not rest:
+            continue
+        if max_line_bytes is not None and size + len(rest) > max_line_bytes:
+            parts, size, too_long = [], 0, True
+        else:
+            parts.append(rest)
+            size += len(rest)
+    if parts or too_long:
+        yield line()
+
+
+async def iter_records(
+        lines: AsyncIterator[Union[str, BadLine]], fmt: str
+) -> AsyncIterator[Tuple[int, Union[dict, str]]]:
+    """
+    Перетворює рядки на (номер рядка, запис) або (номер рядка, текст помилки).
+    CSV очікує рядок заголовка з назвами полів ContactCreate; поля з переносами рядків не підтримуються.
+    Порожні рядки пропускаються, нумерація йде лише по рядках даних, починаючи з 1.
+    BadLine від iter_lines (задовгий рядок, невалідний UTF-8) — помилка цього рядка.
+    """
+    header = None
+    row = 0
+    async for line in lines:
+        if isinstance(line, BadLine):
+            row += 1
+            yield row, line.error
+            continue
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row += 1
+            if len(values) != len(header):
+                yield row, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield row, {name: value or None for name, value in zip(header, values)}
+        else:
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as err:
+                yield row, f"Invalid JSON: {err}"
+                continue
+            if not isinstance(record, dict):
+                yield row, "Expected a JSON object"
+                continue
+            yield row, record
+
+
+def _format_validation_error(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in err.errors()
+    )
+
+
+async def import_contacts(
+        db: AsyncSession, stream: AsyncIterator[bytes], fmt: str, user: User
+) -> schemas.ImportReport:
+    """
+    Потоково імпортує контакти з CSV/NDJSON.
+    Рядки валідуються по одному, дублікати шукаються одним запитом на пачку,
+    кожна пачка вставляється окремою транзакцією — пам'ять не залежить від розміру файлу.
+    Рядки, довші за contacts_import_max_line_bytes, потрапляють у звіт як помилки.
+    """
+    batch_size = settings.contacts_import_batch_size
+    max_errors = settings.contacts_import_max_errors
+    report = schemas.ImportReport(imported=0, failed=0, errors=[])
+
+    def fail(row: int, error: str) -> None:
+        report.failed += 1
+        if len(report.errors) < max_errors:
+            report.errors.append(schemas.ImportRowError(row=row, error=error))
+        else:
+            report.errors_truncated = True
+
+    async def flush(batch: List[Tuple[int, schemas.ContactCreate]]) -> None:
+        existing_emails, existing_phones = await crud.get_existing_contact_keys(
+            db, {c.email for _, c in batch}, {c.phone for _, c in batch}, user
+        )
+        accepted = []
+        for row, contact in batch:
+            if contact.email in existing_emails or contact.phone in existing_phones:
+                fail(row, "Email or phone number already registered for this user")
+                continue
+            existing_emails.add(contact.email)
+            existing_phones.add(contact.phone)
+            accepted.append(contact)
+        report.imported += await crud.bulk_create_contacts(db, accepted, user)
+
+    batch: List[Tuple[int, schemas.ContactCreate]] = []
+    lines = iter_lines(stream, settings.contacts_import_max_line_bytes)
+    async for row, record in iter_records(lines, fmt):
+        if isinstance(record, str):
+            fail(row, record)
+            continue
+        try:
+            batch.append((row, schemas.ContactCreate.model_validate(record)))
+        except ValidationError as err:
+            fail(row, _format_validation_error(err))
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    return report
+
+
+async def export_contacts(db: AsyncSession, fmt: str, user: User) -> AsyncIterator[bytes]:
+    """
+    Серіалізує контакти користувача у CSV (з заголовком) або NDJSON.
+    Кожна пачка рядків з БД стає одним шматком відповіді; Pydantic-моделі не створюються.
+    """
+    columns = crud.EXPORT_COLUMNS
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        async for rows in crud.stream_contact_rows(db, user):
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    else:
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+        async for rows in crud.stream_contact_rows(db, user):
+            yield "".join(dumps(dict(zip(columns, row))) + "\n" for row in rows).encode("utf-8")
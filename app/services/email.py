@@ -1,40 +1,70 @@
-from pathlib import Path
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+"""
+Постановка листів у чергу (outbox).
+
+Веб-воркер лише кладе задачу в Redis-список; рендер шаблону та відправку
+виконує окремий процес app/services/mail_worker.py.
+"""
+import json
+import logging
+import uuid
+from typing import Any
+
 from pydantic import EmailStr
-from app.config import settings
+from redis.exceptions import RedisError
+
+from app.services.redis_pool import get_redis
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="GoIT Homework",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+logger = logging.getLogger(__name__)
 
+OUTBOX_KEY = "mail:outbox"
+RETRY_KEY = "mail:retry"
+DEAD_LETTER_KEY = "mail:dead"
 
-async def send_email(email: EmailStr, username: str, host: str):
-    pass
 
+def build_job(recipient: str, subject: str, template: str, context: dict[str, Any]) -> dict[str, Any]:
+    """Формує задачу для черги; attempts рахує вже невдалі спроби."""
+    return {
+        "id": uuid.uuid4().hex,
+        "to": recipient,
+        "subject": subject,
+        "template": template,
+        "context": context,
+        "attempts": 0,
+    }
 
-async def send_reset_password_email(email: EmailStr, username: str, token: str, host: str):
+
+async def enqueue_email(recipient: str, subject: str, template: str, context: dict[str, Any]) -> bool:
+    """
+    Додає лист до outbox. Повертає False, якщо Redis недоступний:
+    відсутність листа не повинна ламати запит, що його породив.
+    """
+    job = build_job(recipient, subject, template, context)
     try:
-        reset_url = f"{host}reset-password?token={token}"
-
-        message = MessageSchema(
-            subject="Password Reset Request",
-            recipients=[email],
-            template_body={"host": host, "username": username, "reset_url": reset_url},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password_template.html")
-    except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+        await get_redis().lpush(OUTBOX_KEY, json.dumps(job))
+    except RedisError:
+        logger.exception("Failed to enqueue email %s to %s", template, recipient)
+        return False
+    return True
+
+
+async def send_email(email: EmailStr, username: str, host: str) -> bool:
+    # Імпорт тут, щоб воркер пошти не тягнув за собою AuthService
+    from app.auth import auth_service
+
+    token = auth_service.create_email_token({"sub": email})
+    return await enqueue_email(
+        email,
+        "Confirm your email",
+        "email_template.html",
+        {"host": host, "username": username, "token": token},
+    )
+
+
+async def send_reset_password_email(email: EmailStr, username: str, token: str, host: str) -> bool:
+    reset_url = f"{host}reset-password?token={token}"
+    return await enqueue_email(
+        email,
+        "Password Reset Request",
+        "reset_password_template.html",
+        {"host": host, "username": username, "reset_url": reset_url},
+    )
@@ -0,0 +1,87 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+
+@dataclass
+class HasherStats:
+    """Лічильники черги хешування паролів."""
+    in_flight: int = 0
+    waiting: int = 0
+    completed: int = 0
+    rejected: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class PasswordHasher:
+    """
+    Виконує bcrypt у обмеженому пулі потоків, щоб хешування не блокувало event loop.
+    bcrypt звільняє GIL, тому потоки справді працюють паралельно.
+    Одночасно виконується не більше `workers` операцій; якщо в черзі вже `max_queue`
+    запитів, новий отримує 503 замість того, щоб чекати невизначено довго.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self.stats = HasherStats()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.stats.waiting >= self.max_queue:
+            self.stats.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests",
+                headers={"Retry-After": "1"},
+            )
+
+        queued_at = perf_counter()
+        self.stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.stats.waiting -= 1
+        wait = perf_counter() - queued_at
+        self.stats.total_wait_seconds += wait
+        self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+
+        self.stats.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.stats.in_flight -= 1
+            self.stats.completed += 1
+            semaphore.release()
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
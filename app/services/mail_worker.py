@@ -0,0 +1,362 @@
+"""
+Окремий процес відправки пошти з outbox.
+
+Запуск: python -m app.services.mail_worker [--worker-id ID]
+
+Задачі забираються з mail:outbox атомарним LMOVE у власний processing-список
+воркера. Воркер реєструється в mail:workers і оновлює heartbeat-ключ з TTL;
+processing-список воркера, чий heartbeat зник (процес впав або контейнер
+перестворено з іншим hostname), повертає в outbox будь-який живий воркер.
+Той самий id після рестарту забирає свій список одразу. Невдалі спроби
+відкладаються в ZSET mail:retry з експоненційною затримкою, після
+mail_max_attempts — потрапляють у mail:dead.
+
+Heartbeat оновлює окрема задача кожні ttl/3 весь час роботи воркера, тож довга
+пачка його не перериває. Доставка — "хоча б раз": воркер, чий цикл подій
+заблоковано або який втратив Redis довше за mail_worker_heartbeat_ttl, може
+надіслати лист, який уже повернули в чергу.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import socket
+import time
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, Optional
+
+import aiosmtplib
+import redis.asyncio as redis
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template, select_autoescape
+
+from app.config import settings
+from app.services.email import DEAD_LETTER_KEY, OUTBOX_KEY, RETRY_KEY
+
+logger = logging.getLogger(__name__)
+
+WORKERS_KEY = "mail:workers"
+
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+TEMPLATE_NAMES = ("email_template.html", "reset_password_template.html")
+
+
+class MailTemplates:
+    """Шаблони компілюються один раз при створенні, а не на кожен лист."""
+
+    def __init__(self, folder: Path = TEMPLATE_FOLDER, names: tuple[str, ...] = TEMPLATE_NAMES):
+        env = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(["html"]),
+            undefined=StrictUndefined,
+        )
+        self._templates: dict[str, Template] = {name: env.get_template(name) for name in names}
+
+    def render(self, name: str, context: dict[str, Any]) -> str:
+        try:
+            template = self._templates[name]
+        except KeyError:
+            raise ValueError(f"Unknown mail template: {name}") from None
+        return template.render(**context)
+
+
+class SMTPPool:
+    """
+    Пул постійних автентифікованих SMTP-з'єднань.
+    З'єднання відкривається ліниво і перепідключається, якщо сервер його закрив.
+    """
+
+    def __init__(
+            self,
+            size: int,
+            hostname: str,
+            port: int,
+            username: Optional[str] = None,
+            password: Optional[str] = None,
+            use_tls: bool = True,
+            start_tls: bool = False,
+            validate_certs: bool = True,
+    ):
+        self._options = dict(
+            hostname=hostname,
+            port=port,
+            use_tls=use_tls,
+            start_tls=start_tls,
+            validate_certs=validate_certs,
+        )
+        self._username = username
+        self._password = password
+        self._idle: asyncio.Queue[aiosmtplib.SMTP] = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(aiosmtplib.SMTP(**self._options))
+
+    async def _ensure_connected(self, client: aiosmtplib.SMTP) -> None:
+        if client.is_connected:
+            try:
+                await client.noop()
+                return
+            except aiosmtplib.SMTPException:
+                client.close()
+        await client.connect()
+        if self._username:
+            await client.login(self._username, self._password)
+
+    async def send(self, message: EmailMessage) -> None:
+        client = await self._idle.get()
+        try:
+            await self._ensure_connected(client)
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # Сервер закрив з'єднання між NOOP і відправкою — одна повторна спроба
+                await self._ensure_connected(client)
+                await client.send_message(message)
+        except Exception:
+            client.close()
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
+
+
+def processing_key(worker_id: str) -> str:
+    return f"mail:processing:{worker_id}"
+
+
+def heartbeat_key(worker_id: str) -> str:
+    return f"mail:worker:{worker_id}"
+
+
+def retry_delay(attempts: int) -> float:
+    """Затримка перед наступною спробою: base * 2^(attempts-1), не більше max."""
+    return min(settings.mail_retry_base_delay * 2 ** (attempts - 1), settings.mail_retry_max_delay)
+
+
+class MailWorker:
+    def __init__(
+            self,
+            redis_client: redis.Redis,
+            smtp: SMTPPool,
+            templates: MailTemplates,
+            worker_id: str,
+            batch_size: Optional[int] = None,
+            max_attempts: Optional[int] = None,
+            sender: Optional[str] = None,
+            sender_name: Optional[str] = None,
+            heartbeat_ttl: Optional[int] = None,
+    ):
+        # None — значення з settings на момент створення воркера, а не імпорту модуля
+        self.redis = redis_client
+        self.smtp = smtp
+        self.templates = templates
+        self.worker_id = worker_id
+        self.processing_key = processing_key(worker_id)
+        self.heartbeat_key = heartbeat_key(worker_id)
+        self.heartbeat_ttl = settings.mail_worker_heartbeat_ttl if heartbeat_ttl is None else heartbeat_ttl
+        self.batch_size = settings.mail_worker_batch_size if batch_size is None else batch_size
+        self.max_attempts = settings.mail_max_attempts if max_attempts is None else max_attempts
+        sender = settings.mail_from if sender is None else sender
+        sender_name = settings.mail_from_name if sender_name is None else sender_name
+        self.sender = f"{sender_name} <{sender}>" if sender_name else sender
+
+    def build_message(self, job: dict[str, Any]) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = job["to"]
+        message["Subject"] = job["subject"]
+        message.set_content(self.templates.render(job["template"], job["context"]), subtype="html")
+        return message
+
+    async def recover(self) -> int:
+        """Повертає в outbox задачі, які цей воркер не встиг завершити до падіння."""
+        moved = 0
+        while await self.redis.lmove(self.processing_key, OUTBOX_KEY, "LEFT", "RIGHT"):
+            moved += 1
+        if moved:
+            logger.warning("Recovered %d unfinished mail jobs", moved)
+        return moved
+
+    async def heartbeat(self) -> None:
+        """Позначає воркер живим на heartbeat_ttl секунд і (повторно) реєструє його."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.heartbeat_key, b"1", ex=self.heartbeat_ttl)
+            pipe.sadd(WORKERS_KEY, self.worker_id)
+            await pipe.execute()
+
+    async def reap_orphans(self) -> int:
+        """Повертає в outbox незавершені задачі зареєстрованих воркерів без heartbeat."""
+        moved = 0
+        for member in await self.redis.smembers(WORKERS_KEY):
+            worker_id = member.decode() if isinstance(member, bytes) else member
+            if worker_id == self.worker_id or await self.redis.exists(heartbeat_key(worker_id)):
+                continue
+            # LMOVE по одній: два воркери, що прибирають одночасно, не продублюють задачу
+            while await self.redis.lmove(processing_key(worker_id), OUTBOX_KEY, "LEFT", "RIGHT"):
+                moved += 1
+            await self.redis.srem(WORKERS_KEY, worker_id)
+            logger.warning("Reaped mail worker %s without heartbeat", worker_id)
+        if moved:
+            logger.warning("Requeued %d mail jobs of dead workers", moved)
+        return moved
+
+    async def promote_due_retries(self, now: Optional[float] = None) -> int:
+        """Переносить задачі з настанням часу повтору з ZSET назад в outbox."""
+        now = time.time() if now is None else now
+        due = await self.redis.zrangebyscore(RETRY_KEY, "-inf", now, start=0, num=self.batch_size)
+        promoted = 0
+        for raw in due:
+            # ZREM як захоплення: задачу переносить лише той воркер, що її видалив
+            if await self.redis.zrem(RETRY_KEY, raw):
+                await self.redis.lpush(OUTBOX_KEY, raw)
+                promoted += 1
+        return promoted
+
+    async def fetch_batch(self, timeout: float = 1.0) -> list[bytes]:
+        first = await self.redis.blmove(OUTBOX_KEY, self.processing_key, timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            raw = await self.redis.lmove(OUTBOX_KEY, self.processing_key, "RIGHT", "LEFT")
+            if raw is None:
+                break
+            batch.append(raw)
+        return batch
+
+    async def deliver(self, raw: bytes) -> bool:
+        """
+        Надсилає один лист і прибирає його з processing-списку.
+        Повертає True при успіху; при помилці планує повтор або dead-letter.
+        """
+        try:
+            job = json.loads(raw)
+            message = self.build_message(job)
+        except Exception as err:
+            # Зламану задачу (JSON, поля, шаблон) немає сенсу повторювати
+            logger.error("Malformed mail job, dead-lettering: %s", err)
+            await self._finish(raw, DEAD_LETTER_KEY, raw)
+            return False
+
+        try:
+            await self.smtp.send(message)
+        except Exception as err:
+            # Будь-яка помилка відправки — повтор із затримкою, а не падіння воркера
+            job["attempts"] = job.get("attempts", 0) + 1
+            job["last_error"] = str(err)
+            if job["attempts"] >= self.max_attempts:
+                logger.error("Mail %s to %s dead-lettered after %d attempts", job["id"], job["to"], job["attempts"])
+                await self._finish(raw, DEAD_LETTER_KEY, json.dumps(job))
+            else:
+                logger.warning("Mail %s to %s failed (attempt %d): %s", job["id"], job["to"], job["attempts"], err)
+                await self._finish(raw, RETRY_KEY, json.dumps(job), score=time.time() + retry_delay(job["attempts"]))
+            return False
+
+        await self.redis.lrem(self.processing_key, 1, raw)
+        return True
+
+    async def _finish(self, raw: bytes, target: str, payload, score: Optional[float] = None) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if score is None:
+                pipe.lpush(target, payload)
+            else:
+                pipe.zadd(target, {payload: score})
+            pipe.lrem(self.processing_key, 1, raw)
+            await pipe.execute()
+
+    async def run_once(self, timeout: float = 1.0) -> int:
+        """Один цикл: повтори, що настали, плюс одна пачка з outbox. Повертає кількість надісланих."""
+        await self.promote_due_retries()
+        batch = await self.fetch_batch(timeout)
+        if not batch:
+            return 0
+        results = await asyncio.gather(*(self.deliver(raw) for raw in batch), return_exceptions=True)
+        sent = 0
+        for raw, result in zip(batch, results):
+            if isinstance(result, BaseException):
+                # Задача лишається в processing-списку і повернеться через recover()/reap_orphans()
+                logger.error("Mail job failed unexpectedly: %r", result, exc_info=result)
+            else:
+                sent += result
+        return sent
+
+    async def keep_alive(self) -> None:
+        """Фонова задача run(): heartbeat і прибирання мертвих воркерів кожні heartbeat_ttl/3."""
+        while True:
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            try:
+                await self.heartbeat()
+                await self.reap_orphans()
+            except Exception:
+                logger.exception("Mail worker heartbeat failed, retrying")
+
+    async def run(self, stop: asyncio.Event) -> None:
+        await self.heartbeat()
+        await self.recover()
+        await self.reap_orphans()
+        keep_alive = asyncio.create_task(self.keep_alive())
+        try:
+            while not stop.is_set():
+                try:
+                    await self.run_once()
+                except Exception:
+                    # Redis недоступний або неочікувана помилка — воркер не падає
+                    logger.exception("Mail worker iteration failed, retrying")
+                    await asyncio.sleep(1)
+        finally:
+            keep_alive.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await keep_alive
+
+
+def smtp_pool_from_settings() -> SMTPPool:
+    return SMTPPool(
+        size=settings.mail_worker_connections,
+        hostname=settings.mail_server,
+        port=settings.mail_port,
+        username=settings.mail_username if settings.mail_use_credentials else None,
+        password=settings.mail_password if settings.mail_use_credentials else None,
+        use_tls=settings.mail_ssl_tls,
+        start_tls=settings.mail_starttls,
+        validate_certs=settings.mail_validate_certs,
+    )
+
+
+async def main(worker_id: str) -> None:
+    import signal
+
+    redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+    smtp = smtp_pool_from_settings()
+    worker = MailWorker(redis_client, smtp, MailTemplates(), worker_id)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await worker.run(stop)
+    finally:
+        await smtp.close()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mail outbox worker")
+    parser.add_argument(
+        "--worker-id",
+        default=socket.gethostname(),
+        help="Унікальний для кожного екземпляра. Стабільний id (напр. ім'я pod у StatefulSet) забирає "
+             "свій processing-список одразу після рестарту, інакше його поверне інший воркер за heartbeat TTL",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.worker_id))
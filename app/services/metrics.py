@@ -0,0 +1,370 @@
+"""
+Метрики застосунку у форматі Prometheus (GET /metrics).
+
+Джерела:
+- MetricsMiddleware — латентність і кількість запитів по маршрутах, запити в обробці;
+- instrument_queries — кількість SQL-запитів і час у БД на один HTTP-запит;
+- AuthService.get_current_user — влучання/промахи кешу користувачів у Redis;
+- ContactsCache.fetch — влучання/промахи кешу читань контактів;
+- pool_metrics — стан і лічильники пулів з'єднань з БД (primary/replica).
+
+Запис — це інкременти в словниках воркера, без локів і без I/O; у формат
+Prometheus значення перетворюються лише під час запиту /metrics. Словники змінює
+лише потік event loop, тож і знімок (копія) береться на ньому; файли та
+рендеринг — у потоці, щоб не блокувати loop.
+
+З кількома воркерами uvicorn задайте PROMETHEUS_MULTIPROC_DIR (порожній каталог,
+що очищається перед стартом): кожен воркер раз на FLUSH_INTERVAL секунд
+записує знімок своїх значень у власний файл, а /metrics будь-якого воркера
+підсумовує всі файли. Лічильники завершених воркерів зберігаються в сумі,
+запити "в обробці" враховуються лише для живих процесів.
+"""
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware import route_template
+from app.services.pool_metrics import active_pools
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+FLUSH_INTERVAL = 1.0  # секунд між записами знімка воркера в multiprocess-режимі
+
+# Для шляхів без маршруту (404): сирий шлях у мітці роздув би кількість рядів
+UNMATCHED_ROUTE = "unmatched"
+
+# Поля PoolMetrics.snapshot(): (назва метрики, опис). Gauge — поточний стан пулу воркера,
+# у multiprocess-режимі сумується лише по живих процесах; counter — накопичені лічильники
+DB_POOL_GAUGES = {
+    "size": ("db_pool_size", "Розмір пулу з'єднань з БД"),
+    "checked_out": ("db_pool_checked_out", "З'єднання пулу, видані сесіям"),
+    "overflow": ("db_pool_overflow", "З'єднання понад розмір пулу"),
+}
+DB_POOL_COUNTERS = {
+    "checkouts": ("db_pool_checkouts", "Видачі з'єднань з пулу"),
+    "connects": ("db_pool_connects", "Нові з'єднання з БД"),
+    "invalidations": ("db_pool_invalidations", "Інвалідовані з'єднання"),
+    "timeouts": ("db_pool_timeouts", "Запити, що не дочекались з'єднання за pool_timeout"),
+    "waits": ("db_pool_waits", "Очікування сесією з'єднання з пулу"),
+    "wait_seconds": ("db_pool_wait_seconds", "Сумарний час очікування з'єднання з пулу"),
+}
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    """Некумулятивні лічильники по бакетах (останній — +Inf) і сума спостережень."""
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricsStore:
+    """Значення метрик одного воркера."""
+
+    HISTOGRAMS = {
+        # назва: (опис, мітки, бакети)
+        "http_request_duration_seconds": ("Час обробки HTTP-запиту", ("method", "route", "status"), LATENCY_BUCKETS),
+        "http_request_db_queries": ("Кількість SQL-запитів на HTTP-запит", ("method", "route"), QUERY_COUNT_BUCKETS),
+        "http_request_db_seconds": ("Сумарний час SQL-запитів на HTTP-запит", ("method", "route"), DB_TIME_BUCKETS),
+    }
+
+    def __init__(self):
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+        self.latency = self.histograms["http_request_duration_seconds"]
+        self.queries = self.histograms["http_request_db_queries"]
+        self.db_time = self.histograms["http_request_db_seconds"]
+        self.in_progress: dict[str, int] = {}
+        self.user_cache = {"hit": 0, "miss": 0}
+        self.contacts_cache = {"hit": 0, "miss": 0}
+        self._seq = itertools.count(1)
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route, str(status))
+        latency = self.latency.get(key)
+        if latency is None:
+            latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+        latency.observe(seconds)
+
+        key = (method, route)
+        queries = self.queries.get(key)
+        if queries is None:
+            queries = self.queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.db_time[key] = Histogram(DB_TIME_BUCKETS)
+        queries.observe(stats.queries)
+        self.db_time[key].observe(stats.db_seconds)
+
+    def snapshot(self) -> dict:
+        """Копія значень. Викликати в потоці event loop: там словники змінюються без локів."""
+        return {
+            "pid": os.getpid(),
+            "seq": next(self._seq),
+            "histograms": {
+                name: [[list(labels), list(h.counts), h.sum] for labels, h in series.items()]
+                for name, series in self.histograms.items()
+            },
+            "in_progress": dict(self.in_progress),
+            "user_cache": dict(self.user_cache),
+            "contacts_cache": dict(self.contacts_cache),
+            "db_pools": [[pool.name, pool.snapshot()] for pool in active_pools()],
+        }
+
+
+store = MetricsStore()
+
+
+def record_request(method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+    store.record_request(method, route, status, seconds, stats)
+
+
+def count_user_cache(hit: bool) -> None:
+    store.user_cache["hit" if hit else "miss"] += 1
+
+
+def count_contacts_cache(hit: bool) -> None:
+    store.contacts_cache["hit" if hit else "miss"] += 1
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        in_progress = store.in_progress
+        in_progress[method] = in_progress.get(method, 0) + 1
+        started = perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            in_progress[method] -= 1
+            _current.reset(token)
+            store.record_request(method, route_template(scope) or UNMATCHED_ROUTE, status, elapsed, stats)
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """Рахує SQL-запити engine і час їх виконання в межах поточного HTTP-запиту."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += perf_counter() - context._metrics_started
+
+
+class WorkerSnapshots:
+    """Файли зі знімками воркерів у PROMETHEUS_MULTIPROC_DIR."""
+
+    def __init__(self, directory: str, store: MetricsStore):
+        self.directory = directory
+        self.store = store
+        # Час старту в імені: новий воркер з тим самим pid не перезапише лічильники попереднього
+        self.path = os.path.join(directory, f"metrics-{os.getpid()}-{time.time_ns()}.json")
+        self._lock = threading.Lock()
+        self._written_seq = 0
+
+    def flush(self) -> None:
+        self.write(self.store.snapshot())
+
+    def write(self, snapshot: dict) -> None:
+        """
+        Атомарно замінює файл воркера знімком. Безпечно з кількох потоків:
+        у кожного запису власний тимчасовий файл, а старіший знімок не перезаписує новіший.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            with self._lock:
+                if snapshot["seq"] < self._written_seq:
+                    os.unlink(tmp)
+                    return
+                os.replace(tmp, self.path)
+                self._written_seq = snapshot["seq"]
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+
+    def load_all(self) -> list[dict]:
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if name.startswith("metrics-") and name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # файл саме замінюється або пошкоджений
+        return snapshots
+
+    async def run_flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await asyncio.to_thread(self.write, self.store.snapshot())
+
+
+snapshots = WorkerSnapshots(MULTIPROC_DIR, store) if MULTIPROC_DIR else None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots: list[dict]) -> dict:
+    """Сума знімків воркерів; in_progress — лише живих процесів."""
+    merged = {
+        "histograms": {name: {} for name in MetricsStore.HISTOGRAMS},
+        "in_progress": {}, "user_cache": {}, "contacts_cache": {}, "db_pools": {},
+    }
+    for snapshot in snapshots:
+        for name, series in snapshot["histograms"].items():
+            target = merged["histograms"][name]
+            for labels, counts, total in series:
+                key = tuple(labels)
+                if key in target:
+                    target[key] = ([a + b for a, b in zip(target[key][0], counts)], target[key][1] + total)
+                else:
+                    target[key] = (counts, total)
+        alive = snapshot["pid"] == os.getpid() or _process_alive(snapshot["pid"])
+        if alive:
+            for method, value in snapshot["in_progress"].items():
+                merged["in_progress"][method] = merged["in_progress"].get(method, 0) + value
+        for name in ("user_cache", "contacts_cache"):
+            # .get: знімки, записані воркером попередньої версії, можуть не мати нових ключів
+            for result, value in snapshot.get(name, {}).items():
+                merged[name][result] = merged[name].get(result, 0) + value
+        for pool, values in snapshot.get("db_pools", []):
+            target = merged["db_pools"].setdefault(pool, {})
+            fields = (*DB_POOL_GAUGES, *DB_POOL_COUNTERS) if alive else DB_POOL_COUNTERS
+            for field in fields:
+                if values.get(field) is not None:
+                    target[field] = target.get(field, 0) + values[field]
+    return merged
+
+
+class _Collector:
+
+    def __init__(self, values: dict):
+        self.values = values
+
+    def collect(self):
+        for name, (documentation, label_names, bounds) in MetricsStore.HISTOGRAMS.items():
+            family = HistogramMetricFamily(name, documentation, labels=label_names)
+            for labels, (counts, total) in sorted(self.values["histograms"][name].items()):
+                cumulative, buckets = 0, []
+                for bound, count in zip((*map(str, bounds), "+Inf"), counts):
+                    cumulative += count
+                    buckets.append((bound, cumulative))
+                family.add_metric(list(labels), buckets, total)
+            yield family
+
+        in_progress = GaugeMetricFamily("http_requests_in_progress", "HTTP-запити в обробці", labels=["method"])
+        for method, value in sorted(self.values["in_progress"].items()):
+            in_progress.add_metric([method], value)
+        yield in_progress
+
+        user_cache = CounterMetricFamily(
+            "user_cache_redis_lookups", "Пошуки user:{email} у Redis в get_current_user", labels=["result"],
+        )
+        for result, value in sorted(self.values["user_cache"].items()):
+            user_cache.add_metric([result], value)
+        yield user_cache
+
+        contacts_cache = CounterMetricFamily(
+            "contacts_cache_lookups", "Читання контактів через кеш у Redis", labels=["result"],
+        )
+        for result, value in sorted(self.values["contacts_cache"].items()):
+            contacts_cache.add_metric([result], value)
+        yield contacts_cache
+
+        pools = sorted(self.values["db_pools"].items())
+        for fields, family_type in ((DB_POOL_GAUGES, GaugeMetricFamily), (DB_POOL_COUNTERS, CounterMetricFamily)):
+            for field, (name, documentation) in fields.items():
+                family = family_type(name, documentation, labels=["pool"])
+                for pool, values in pools:
+                    if field in values:
+                        family.add_metric([pool], values[field])
+                yield family
+
+
+def metrics_payload(snapshot: Optional[dict] = None) -> tuple[bytes, str]:
+    """
+    Тіло й content-type відповіді /metrics; у multiprocess-режимі — сума по всіх воркерах.
+    snapshot — знімок цього воркера, взятий у потоці event loop (див. MetricsStore.snapshot).
+    """
+    if snapshot is None:
+        snapshot = store.snapshot()
+    if snapshots is not None:
+        snapshots.write(snapshot)
+        values = merge(snapshots.load_all())
+    else:
+        values = merge([snapshot])
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(_Collector(values))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+_WAIT_STARTED = "pool_wait_started"
+
+
+@dataclass
+class PoolMetrics:
+    """
+    Лічильники пулу з'єднань одного engine.
+    checkouts/checkins/connects/invalidations рахують події пулу SQLAlchemy;
+    wait — час від першого запиту сесії до отримання нею з'єднання з пулу;
+    timeouts — запити, що не дочекались з'єднання за pool_timeout (рахує get_db).
+    """
+    name: str
+    pool: object = field(repr=False)
+    checkouts: int = 0
+    checkins: int = 0
+    connects: int = 0
+    invalidations: int = 0
+    timeouts: int = 0
+    waits: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.total_wait_seconds += seconds
+        if seconds > self.max_wait_seconds:
+            self.max_wait_seconds = seconds
+
+    def snapshot(self) -> dict:
+        """Поточний стан пулу разом з накопиченими лічильниками."""
+        pool = self.pool
+        state = {
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+        state.update(
+            checkouts=self.checkouts,
+            checkins=self.checkins,
+            connects=self.connects,
+            invalidations=self.invalidations,
+            timeouts=self.timeouts,
+            waits=self.waits,
+            wait_seconds=self.total_wait_seconds,
+            avg_wait_ms=(self.total_wait_seconds / self.waits * 1000) if self.waits else 0.0,
+            max_wait_ms=self.max_wait_seconds * 1000,
+        )
+        return state
+
+
+_registry: Dict[Engine, PoolMetrics] = {}
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> PoolMetrics:
+    """Підключає лічильники до пулу engine. Повторний виклик повертає ті самі метрики."""
+    sync_engine = engine.sync_engine
+    if sync_engine in _registry:
+        return _registry[sync_engine]
+    metrics = PoolMetrics(name=name, pool=sync_engine.pool)
+    _registry[sync_engine] = metrics
+
+    pool = sync_engine.pool
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    return metrics
+
+
+def metrics_for(engine: AsyncEngine) -> PoolMetrics:
+    return _registry[engine.sync_engine]
+
+
+def forget(engine: AsyncEngine) -> None:
+    """Прибирає метрики закритого engine з реєстру (database.dispose)."""
+    _registry.pop(engine.sync_engine, None)
+
+
+def active_pools() -> list:
+    """Метрики пулів усіх відкритих engine'ів — джерело db_pool_* у /metrics."""
+    return list(_registry.values())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_wait_start(orm_execute_state):
+    orm_execute_state.session.info.setdefault(_WAIT_STARTED, perf_counter())
+
+
+@event.listens_for(Session, "after_begin")
+def _record_wait(session, transaction, connection):
+    # after_begin спрацьовує одразу після того, як сесія отримала з'єднання з пулу
+    started = session.info.pop(_WAIT_STARTED, None)
+    metrics = _registry.get(connection.engine)
+    if started is not None and metrics is not None:
+        metrics.record_wait(perf_counter() - started)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _reset_wait_start(session, transaction):
+    session.info.pop(_WAIT_STARTED, None)
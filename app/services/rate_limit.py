@@ -0,0 +1,298 @@
+"""
+Rate limiting по користувачу з локальними token bucket'ами.
+
+Рішення приймається в пам'яті воркера без звернення до Redis. Раз на
+sync_interval секунд воркер одним pipeline додає свою витрату до лічильника
+поточного вікна в Redis (rl:<маршрут>:<суб'єкт>:<вікно>) і обрізає локальні
+bucket'и до того, що лишилось у спільній квоті. Отже перевищення між
+воркерами обмежене тим, що встигає наповнитись за один інтервал синхронізації.
+Якщо Redis недоступний, ліміти продовжують діяти локально.
+
+Суб'єкт — користувач з Bearer-токена, для анонімних маршрутів входу й реєстрації —
+обліковий запис з тіла запиту, інакше IP клієнта (див. SubjectResolver).
+"""
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+from dataclasses import dataclass
+from time import monotonic
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.middleware import route_template
+from app.services.cache import TTLCache
+from app.services.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: int  # запитів
+    period: float  # за стільки секунд
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Limit"]:
+        """"10/60" -> Limit(10, 60); "off" -> None (маршрут не обмежується)."""
+        if spec.strip().lower() == "off":
+            return None
+        rate, _, period = spec.partition("/")
+        limit = cls(int(rate), float(period))
+        if limit.rate <= 0 or limit.period <= 0:
+            raise ValueError(f"Invalid rate limit: {spec!r}")
+        return limit
+
+
+class TokenBucket:
+    __slots__ = ("limit", "tokens", "updated", "pending")
+
+    def __init__(self, limit: Limit, now: float):
+        self.limit = limit
+        self.tokens = float(limit.rate)
+        self.updated = now
+        self.pending = 0  # витрачено з останньої синхронізації з Redis
+
+    @property
+    def fill_rate(self) -> float:
+        return self.limit.rate / self.limit.period
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.limit.rate, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        self.refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.pending += 1
+        return True
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: Limit
+    remaining: int
+    reset: int  # секунд до повного наповнення
+    retry_after: int  # секунд до наступного дозволеного запиту (0, якщо дозволено)
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit.rate),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+            "RateLimit-Policy": f"{self.limit.rate};w={int(self.limit.period)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class RateLimiter:
+
+    def __init__(
+            self,
+            redis_client=None,
+            *,
+            default: Optional[Limit],
+            limits: dict[str, Optional[Limit]],
+            sync_interval: float = 1.0,
+            enabled: bool = True,
+    ):
+        self._redis_client = redis_client
+        self.default = default
+        self.limits = limits
+        self.sync_interval = sync_interval
+        self.enabled = enabled
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    @property
+    def redis_client(self):
+        # None — спільний клієнт воркера з app/services/redis_pool.py
+        return self._redis_client if self._redis_client is not None else get_redis()
+
+    def limit_for(self, route_key: str) -> Optional[Limit]:
+        return self.limits.get(route_key, self.default)
+
+    def hit(
+            self, route_key: str, subject: str, now: Optional[float] = None, limit: Optional[Limit] = None
+    ) -> Optional[Decision]:
+        """Списує один токен. None — маршрут не обмежується. limit замінює ліміт маршруту. Без I/O."""
+        if not self.enabled:
+            return None
+        limit = limit or self.limit_for(route_key)
+        if limit is None:
+            return None
+        now = monotonic() if now is None else now
+        bucket = self._buckets.get((route_key, subject))
+        if bucket is None:
+            bucket = self._buckets[(route_key, subject)] = TokenBucket(limit, now)
+        allowed = bucket.take(now)
+        return Decision(
+            allowed=allowed,
+            limit=limit,
+            remaining=int(bucket.tokens),
+            reset=math.ceil((limit.rate - bucket.tokens) / bucket.fill_rate),
+            retry_after=0 if allowed else math.ceil((1 - bucket.tokens) / bucket.fill_rate),
+        )
+
+    @staticmethod
+    def window_key(route_key: str, subject: str, limit: Limit, wall_time: float) -> str:
+        return f"rl:{route_key}:{subject}:{int(wall_time // limit.period)}"
+
+    async def sync(self) -> None:
+        """
+        Одним pipeline додає локальну витрату до спільних лічильників вікон і
+        обрізає bucket'и до залишку спільної квоти. Давно не використані bucket'и видаляються.
+        """
+        now = monotonic()
+        wall_time = time.time()
+        active = []
+        for key, bucket in list(self._buckets.items()):
+            if bucket.pending == 0 and now - bucket.updated > bucket.limit.period:
+                del self._buckets[key]
+            else:
+                active.append((key, bucket, bucket.pending))
+        if not active:
+            return
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for (route_key, subject), bucket, pending in active:
+                window = self.window_key(route_key, subject, bucket.limit, wall_time)
+                pipe.incrby(window, pending)
+                pipe.expire(window, math.ceil(bucket.limit.period) + 1)
+            results = await pipe.execute()
+
+        now = monotonic()
+        for (_, bucket, pending), used in zip(active, results[::2]):
+            bucket.pending -= pending
+            bucket.refill(now)
+            bucket.tokens = min(bucket.tokens, max(bucket.limit.rate - int(used), 0))
+
+    async def run_sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except RedisError as err:
+                logger.warning("Rate limit sync failed, limiting locally: %s", err)
+
+
+class SubjectResolver:
+    """
+    Ключ rate limit для запиту: користувач з валідного Bearer-токена; для маршрутів з
+    account_fields — обліковий запис з поля форми/JSON (для account_ip_routes — разом з IP
+    клієнта); інакше IP клієнта.
+    Розібрані токени кешуються, щоб не перевіряти підпис JWT на кожен запит.
+    """
+
+    def __init__(
+            self,
+            decode,
+            account_fields: Optional[dict[str, str]] = None,
+            account_ip_routes: Iterable[str] = (),
+            trusted_proxies: Iterable[str] = (),
+            cache_size: int = 10_000,
+            cache_ttl: float = 60,
+    ):
+        self.decode = decode
+        self.account_fields = account_fields or {}
+        self.account_ip_routes = set(account_ip_routes)
+        self.trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+        self._tokens = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_ip(self, request: Request) -> str:
+        """Адреса з'єднання; якщо це довірений проксі — найправіша не-проксі адреса з X-Forwarded-For."""
+        peer = request.client.host if request.client else "unknown"
+        if not self.trusted_proxies or not self._trusted(peer):
+            return peer
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        for address in reversed(forwarded):
+            if not self._trusted(address):
+                return address
+        return forwarded[0] if forwarded else peer
+
+    @staticmethod
+    async def _body_field(request: Request, field: str) -> Optional[str]:
+        # FastAPI уже прочитав тіло для параметрів маршруту, Request повертає його з кешу
+        try:
+            if "application/json" in request.headers.get("content-type", ""):
+                data = await request.json()
+                value = data.get(field) if isinstance(data, dict) else None
+            else:
+                value = (await request.form()).get(field)
+        except ValueError:
+            return None
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+    async def __call__(self, request: Request, route_key: str) -> str:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            subject = self._tokens.get(token)
+            if subject is None:
+                subject = self.decode(token) or ""
+                self._tokens.set(token, subject)
+            if subject:
+                return f"user:{subject}"
+        field = self.account_fields.get(route_key)
+        if field is not None:
+            account = await self._body_field(request, field)
+            if account is not None:
+                if route_key in self.account_ip_routes:
+                    return f"account:{account}|ip:{self.client_ip(request)}"
+                return f"account:{account}"
+        return f"ip:{self.client_ip(request)}"
+
+
+def route_key(request: Request) -> str:
+    """"МЕТОД шаблон-шляху", напр. "GET /api/contacts/{contact_id}" — ключ налаштувань rate_limits."""
+    scope = request.scope
+    return f"{scope['method']} {route_template(scope) or scope['path']}"
+
+
+def rate_limit_dependency(limiter: RateLimiter, resolve_subject):
+    async def enforce_rate_limit(request: Request) -> None:
+        """
+        Залежність рівня застосунку. Рішення кладеться в request.state.rate_limit,
+        звідки RateLimitHeadersMiddleware додає заголовки до будь-якої відповіді.
+        """
+        key = route_key(request)
+        subject = await resolve_subject(request, key)
+        decision = limiter.hit(key, subject)
+        if decision is None:
+            return
+        if subject.startswith("account:"):
+            # Загальний ліміт на IP поверх ліміту облікового запису. Окремий простір ключів:
+            # "ip:" — bucket анонімних запитів без облікового запису з лімітом маршруту
+            per_ip = limiter.hit(key, f"ipcap:{resolve_subject.client_ip(request)}", limit=limiter.default)
+            if per_ip is not None and not per_ip.allowed:
+                decision = per_ip
+        request.state.rate_limit = decision
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers=decision.headers(),
+            )
+    return enforce_rate_limit
+
+
+rate_limiter = RateLimiter(
+    default=Limit.parse(settings.rate_limit_default),
+    limits={route: Limit.parse(spec) for route, spec in settings.rate_limits.items()},
+    sync_interval=settings.rate_limit_sync_interval,
+    enabled=settings.rate_limit_enabled,
+)
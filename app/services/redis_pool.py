@@ -0,0 +1,55 @@
+"""
+Спільний пул з'єднань Redis веб-воркера.
+
+Кеш користувачів, кеш контактів, rate limiting і outbox пошти працюють через
+один клієнт з BlockingConnectionPool: кількість з'єднань обмежена
+redis_max_connections, а коли всі зайняті, запит чекає не довше за
+redis_pool_timeout. Таймаути сокетів не дають запиту зависнути на недоступному
+Redis. Пул створює lifespan застосунку (connect()) і він же закриває (close());
+сервіси беруть клієнт через get_redis() у момент запиту.
+"""
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.config import Settings, get_settings
+
+# Як і engine'и в app/database.py: не при імпорті, а в lifespan або при першому get_redis()
+pool: Optional[redis.BlockingConnectionPool] = None
+client: Optional[redis.Redis] = None
+
+
+def create_pool(settings: Settings) -> redis.BlockingConnectionPool:
+    return redis.BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+    )
+
+
+def connect() -> redis.Redis:
+    """Створює пул і клієнт воркера. Повторний виклик нічого не робить. З'єднання відкриваються при першій команді."""
+    global pool, client
+    if client is None:
+        pool = create_pool(get_settings())
+        client = redis.Redis(connection_pool=pool)
+    return client
+
+
+def get_redis() -> redis.Redis:
+    """Спільний клієнт воркера; поза lifespan (скрипти, тести) створюється при першому виклику."""
+    return client if client is not None else connect()
+
+
+async def close() -> None:
+    """Закриває з'єднання пулу (завершення lifespan)."""
+    global pool, client
+    if client is not None:
+        await client.aclose()
+        await pool.disconnect()
+    pool = client = None
@@ -0,0 +1,18 @@
+import os
+
+# Бенчмарки не надсилають пошту й не ходять у Cloudinary, але app.config вимагає ці
+# налаштування при імпорті — підставляємо заглушки, якщо їх немає в оточенні (як у tests/conftest.py).
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("secret_key", "benchmark-secret")
+os.environ.setdefault("algorithm", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "7")
+os.environ.setdefault("mail_username", "bench@example.com")
+os.environ.setdefault("mail_password", "password")
+os.environ.setdefault("mail_from", "noreply@example.com")
+os.environ.setdefault("mail_port", "587")
+os.environ.setdefault("mail_server", "smtp.example.com")
+os.environ.setdefault("cloudinary_name", "demo")
+os.environ.setdefault("cloudinary_api_key", "1234567890")
+os.environ.setdefault("cloudinary_api_secret", "secret")
+os.environ.setdefault("CONTACTS_CACHE_ENABLED", "0")
@@ -0,0 +1,80 @@
+"""
+Латентність "читання контактів" під час шторму логінів.
+
+Імітує воркер uvicorn: один event loop, на якому паралельно виконуються
+перевірки паролів bcrypt і легкі запити читання (await на I/O ~2 мс).
+Порівнює синхронний pwd_context.verify в обробнику з PasswordHasher.
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from app.services.hashing import PasswordHasher
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+async def reader(stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.002)  # запит до БД
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+async def storm(verify, hashed: str, logins: int, concurrency: int) -> None:
+    if logins == 0:
+        await asyncio.sleep(0.5)
+        return
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await verify("secret123", hashed)
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def run(name: str, verify, hashed: str, logins: int, concurrency: int, readers: int) -> None:
+    stop = asyncio.Event()
+    samples: list = []
+    tasks = [asyncio.create_task(reader(stop, samples)) for _ in range(readers)]
+    started = time.perf_counter()
+    await storm(verify, hashed, logins, concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<10} logins/s {logins / elapsed:7.1f}   read p50 {p50:7.2f} ms   read p99 {p99:8.2f} ms")
+
+
+async def main(logins: int, concurrency: int, workers: int, readers: int) -> None:
+    hashed = pwd_context.hash("secret123")
+
+    async def inline_verify(plain: str, hashed_password: str) -> bool:
+        return pwd_context.verify(plain, hashed_password)
+
+    hasher = PasswordHasher(pwd_context, workers=workers, max_queue=logins)
+
+    await run("idle", inline_verify, hashed, 0, concurrency, readers)
+    await run("inline", inline_verify, hashed, logins, concurrency, readers)
+    await run("offloaded", hasher.verify, hashed, logins, concurrency, readers)
+    print(f"hasher stats: {hasher.stats}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency, args.workers, args.readers))
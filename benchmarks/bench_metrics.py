@@ -0,0 +1,83 @@
+"""
+Вартість запису метрик (див. app/services/metrics.py): record_request, пара хуків
+курсора SQLAlchemy на один SQL-запит і MetricsMiddleware навколо порожнього
+ASGI-застосунку порівняно з тим самим застосунком без middleware.
+
+Запуск (з кореня репозиторію):
+    python -m benchmarks.bench_metrics --repeat 100000
+
+Запис однаковий і в multiprocess-режимі: знімки у файли пишуться фоновою задачею.
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.metrics import (
+    MetricsMiddleware, RequestStats, _after_cursor_execute, _before_cursor_execute, _current, record_request,
+)
+
+
+class Route:
+    path = "/contacts/{contact_id}"
+    path_format = "/contacts/{contact_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    scope["path_params"] = {"contact_id": 1}
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def asgi_us(app, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await app({"type": "http", "method": "GET", "path": "/api/contacts/1"}, receive, send)
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+def hooks_us(repeat: int) -> float:
+    context = type("ExecutionContext", (), {})()
+    token = _current.set(RequestStats())
+    started = time.perf_counter()
+    for _ in range(repeat):
+        _before_cursor_execute(None, None, "SELECT 1", (), context, False)
+        _after_cursor_execute(None, None, "SELECT 1", (), context, False)
+    elapsed = time.perf_counter() - started
+    _current.reset(token)
+    return elapsed / repeat * 1_000_000
+
+
+async def main(repeat: int) -> None:
+    stats = RequestStats()
+    stats.queries, stats.db_seconds = 3, 0.002
+    started = time.perf_counter()
+    for _ in range(repeat):
+        record_request("GET", "/api/contacts/{contact_id}", 200, 0.01, stats)
+    results = {"record_request()": (time.perf_counter() - started) / repeat * 1_000_000}
+
+    bare = await asgi_us(endpoint, repeat)
+    wrapped = await asgi_us(MetricsMiddleware(endpoint), repeat)
+    results.update({"ASGI call, bare": bare, "ASGI call, middleware": wrapped})
+
+    results["cursor hooks per query"] = hooks_us(repeat)
+
+    print(f"mean of {repeat} calls")
+    for name, us in results.items():
+        print(f"  {name:<24} {us:8.2f} us")
+    print(f"  middleware per request   {wrapped - bare:8.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,79 @@
+"""
+Додаткова затримка rate limiting на запит (див. app/services/rate_limit.py):
+рішення по локальному bucket'у, визначення суб'єкта (з кешем і без кешу JWT)
+та повний запит до легкого ендпоінта з лімітером і без нього.
+
+Запуск (з кореня репозиторію):
+    python -m benchmarks.bench_rate_limit --repeat 20000
+
+Redis не потрібен: синхронізація з Redis іде фоновою задачею і в вимір не входить.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from httpx import ASGITransport, AsyncClient
+from starlette.requests import Request
+
+from app.auth import auth_service
+from app.main import app
+from app.services.rate_limit import Limit, SubjectResolver, rate_limiter, route_key
+
+
+def us_per_call(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+async def request_us(client: AsyncClient, headers: dict, repeat: int) -> tuple[float, float]:
+    """Медіана запиту без лімітера і з ним; виміри чергуються, щоб прогрів не спотворював різницю."""
+    samples = {False: [], True: []}
+    for i in range(repeat * 2):
+        rate_limiter.enabled = bool(i % 2)
+        started = time.perf_counter()
+        await client.get("/", headers=headers)
+        samples[rate_limiter.enabled].append((time.perf_counter() - started) * 1_000_000)
+    return statistics.median(samples[False]), statistics.median(samples[True])
+
+
+async def main(repeat: int) -> None:
+    token = await auth_service.create_access_token(data={"sub": "bench@example.com"})
+    headers = {"Authorization": f"Bearer {token}"}
+    request = Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"",
+        "headers": [(b"authorization", headers["Authorization"].encode())], "client": ("127.0.0.1", 1),
+    })
+    cached = SubjectResolver(auth_service.token_subject)
+    uncached = SubjectResolver(auth_service.token_subject, cache_ttl=0)
+
+    rate_limiter.enabled = True
+    rate_limiter.default = Limit(10 ** 9, 60)
+    rate_limiter.limits = {}
+    results = {
+        "hit()": us_per_call(lambda: rate_limiter.hit("GET /", "user:bench@example.com"), repeat),
+        "route_key()": us_per_call(lambda: route_key(request), repeat),
+        "subject, cached token": us_per_call(lambda: cached(request), repeat),
+        "subject, JWT decode": us_per_call(lambda: uncached(request), repeat // 10),
+    }
+
+    requests = max(repeat // 20, 100)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        results["GET /, limiter off"], results["GET /, limiter on"] = await request_us(client, headers, requests)
+
+    print(f"mean per call ({repeat} runs), median per request ({requests} requests)")
+    for name, us in results.items():
+        print(f"  {name:<24} {us:9.2f} us")
+    print(f"  added per request        {results['GET /, limiter on'] - results['GET /, limiter off']:9.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,130 @@
+"""
+CPU на сторінку списку контактів: звичайний шлях (ORM -> ContactResponse ->
+валідація response_model -> json) проти швидкого (кортежі колонок -> orjson),
+див. settings.contacts_fast_serialization.
+
+Запуск (з кореня репозиторію):
+    python -m benchmarks.bench_serialization --page-size 100 --repeat 500
+
+Без BENCH_DATABASE_URL використовується тимчасова SQLite-база.
+Скрипт створює таблиці у вказаній базі, тому не запускайте його на робочій БД.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert, delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app import crud, schemas
+from app.database import Base
+from app.models import User, Contact
+from app.router_contacts import _dump_contacts
+
+# Те, що FastAPI робить з результатом ендпоінта з response_model=List[ContactResponse]
+response_adapter = TypeAdapter(List[schemas.ContactResponse])
+
+
+def render_standard(contacts: List[dict]) -> bytes:
+    validated = response_adapter.validate_python(contacts)
+    content = response_adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_fast(contacts: List[dict]) -> bytes:
+    return orjson.dumps(contacts)
+
+
+async def seed(session: AsyncSession, total: int) -> User:
+    await session.execute(delete(Contact))
+    await session.execute(delete(User))
+    user = User(email="bench@example.com", hashed_password="x", confirmed=True)
+    session.add(user)
+    await session.flush()
+    await session.execute(insert(Contact), [
+        {
+            "first_name": f"First{i:04d}",
+            "last_name": f"Last{i:04d}",
+            "email": f"contact{i}@example.com",
+            "phone": f"+380{i:09d}",
+            "birthday": date(1990, 1 + i % 12, 1 + i % 28),
+            "birthday_key": (1 + i % 12) * 100 + 1 + i % 28,
+            "additional_data": "Lorem ipsum dolor sit amet" if i % 3 else None,
+            "user_id": user.id,
+        }
+        for i in range(total)
+    ])
+    await session.commit()
+    return user
+
+
+async def cpu_ms(coro_factory, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        await coro_factory()
+        samples.append((time.process_time() - started) * 1000)
+    return statistics.mean(samples)
+
+
+async def main(page_size: int, repeat: int) -> None:
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as session:
+        user = await seed(session, page_size)
+
+        async def standard_page():
+            contacts = await crud.get_contacts(session, skip=0, limit=page_size, user=user)
+            return render_standard(_dump_contacts(contacts))
+
+        async def fast_page():
+            rows = await crud.get_contacts(session, skip=0, limit=page_size, user=user, columns=crud.RESPONSE_COLUMNS)
+            return render_fast([row._asdict() for row in rows])
+
+        assert orjson.loads(await standard_page()) == orjson.loads(await fast_page())
+
+        # Лише серіалізація, без БД: з уже завантажених об'єктів / кортежів
+        objects = await crud.get_contacts(session, skip=0, limit=page_size, user=user)
+        rows = await crud.get_contacts(session, skip=0, limit=page_size, user=user, columns=crud.RESPONSE_COLUMNS)
+
+        async def standard_serialize():
+            return render_standard(_dump_contacts(objects))
+
+        async def fast_serialize():
+            return render_fast([row._asdict() for row in rows])
+
+        results = {
+            "page, standard": await cpu_ms(standard_page, repeat),
+            "page, fast": await cpu_ms(fast_page, repeat),
+            "serialize, standard": await cpu_ms(standard_serialize, repeat),
+            "serialize, fast": await cpu_ms(fast_serialize, repeat),
+        }
+
+    await engine.dispose()
+    print(f"page size {page_size}, mean CPU time of {repeat} runs")
+    for name, ms in results.items():
+        print(f"  {name:<22} {ms:8.3f} ms")
+    saved = results["page, standard"] - results["page, fast"]
+    print(f"  CPU saved per page     {saved:8.3f} ms ({saved / results['page, standard']:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.repeat))
@@ -0,0 +1,95 @@
+"""
+Час імпорту застосунку і холодного старту воркера.
+
+Кожен прогін — окремий процес: `import app.main`, потім lifespan до моменту, коли
+застосунок готовий приймати запити (пул БД, сховище аватарів, фонові задачі).
+Друкуються медіани та найважчі пакети за `python -X importtime`; з бюджетами
+скрипт завершується з кодом 1, якщо медіана їх перевищує (для CI).
+
+Запуск (з кореня репозиторію):
+    python -m benchmarks.bench_startup --runs 9 --import-budget-ms 900 --startup-budget-ms 50
+
+Бюджет залежить від машини: заміряйте базову лінію на тому ж раннері.
+Redis для заміру не потрібен: фонові задачі лише стартують і зупиняються.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+import benchmarks  # noqa: F401  (заглушки налаштувань в os.environ)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import asyncio, json, time
+started = time.process_time()
+from app.main import app
+imported = time.process_time()
+
+async def start():
+    async with app.router.lifespan_context(app):
+        ready = time.process_time()
+    return ready
+
+ready = asyncio.run(start())
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+
+def run_python(args: list) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=PROJECT_ROOT, env=dict(os.environ),
+        check=True, capture_output=True, text=True,
+    )
+
+
+def cold_start() -> dict:
+    return json.loads(run_python(["-c", COLD_START]).stdout.strip().splitlines()[-1])
+
+
+def heaviest_packages(top: int) -> list:
+    """Власний час імпорту (self), підсумований по пакетах верхнього рівня, мс."""
+    stderr = run_python(["-X", "importtime", "-c", "import app.main"]).stderr
+    totals = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = ".".join(name.split(".")[:2]) if name.startswith("app.") else name.split(".")[0]
+        totals[package] += int(self_us) / 1000
+    return totals.most_common(top)
+
+
+def main(runs: int, top: int, import_budget: float, startup_budget: float) -> int:
+    samples = [cold_start() for _ in range(runs)]
+    import_ms = statistics.median(s["import"] for s in samples) * 1000
+    startup_ms = statistics.median(s["startup"] for s in samples) * 1000
+
+    print(f"median of {runs} processes")
+    print(f"  import app.main   {import_ms:8.1f} ms")
+    print(f"  lifespan startup  {startup_ms:8.1f} ms")
+    print(f"\nheaviest imports (self time, -X importtime)")
+    for package, ms in heaviest_packages(top):
+        print(f"  {package:<28} {ms:8.1f} ms")
+
+    failed = False
+    for name, value, budget in (("import", import_ms, import_budget), ("startup", startup_ms, startup_budget)):
+        if budget and value > budget:
+            print(f"\n{name} {value:.1f} ms exceeds budget {budget:.1f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--import-budget-ms", type=float, default=0, help="0 — не перевіряти")
+    parser.add_argument("--startup-budget-ms", type=float, default=0, help="0 — не перевіряти")
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.top, args.import_budget_ms, args.startup_budget_ms))
@@ -1,13 +1,23 @@
+import fnmatch
 import os
 import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(os.path.join(__file__, os.pardir)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-os.environ.setdefault("sqlalchemy_database_uri", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 os.environ.setdefault("secret_key", "testsecret")
 os.environ.setdefault("algorithm", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "15")
+os.environ.setdefault("REFRESH_TOKEN_EXPIRE_DAYS", "7")
 
 os.environ.setdefault("mail_username", "test@example.com")
 os.environ.setdefault("mail_password", "password")
@@ -19,4 +29,261 @@ os.environ.setdefault("cloudinary_name", "demo")
 os.environ.setdefault("cloudinary_api_key", "1234567890")
 os.environ.setdefault("cloudinary_api_secret", "secret")
 
-os.environ.setdefault("DISABLE_RATE_LIMITER", "1")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("CONTACTS_CACHE_ENABLED", "0")
+
+# Після налаштувань оточення: частина модулів app читає settings при імпорті
+from app.auth import auth_service  # noqa: E402
+from app.database import Base, get_db, get_replica_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+
+
+class FakeRedis:
+    """
+    In-memory підмножина Redis, якою користуються сервіси застосунку: рядки й лічильники,
+    списки, множини, ZSET, PUBLISH і pipeline. executed — кількість виконаних pipeline.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.lists = {}
+        self.sets = {}
+        self.zsets = {}
+        self.published = []
+        self.executed = 0
+
+    def _stores(self):
+        return self.data, self.lists, self.sets, self.zsets
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        if ex is not None:
+            self.expiry[key] = ex
+        return True
+
+    async def incr(self, key):
+        return await self.incrby(key, 1)
+
+    async def incrby(self, key, amount):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    async def expire(self, key, seconds):
+        self.expiry[key] = seconds
+        return True
+
+    async def exists(self, *keys):
+        return sum(any(key in store for store in self._stores()) for key in keys)
+
+    async def delete(self, *keys):
+        return sum(
+            any(store.pop(key, None) is not None for store in self._stores())
+            for key in keys
+        )
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    async def scan_iter(self, match=None, count=None):
+        for key in [key for store in self._stores() for key in store]:
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def _list(self, key):
+        return self.lists.setdefault(key, [])
+
+    async def lpush(self, key, *values):
+        for value in values:
+            self._list(key).insert(0, value)
+        return len(self.lists[key])
+
+    async def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def lmove(self, src, dst, wherefrom, whereto):
+        source = self.lists.get(src)
+        if not source:
+            return None
+        value = source.pop(0 if wherefrom == "LEFT" else -1)
+        if not source:
+            del self.lists[src]
+        if whereto == "LEFT":
+            self._list(dst).insert(0, value)
+        else:
+            self._list(dst).append(value)
+        return value
+
+    async def blmove(self, src, dst, timeout, wherefrom, whereto):
+        return await self.lmove(src, dst, wherefrom, whereto)
+
+    async def lrem(self, key, count, value):
+        items = self.lists.get(key, [])
+        if value not in items:
+            return 0
+        items.remove(value)
+        if not items:
+            del self.lists[key]
+        return 1
+
+    async def sadd(self, key, *members):
+        members = set(members) - self.sets.get(key, set())
+        self.sets.setdefault(key, set()).update(members)
+        return len(members)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def srem(self, key, *members):
+        items = self.sets.get(key, set())
+        removed = len(items & set(members))
+        items.difference_update(members)
+        if not items:
+            self.sets.pop(key, None)
+        return removed
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None):
+        items = sorted(self.zsets.get(key, {}).items(), key=lambda kv: kv[1])
+        return [member for member, score in items if score <= high][start:num]
+
+    async def zrem(self, key, member):
+        return 1 if self.zsets.get(key, {}).pop(member, None) is not None else 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis.executed += 1
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class AppDatabase:
+    """
+    Тимчасова SQLite-база, підставлена в app через dependency_overrides, і поточний користувач
+    (id=1). Створюється й закривається в event loop тесту:
+
+        await app_db.start(Contact(...), ...)
+        ...
+        await app_db.stop()
+
+    start() додає власника (User id=1) і передані рядки, stop() відновлює попередні overrides.
+    """
+
+    def __init__(self, path: Path, dependencies=(get_db, get_replica_db)):
+        self.path = path
+        self.dependencies = dependencies
+        self.user = User(id=1, email="test@example.com", confirmed=True)
+        self.engine = None
+        self.session_factory = None
+        self._previous_overrides = None
+
+    async def start(self, *rows, password_hash: str = "x") -> None:
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{self.path}")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session_factory = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        async with self.session_factory() as session:
+            session.add(User(id=1, email=self.user.email, hashed_password=password_hash, confirmed=True))
+            session.add_all(rows)
+            await session.commit()
+
+        self._previous_overrides = dict(app.dependency_overrides)
+        app.dependency_overrides.update({dependency: self.session for dependency in self.dependencies})
+        app.dependency_overrides[auth_service.get_current_user] = lambda: self.user
+
+    async def session(self):
+        async with self.session_factory() as session:
+            yield session
+
+    def replica(self) -> "AppDatabase":
+        """Друга база в тому ж каталозі, підставлена лише замість get_replica_db."""
+        return AppDatabase(self.path.with_name(f"replica-{self.path.name}"), dependencies=(get_replica_db,))
+
+    async def stop(self) -> None:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(self._previous_overrides)
+        await self.engine.dispose()
+
+
+def _bind(request, name, value):
+    """Для unittest-класів (@pytest.mark.usefixtures) фікстура стає атрибутом тесту."""
+    if request.instance is not None:
+        setattr(request.instance, name, value)
+    return value
+
+
+@pytest.fixture
+def fake_redis(request):
+    """FakeRedis; у unittest-класах — self.redis."""
+    return _bind(request, "redis", FakeRedis())
+
+
+@pytest.fixture
+def app_db(request, tmp_path):
+    """AppDatabase у tmp_path; у unittest-класах — self.app_db (start/stop — в asyncSetUp/asyncTearDown)."""
+    return _bind(request, "app_db", AppDatabase(tmp_path / "app.db"))
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Ліміт SQL-запитів на блок коду:
+
+        with query_budget("GET /api/contacts/{contact_id} (cache hit)", 0):
+            await client.get("/api/contacts/1")
+
+    Рахуються виконання курсора на всіх engine'ах. Якщо їх більше за ліміт,
+    тест падає зі списком виконаних запитів.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    @contextmanager
+    def budget(name: str, limit: int):
+        start = len(statements)
+        yield
+        executed = statements[start:]
+        if len(executed) > limit:
+            listing = "\n\n".join(f"{i}. {sql.strip()}" for i, sql in enumerate(executed, 1))
+            pytest.fail(f"{name}: {len(executed)} SQL queries, budget is {limit}\n\n{listing}", pytrace=False)
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        yield budget
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.auth import AuthService, auth_service, dump_user_snapshot, load_user_snapshot
+from app.main import app
+from app.models import User
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.service = AuthService(redis_client=MagicMock())
+        self.service.redis_client.get = AsyncMock(return_value=None)
+        self.service.redis_client.set = AsyncMock()
+        self.service.decode_token = AsyncMock(return_value="test@example.com")
+
+        self.user = User(id=1, email="test@example.com", hashed_password="hash", confirmed=True, avatar=None)
+
+    def test_snapshot_roundtrip_skips_password(self):
+        raw = dump_user_snapshot(self.user)
+
+        self.assertNotIn(b"hashed_password", raw)
+        self.assertNotIn(b'"hash"', raw)
+        self.assertEqual(
+            load_user_snapshot(raw),
+            {"id": 1, "email": "test@example.com", "confirmed": True, "avatar": None, "avatar_hash": None},
+        )
+
+    def test_unknown_snapshot_version_is_a_miss(self):
+        self.assertIsNone(load_user_snapshot(b'{"v":0,"id":1}'))
+        self.assertIsNone(load_user_snapshot(b"\x80\x04legacy-pickle"))
+
+    async def test_second_call_served_from_local_cache(self):
+        with patch("app.crud.get_user_by_email", new_callable=AsyncMock, return_value=self.user) as get_user:
+            first = await self.service.get_current_user(token="t", db=MagicMock())
+            second = await self.service.get_current_user(token="t", db=MagicMock())
+
+        get_user.assert_called_once()
+        self.service.redis_client.get.assert_called_once()
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.email, "test@example.com")
+
+    async def test_redis_timeout_falls_back_to_db(self):
+        self.service.redis_client.get.side_effect = RedisTimeoutError("Timeout reading from socket")
+        self.service.redis_client.set.side_effect = RedisTimeoutError("Timeout reading from socket")
+
+        with patch("app.crud.get_user_by_email", new_callable=AsyncMock, return_value=self.user) as get_user:
+            user = await self.service.get_current_user(token="t", db=MagicMock())
+
+        get_user.assert_called_once()
+        self.assertEqual(user.email, "test@example.com")
+
+
+
+@pytest.mark.usefixtures("app_db")
+class TestUserCacheInvalidation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start(User(id=2, email="new@example.com", hashed_password="x", confirmed=False))
+
+    async def asyncTearDown(self):
+        await self.app_db.stop()
+
+    async def test_confirming_email_invalidates_cached_user(self):
+        token = auth_service.create_email_token({"sub": "new@example.com"})
+
+        with patch.object(auth_service, "invalidate_user", AsyncMock()) as invalidate:
+            async with AsyncClient(app=app, base_url="http://test") as ac:
+                response = await ac.get(f"/api/auth/confirmed_email/{token}")
+
+        self.assertEqual(response.json(), {"message": "Email confirmed"})
+        invalidate.assert_awaited_once_with("new@example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
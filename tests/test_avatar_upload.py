@@ -0,0 +1,185 @@
+import unittest
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI, Request
+from httpx import AsyncClient
+from PIL import Image
+from sqlalchemy import select
+
+from app.auth import auth_service
+from app.config import settings
+from app.main import app
+from app.middleware import BodySizeLimitMiddleware
+from app.models import User
+from app.services.avatars import AVATAR_SIZES, LocalAvatarStorage, avatar_key, content_hash, get_avatar_storage
+
+
+class RecordingStorage(LocalAvatarStorage):
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.saved = []
+
+    def save(self, key, variants):
+        self.saved.append(key)
+        super().save(key, variants)
+
+
+def make_png(width=600, height=400) -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.mark.usefixtures("app_db")
+class TestAvatarUpload(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start()
+        self.user = self.app_db.user
+        self.factory = self.app_db.session_factory
+        self.storage = RecordingStorage(self.app_db.path.with_name("media"))
+        self.storage.configure()
+        app.dependency_overrides[get_avatar_storage] = lambda: self.storage
+        self.invalidate = patch.object(auth_service, "invalidate_user", AsyncMock())
+        self.invalidate.start()
+
+    async def asyncTearDown(self):
+        self.invalidate.stop()
+        await self.app_db.stop()
+
+    async def upload(self, data: bytes):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            return await ac.patch("/api/auth/avatar", files={"file": ("a.png", data, "image/png")})
+
+    async def stored_user(self) -> User:
+        async with self.factory() as session:
+            return (await session.execute(select(User).where(User.id == 1))).scalar_one()
+
+    async def set_avatar(self, value):
+        async with self.factory() as session:
+            user = await session.get(User, 1)
+            user.avatar = value
+            await session.commit()
+
+    async def test_variants_stored_under_content_key(self):
+        data = make_png()
+
+        response = await self.upload(data)
+
+        self.assertEqual(response.status_code, 200)
+        key = avatar_key(1, content_hash(data))
+        self.assertEqual(self.storage.saved, [key])
+        for size in AVATAR_SIZES:
+            with Image.open(self.storage.path(key, size)) as img:
+                self.assertEqual((img.format, img.size), ("WEBP", (size, size)))
+        user = await self.stored_user()
+        self.assertEqual(user.avatar, key)
+        self.assertEqual(user.avatar_hash, content_hash(data))
+
+    async def test_previous_avatar_is_deleted(self):
+        first = make_png()
+        await self.upload(first)
+        self.user.avatar = avatar_key(1, content_hash(first))
+        self.user.avatar_hash = content_hash(first)
+
+        await self.upload(make_png(300, 300))
+
+        self.assertFalse(self.storage.path(self.user.avatar, 250).exists())
+
+    async def test_unchanged_avatar_is_not_uploaded_again(self):
+        data = make_png()
+        self.user.avatar = avatar_key(1, content_hash(data))
+        self.user.avatar_hash = content_hash(data)
+
+        response = await self.upload(data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.storage.saved, [])
+
+    async def test_oversized_file_is_rejected(self):
+        with patch.object(settings, "avatar_max_bytes", 100):
+            response = await self.upload(make_png())
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.storage.saved, [])
+
+    async def test_not_an_image_is_rejected(self):
+        response = await self.upload(b"definitely not an image")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.storage.saved, [])
+
+    async def test_avatar_served_with_etag_and_cache_headers(self):
+        await self.upload(make_png())
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/api/users/1/avatar", params={"size": 64})
+            etag = response.headers["etag"]
+            revalidated = await ac.get("/api/users/1/avatar", params={"size": 64}, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/webp")
+        self.assertIn("max-age=", response.headers["cache-control"])
+        self.assertFalse(etag.startswith("W/"))
+        with Image.open(BytesIO(response.content)) as img:
+            self.assertEqual(img.size, (64, 64))
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b"")
+        self.assertEqual(revalidated.headers["etag"], etag)
+
+    async def test_legacy_url_avatar_redirects(self):
+        await self.set_avatar("https://res.cloudinary.com/demo/image/upload/old.png")
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.get("/api/users/1/avatar")
+
+        self.assertEqual(response.status_code, 307)
+        self.assertEqual(response.headers["location"], "https://res.cloudinary.com/demo/image/upload/old.png")
+
+    async def test_missing_avatar_and_bad_size(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            missing = await ac.get("/api/users/1/avatar")
+            unknown_user = await ac.get("/api/users/2/avatar")
+            bad_size = await ac.get("/api/users/1/avatar", params={"size": 999})
+
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(unknown_user.status_code, 404)
+        self.assertEqual(bad_size.status_code, 400)
+
+
+class TestBodySizeLimitMiddleware(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        inner = FastAPI()
+
+        @inner.post("/limited")
+        @inner.post("/open")
+        async def echo(request: Request):
+            return {"size": len(await request.body())}
+
+        self.app = BodySizeLimitMiddleware(inner, limits={"/limited": 10})
+
+    async def test_declared_length_over_limit(self):
+        async with AsyncClient(app=self.app, base_url="http://test") as ac:
+            response = await ac.post("/limited", content=b"x" * 11)
+
+        self.assertEqual(response.status_code, 413)
+
+    async def test_streamed_body_over_limit(self):
+        async def chunks():
+            for _ in range(4):
+                yield b"xxxx"
+
+        async with AsyncClient(app=self.app, base_url="http://test") as ac:
+            response = await ac.post("/limited", content=chunks())
+
+        self.assertEqual(response.status_code, 413)
+
+    async def test_other_paths_are_not_limited(self):
+        async with AsyncClient(app=self.app, base_url="http://test") as ac:
+            response = await ac.post("/open", content=b"x" * 100)
+
+        self.assertEqual(response.json(), {"size": 100})
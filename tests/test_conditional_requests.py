@@ -0,0 +1,95 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app import crud
+from app.main import app
+from app.models import Contact
+from app.services.cache import ContactsCache
+
+
+
+
+@pytest.mark.usefixtures("fake_redis", "app_db")
+class TestConditionalRequests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start(Contact(
+            id=1, first_name="John", last_name="Doe", email="john@example.com",
+            phone="123", birthday=date(1990, 1, 1), user_id=1,
+        ))
+        cache = ContactsCache(self.redis, ttl=60, max_entry_bytes=64 * 1024)
+        self.patches = [
+            patch("app.router_contacts.contacts_cache", cache),
+            patch("app.crud.contacts_cache", cache),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+        await self.app_db.stop()
+
+    async def test_list_not_modified_skips_query(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            first = await ac.get("/api/contacts/")
+            etag = first.headers["etag"]
+            with patch.object(crud, "get_contacts", wraps=crud.get_contacts) as get_contacts:
+                cached = await ac.get("/api/contacts/", headers={"If-None-Match": etag})
+            await ac.put("/api/contacts/1", json={"last_name": "Updated"})
+            changed = await ac.get("/api/contacts/", headers={"If-None-Match": etag})
+
+        self.assertTrue(etag.startswith("W/"))
+        self.assertEqual(cached.status_code, 304)
+        get_contacts.assert_not_called()
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(changed.json()[0]["last_name"], "Updated")
+
+    async def test_single_contact_etag_follows_row_version(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            first = await ac.get("/api/contacts/1")
+            with patch.object(crud, "get_contact", wraps=crud.get_contact) as get_contact:
+                cached = await ac.get("/api/contacts/1", headers={"If-None-Match": first.headers["etag"]})
+            updated = await ac.put("/api/contacts/1", json={"first_name": "Jane"})
+
+        self.assertEqual(first.headers["etag"], '"1.1"')
+        self.assertEqual(cached.status_code, 304)
+        get_contact.assert_not_called()
+        self.assertEqual(updated.headers["etag"], '"1.2"')
+
+    async def test_if_match_rejects_lost_update(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            await ac.put("/api/contacts/1", json={"first_name": "Jane"}, headers={"If-Match": '"1.1"'})
+            stale = await ac.put("/api/contacts/1", json={"first_name": "Jim"}, headers={"If-Match": '"1.1"'})
+            stale_delete = await ac.delete("/api/contacts/1", headers={"If-Match": '"1.1"'})
+            current = await ac.get("/api/contacts/1")
+
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(stale_delete.status_code, 412)
+        self.assertEqual(current.json()["first_name"], "Jane")
+        self.assertEqual(current.headers["etag"], '"1.2"')
+
+    async def test_if_match_for_other_contact_fails_without_query(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            with patch.object(crud, "delete_contact", wraps=crud.delete_contact) as delete_contact:
+                response = await ac.delete("/api/contacts/1", headers={"If-Match": '"2.1", W/"1.1"'})
+
+        self.assertEqual(response.status_code, 412)
+        delete_contact.assert_not_called()
+
+    async def test_if_match_on_missing_contact_is_404(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            response = await ac.put("/api/contacts/99", json={"first_name": "X"}, headers={"If-Match": '"99.1"'})
+            matching = await ac.delete("/api/contacts/1", headers={"If-Match": '"1.1"'})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(matching.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.cache import ContactsCache, RecentWrites
+from app.services.metrics import store as metrics_store
+
+
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = ContactsCache(self.redis, ttl=60, max_entry_bytes=1024)
+
+    async def test_hit_after_miss(self):
+        loader = AsyncMock(return_value=[{"id": 1}])
+        before = dict(metrics_store.contacts_cache)
+
+        first = await self.cache.fetch(1, "list", {"skip": 0}, loader)
+        second = await self.cache.fetch(1, "list", {"skip": 0}, loader)
+
+        self.assertEqual(first, second)
+        loader.assert_called_once()
+        self.assertEqual(metrics_store.contacts_cache["hit"], before["hit"] + 1)
+        self.assertEqual(metrics_store.contacts_cache["miss"], before["miss"] + 1)
+
+    async def test_bump_invalidates_only_that_user(self):
+        loader = AsyncMock(return_value=[])
+        await self.cache.fetch(1, "list", {}, loader)
+        await self.cache.fetch(2, "list", {}, loader)
+
+        await self.cache.bump(1)
+        await self.cache.fetch(1, "list", {}, loader)
+        await self.cache.fetch(2, "list", {}, loader)
+
+        self.assertEqual(loader.call_count, 3)
+
+    async def test_oversized_entries_are_not_stored(self):
+        loader = AsyncMock(return_value="x" * 2048)
+
+        await self.cache.fetch(1, "list", {}, loader)
+
+        self.assertEqual([key for key in self.redis.data if not key.startswith("contacts:ver:")], [])
+
+    async def test_version_starts_from_epoch_and_moves_on_bump(self):
+        first = await self.cache.version(1)
+        await self.cache.bump(1)
+
+        self.assertGreater(first, 1_000_000)
+        self.assertEqual(await self.cache.version(1), first + 1)
+        self.assertNotEqual(
+            self.cache.list_etag(1, first, "list", {"skip": 0}),
+            self.cache.list_etag(1, first + 1, "list", {"skip": 0}),
+        )
+
+    async def test_version_is_one_round_trip(self):
+        await self.cache.version(1)
+        await self.cache.version(1)
+
+        self.assertEqual(self.redis.executed, 2)
+
+    async def test_bump_with_recent_write_mark_is_one_round_trip(self):
+        recent_writes = RecentWrites(self.redis, window=60)
+
+        await self.cache.bump(1, recent_writes)
+
+        self.assertEqual(self.redis.executed, 1)
+        self.assertEqual(self.redis.data[RecentWrites.key(1)], b"1")
+        self.assertIn(ContactsCache.version_key(1), self.redis.data)
+        self.assertTrue(await recent_writes.is_recent(1))
+
+    async def test_redis_errors_fall_back_to_loader(self):
+        self.redis.get = AsyncMock(side_effect=RedisConnectionError("down"))
+        loader = AsyncMock(return_value=None)
+
+        self.assertIsNone(await self.cache.fetch(1, "contact", {"id": 5}, loader))
+        loader.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import json
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import crud
+from app.config import settings
+from app.models import Contact
+from app.services.contacts_io import BadLine, export_contacts, import_contacts, iter_lines, iter_records
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+
+class TestContactsImportParsing(unittest.IsolatedAsyncioTestCase):
+
+    async def test_lines_split_across_chunks(self):
+        lines = await collect(iter_lines(chunks(b"first\r\nsec", "ond\nтре".encode(), "тій".encode())))
+
+        self.assertEqual(lines, ["first", "second", "третій"])
+
+    async def test_bom_is_stripped_only_from_first_line(self):
+        lines = await collect(iter_lines(chunks("\ufeffa\n\ufeffb".encode())))
+
+        self.assertEqual(lines, ["a", "\ufeffb"])
+
+    async def test_long_lines_are_not_buffered(self):
+        stream = chunks(b"short\n", b"x" * 8, b"x" * 8, b"x" * 8, b"\nnext\n", b"y" * 20)
+
+        lines = await collect(iter_lines(stream, max_line_bytes=10))
+
+        self.assertEqual(lines, ["short", BadLine("Line is too long"), "next", BadLine("Line is too long")])
+
+    async def test_invalid_utf8_is_a_bad_line(self):
+        lines = await collect(iter_lines(chunks(b"ok\n", b"\xff\xfe bad\n", "далі".encode())))
+
+        self.assertEqual(lines, ["ok", BadLine("Invalid UTF-8 at byte 0"), "далі"])
+
+    async def test_long_line_is_a_row_error(self):
+        lines = chunks(b'{"first_name": "A"}\n', b"x" * 100, b'\n{"first_name": "B"}\n')
+
+        records = await collect(iter_records(iter_lines(lines, max_line_bytes=50), "ndjson"))
+
+        self.assertEqual(records, [(1, {"first_name": "A"}), (2, "Line is too long"), (3, {"first_name": "B"})])
+
+    async def test_csv_records(self):
+        lines = chunks(b"first_name,last_name,email\nJohn,Doe,\nbroken\n")
+
+        records = await collect(iter_records(iter_lines(lines), "csv"))
+
+        self.assertEqual(records[0], (1, {"first_name": "John", "last_name": "Doe", "email": None}))
+        self.assertEqual(records[1], (2, "Expected 3 columns, got 1"))
+
+    async def test_ndjson_records(self):
+        lines = chunks(b'{"first_name": "John"}\n\n[1]\n')
+
+        records = await collect(iter_records(iter_lines(lines), "ndjson"))
+
+        self.assertEqual(records, [(1, {"first_name": "John"}), (2, "Expected a JSON object")])
+
+    async def test_export_streams_one_chunk_per_batch(self):
+        async def fake_rows(db, user):
+            yield [(1, "John", "Doe", "j@d.com", "1", date(2000, 1, 1), None)]
+            yield [(2, "Jane", "Roe", "j@r.com", "2", date(2001, 2, 3), "note")]
+
+        with patch("app.crud.stream_contact_rows", fake_rows):
+            csv_chunks = await collect(export_contacts(MagicMock(), "csv", MagicMock()))
+            ndjson_chunks = await collect(export_contacts(MagicMock(), "ndjson", MagicMock()))
+
+        self.assertEqual(len(csv_chunks), 2)
+        self.assertTrue(csv_chunks[0].startswith(b"id,first_name,last_name"))
+        self.assertEqual(csv_chunks[1], b"2,Jane,Roe,j@r.com,2,2001-02-03,note\n")
+        self.assertEqual(
+            ndjson_chunks[0],
+            b'{"id":1,"first_name":"John","last_name":"Doe","email":"j@d.com","phone":"1",'
+            b'"birthday":"2000-01-01","additional_data":null}\n',
+        )
+
+
+def ndjson(*contacts) -> bytes:
+    return "".join(json.dumps(c) + "\n" for c in contacts).encode()
+
+
+def contact(i, **changes):
+    return {
+        "first_name": f"Name{i}", "last_name": "Doe", "email": f"c{i}@example.com",
+        "phone": f"{i}", "birthday": "1990-01-01", **changes,
+    }
+
+
+@pytest.mark.usefixtures("app_db")
+class TestImportContacts(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start(Contact(
+            first_name="Existing", last_name="Doe", email="old@example.com", phone="100",
+            birthday=date(1990, 1, 1), user_id=1,
+        ))
+        self.settings = patch.multiple(
+            settings, contacts_import_batch_size=2, contacts_import_max_errors=2, contacts_import_max_line_bytes=1024,
+        )
+        self.settings.start()
+
+    async def asyncTearDown(self):
+        self.settings.stop()
+        await self.app_db.stop()
+
+    async def run_import(self, body: bytes):
+        async with self.app_db.session_factory() as db:
+            return await import_contacts(db, chunks(body), "ndjson", self.app_db.user)
+
+    async def test_duplicates_in_file_and_in_db(self):
+        body = ndjson(
+            contact(1),
+            contact(2, email="c1@example.com"),  # дублікат у тій самій пачці
+            contact(3, email="old@example.com"),  # уже є в БД
+            contact(4, phone="1"),  # дублікат рядка 1 з попередньої пачки
+            contact(5),
+        )
+
+        report = await self.run_import(body)
+
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([e.row for e in report.errors], [2, 3])
+        self.assertEqual(report.failed, 3)
+        self.assertTrue(report.errors_truncated)
+
+    async def test_batches_are_flushed_at_batch_size(self):
+        body = ndjson(*(contact(i) for i in range(1, 6)))
+
+        with patch.object(crud, "bulk_create_contacts", wraps=crud.bulk_create_contacts) as bulk_create:
+            report = await self.run_import(body)
+
+        self.assertEqual(report.imported, 5)
+        self.assertEqual([len(call.args[1]) for call in bulk_create.call_args_list], [2, 2, 1])
+
+    async def test_invalid_utf8_row_does_not_abort_import(self):
+        body = ndjson(contact(1)) + b'{"first_name": "\xff"}\n' + ndjson(contact(3))
+
+        report = await self.run_import(body)
+
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([(e.row, e.error) for e in report.errors], [(2, "Invalid UTF-8 at byte 16")])
+
+    async def test_errors_are_truncated_at_max_errors(self):
+        body = ndjson(contact(1, email="broken"), contact(2, phone=None), contact(3, email="nope"), contact(4))
+
+        report = await self.run_import(body + b"x" * 2000 + b"\n")
+
+        self.assertEqual(report.imported, 1)
+        self.assertEqual(report.failed, 4)
+        self.assertEqual([e.row for e in report.errors], [1, 2])
+        self.assertTrue(report.errors_truncated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,16 @@
 import unittest
-from unittest.mock import AsyncMock, MagicMock
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud
-from app.schemas import ContactCreate
+from app.config import settings
+from app.main import app
+from app.schemas import ContactCreate, ContactBulkUpdate, ContactSelector
 from app.models import User, Contact
 
 
@@ -32,12 +38,15 @@ class TestContactsCRUD(unittest.IsolatedAsyncioTestCase):
             user_id=self.user.id
         )
 
-        self.session.refresh = AsyncMock(return_value=None)
+        mock_result = MagicMock()
+        mock_result.scalar_one.return_value = mock_contact
+        self.session.execute = AsyncMock(return_value=mock_result)
 
         self.session.commit = AsyncMock()
 
         result = await crud.create_contact(self.session, self.contact_data, self.user)
 
+        self.session.execute.assert_called_once()
         self.session.commit.assert_called_once()
 
         self.assertEqual(result.email, "contact@example.com")
@@ -51,7 +60,7 @@ class TestContactsCRUD(unittest.IsolatedAsyncioTestCase):
         ]
 
         mock_result = MagicMock()
-        mock_result.scalars.return_value.all = AsyncMock(return_value=contacts)
+        mock_result.scalars.return_value.all.return_value = contacts
         self.session.execute = AsyncMock(return_value=mock_result)
 
         result = await crud.get_contacts(self.session, user=self.user, skip=0, limit=10)
@@ -59,6 +68,100 @@ class TestContactsCRUD(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0].email, "a@a.com")
 
+    async def test_search_contacts_sqlite_fallback(self):
+        self.session.get_bind.return_value.dialect.name = "sqlite"
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = []
+        self.session.execute = AsyncMock(return_value=mock_result)
+
+        await crud.search_contacts(self.session, query="jo", user=self.user, limit=5)
+
+        sql = str(self.session.execute.call_args.args[0])
+        self.assertNotIn("similarity", sql)
+        self.assertIn("LIMIT", sql)
+
+    def test_birthday_key_synced_on_assignment(self):
+        contact = Contact(**self.contact_data.model_dump(), user_id=self.user.id)
+        self.assertEqual(contact.birthday_key, 101)
+
+        contact.birthday = date(1992, 2, 29)
+        self.assertEqual(contact.birthday_key, 229)
+
+    async def test_bulk_update_is_single_scoped_statement(self):
+        self.session.get_bind.return_value.dialect.name = "sqlite"
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = [4, 5]
+        self.session.execute = AsyncMock(return_value=mock_result)
+        self.session.commit = AsyncMock()
+        body = ContactBulkUpdate(ids=[4, 5, 6], changes={"birthday": "1990-05-05"})
+
+        ids = await crud.bulk_update_contacts(self.session, body, body.changes, self.user)
+
+        self.assertEqual(ids, [4, 5])
+        self.session.execute.assert_called_once()
+        self.session.commit.assert_called_once()
+        params = self.session.execute.call_args.args[0].compile().params
+        self.assertEqual(params["birthday_key"], 505)
+        self.assertEqual(params["user_id_1"], self.user.id)
+
+    def test_cursor_roundtrip(self):
+        cursor = crud.encode_cursor("Шевченко", "Тарас", 42)
+
+        self.assertEqual(crud.decode_cursor(cursor), ("Шевченко", "Тарас", 42))
+
+    def test_decode_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            crud.decode_cursor("not-a-cursor")
+
+
+@pytest.mark.usefixtures("app_db")
+class TestBulkByFilterLimit(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start(*(
+            Contact(id=i, first_name=f"N{i}", last_name="Doe", email=f"n{i}@example.com",
+                    phone=str(i), birthday=date(1990, 1, i), user_id=1)
+            for i in range(1, 4)
+        ))
+        self.changed = patch("app.crud._contacts_changed", AsyncMock())
+        self.changed.start()
+
+    async def asyncTearDown(self):
+        self.changed.stop()
+        await self.app_db.stop()
+
+    async def _count(self, **where):
+        async with self.app_db.session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(Contact).filter_by(**where))
+
+    async def test_update_over_limit_changes_nothing(self):
+        body = ContactBulkUpdate(filter={"last_name": "Doe"}, changes={"first_name": "Jane"})
+
+        async with self.app_db.session_factory() as session:
+            with self.assertRaises(ValueError):
+                await crud.bulk_update_contacts(session, body, body.changes, self.app_db.user, max_rows=2)
+            ids = await crud.bulk_update_contacts(session, body, body.changes, self.app_db.user, max_rows=3)
+
+        self.assertEqual(sorted(ids), [1, 2, 3])
+        self.assertEqual(await self._count(first_name="Jane"), 3)
+
+    async def test_delete_over_limit_changes_nothing(self):
+        async with self.app_db.session_factory() as session:
+            with self.assertRaises(ValueError):
+                await crud.bulk_delete_contacts(
+                    session, ContactSelector(filter={"last_name": "Doe"}), self.app_db.user, max_rows=2,
+                )
+
+        self.assertEqual(await self._count(), 3)
+
+    async def test_router_returns_422_past_limit(self):
+        with patch.object(settings, "contacts_bulk_max_rows", 2):
+            async with AsyncClient(app=app, base_url="http://test") as ac:
+                response = await ac.request("DELETE", "/api/contacts/bulk", json={"filter": {"last_name": "Doe"}})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(await self._count(), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.models import Contact
+
+
+@pytest.mark.usefixtures("app_db")
+class TestFastSerialization(unittest.IsolatedAsyncioTestCase):
+    """Швидкий шлях має віддавати ту саму відповідь, що й звичайний."""
+
+    async def asyncSetUp(self):
+        soon = date.today() + timedelta(days=1)
+        await self.app_db.start(*(
+            Contact(
+                first_name=f"Name{i}", last_name="Doe", email=f"c{i}@example.com", phone=f"{i}",
+                birthday=soon.replace(year=1990), additional_data="note" if i % 2 else None, user_id=1,
+            )
+            for i in range(5)
+        ))
+
+    async def asyncTearDown(self):
+        await self.app_db.stop()
+
+    async def get_both(self, url, **params):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            standard = await ac.get(url, params=params)
+            with patch.object(settings, "contacts_fast_serialization", True):
+                fast = await ac.get(url, params=params)
+        return standard, fast
+
+    async def test_list_matches_standard_path(self):
+        standard, fast = await self.get_both("/api/contacts/", limit=3)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.headers["content-type"], "application/json")
+        self.assertEqual(fast.json(), standard.json())
+        self.assertEqual(len(fast.json()), 3)
+        self.assertEqual(fast.headers["x-next-cursor"], standard.headers["x-next-cursor"])
+
+    async def test_search_and_birthdays_match_standard_path(self):
+        for url, params in (("/api/contacts/search", {"query": "Name"}), ("/api/contacts/birthdays", {"days": 7})):
+            standard, fast = await self.get_both(url, **params)
+
+            self.assertEqual(fast.json(), standard.json())
+            self.assertEqual(len(fast.json()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.services.hashing import PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(CryptContext(schemes=["plaintext"]), workers=1, max_queue=1)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("secret123")
+
+        self.assertTrue(await self.hasher.verify("secret123", hashed))
+        self.assertFalse(await self.hasher.verify("wrong", hashed))
+        self.assertEqual(self.hasher.stats.completed, 3)
+
+    async def test_rejects_when_queue_is_full(self):
+        semaphore = self.hasher._get_semaphore()
+        await semaphore.acquire()
+        waiter = asyncio.create_task(self.hasher.hash("queued"))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HTTPException) as ctx:
+            await self.hasher.hash("rejected")
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(self.hasher.stats.rejected, 1)
+        semaphore.release()
+        self.assertEqual(await waiter, "queued")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import asyncio
+import email
+import json
+import socket
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.email import DEAD_LETTER_KEY, OUTBOX_KEY, RETRY_KEY, build_job
+from app.services.mail_worker import WORKERS_KEY, MailTemplates, MailWorker, SMTPPool
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+
+
+
+class Collector:
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def confirmation_job(recipient="user@example.com"):
+    return build_job(
+        recipient,
+        "Confirm your email",
+        "email_template.html",
+        {"host": "http://test/", "username": "<b>user</b>", "token": "tok123"},
+    )
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestMailWorker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = Collector()
+        self.controller = aiosmtpd_controller.Controller(self.handler, hostname="127.0.0.1", port=free_port())
+        self.controller.start()
+        self.templates = MailTemplates()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def make_worker(self, port=None, max_attempts=3, worker_id="test", heartbeat_ttl=30):
+        smtp = SMTPPool(size=1, hostname="127.0.0.1", port=port or self.controller.port, use_tls=False)
+        return MailWorker(
+            self.redis, smtp, self.templates, worker_id,
+            batch_size=10, max_attempts=max_attempts, sender="noreply@example.com", heartbeat_ttl=heartbeat_ttl,
+        )
+
+    async def test_batch_is_sent_over_one_connection(self):
+        for i in range(3):
+            await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job(f"user{i}@example.com")))
+        worker = self.make_worker()
+
+        sent = await worker.run_once()
+        await worker.smtp.close()
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(self.handler.messages), 3)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertNotIn(OUTBOX_KEY, self.redis.lists)
+        self.assertNotIn(worker.processing_key, self.redis.lists)
+        body = email.message_from_bytes(self.handler.messages[0].content).get_payload(decode=True).decode()
+        self.assertIn("http://test/api/auth/confirmed_email/tok123", body)
+        self.assertIn("&lt;b&gt;user&lt;/b&gt;", body)
+
+    async def test_failure_is_scheduled_for_retry(self):
+        await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job()))
+        worker = self.make_worker(port=free_port())
+
+        sent = await worker.run_once()
+
+        self.assertEqual(sent, 0)
+        (raw, due), = self.redis.zsets[RETRY_KEY].items()
+        self.assertEqual(json.loads(raw)["attempts"], 1)
+        self.assertGreater(due, time.time())
+        self.assertNotIn(worker.processing_key, self.redis.lists)
+
+        # Коли час повтору настав, задача повертається в outbox
+        self.assertEqual(await worker.promote_due_retries(now=due + 1), 1)
+        self.assertEqual(len(self.redis.lists[OUTBOX_KEY]), 1)
+
+    async def test_dead_letter_after_max_attempts(self):
+        await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job()))
+        worker = self.make_worker(port=free_port(), max_attempts=1)
+
+        await worker.run_once()
+
+        self.assertNotIn(RETRY_KEY, self.redis.zsets)
+        self.assertEqual(len(self.redis.lists[DEAD_LETTER_KEY]), 1)
+
+    async def test_unknown_template_is_dead_lettered(self):
+        job = confirmation_job()
+        job["template"] = "missing.html"
+        await self.redis.lpush(OUTBOX_KEY, json.dumps(job))
+        worker = self.make_worker()
+
+        await worker.run_once()
+
+        self.assertEqual(len(self.redis.lists[DEAD_LETTER_KEY]), 1)
+        self.assertEqual(self.handler.messages, [])
+
+    async def test_recover_requeues_unfinished_jobs(self):
+        worker = self.make_worker()
+        await self.redis.lpush(worker.processing_key, json.dumps(confirmation_job()))
+
+        self.assertEqual(await worker.recover(), 1)
+
+        self.assertEqual(await worker.run_once(), 1)
+        await worker.smtp.close()
+
+    async def test_dead_worker_jobs_are_requeued_by_another_worker(self):
+        # Контейнер перестворено: старий hostname більше не стартує
+        dead = self.make_worker(worker_id="old-host")
+        await dead.heartbeat()
+        await self.redis.lpush(dead.processing_key, json.dumps(confirmation_job()))
+        alive = self.make_worker(worker_id="new-host")
+        await alive.heartbeat()
+
+        self.assertEqual(await alive.reap_orphans(), 0)
+
+        await self.redis.delete(dead.heartbeat_key)  # TTL heartbeat минув
+        self.assertEqual(await alive.reap_orphans(), 1)
+
+        self.assertNotIn(dead.processing_key, self.redis.lists)
+        self.assertEqual(await self.redis.smembers(WORKERS_KEY), {"new-host"})
+        self.assertEqual(await alive.run_once(), 1)
+        await alive.smtp.close()
+
+    async def test_unexpected_send_error_is_retried(self):
+        await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job()))
+        await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job("other@example.com")))
+        worker = self.make_worker()
+        worker.smtp.send = AsyncMock(side_effect=[RuntimeError("boom"), None])
+
+        self.assertEqual(await worker.run_once(), 1)
+
+        self.assertEqual(len(self.redis.zsets[RETRY_KEY]), 1)
+        self.assertNotIn(worker.processing_key, self.redis.lists)
+
+    async def test_crashing_job_does_not_stop_the_batch(self):
+        for i in range(2):
+            await self.redis.lpush(OUTBOX_KEY, json.dumps(confirmation_job(f"user{i}@example.com")))
+        worker = self.make_worker()
+        deliver = worker.deliver
+        calls = 0
+
+        async def flaky(raw):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise RuntimeError("redis pipeline lost")
+            return await deliver(raw)
+
+        with patch.object(worker, "deliver", flaky):
+            self.assertEqual(await worker.run_once(), 1)
+        await worker.smtp.close()
+
+        # Задача, що впала, чекає в processing-списку на recover()
+        self.assertEqual(len(self.redis.lists[worker.processing_key]), 1)
+
+    async def test_heartbeat_runs_during_a_long_batch(self):
+        worker = self.make_worker(heartbeat_ttl=0.3)
+        stop = asyncio.Event()
+
+        async def long_batch(timeout=1.0):
+            await asyncio.sleep(0.5)
+            stop.set()
+            return 0
+
+        with patch.object(worker, "run_once", long_batch), \
+                patch.object(worker, "heartbeat", wraps=worker.heartbeat) as heartbeat:
+            await asyncio.wait_for(worker.run(stop), timeout=5)
+
+        # Початковий heartbeat плюс оновлення кожні ttl/3 під час пачки
+        self.assertGreaterEqual(heartbeat.await_count, 4)
+
+    async def test_unexpected_loop_error_does_not_kill_the_worker(self):
+        worker = self.make_worker()
+        stop = asyncio.Event()
+        results = [RuntimeError("template bug"), 0]
+
+        async def run_once(timeout=1.0):
+            result = results.pop(0)
+            if not results:
+                stop.set()
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with patch.object(worker, "run_once", run_once), patch.object(worker, "keep_alive", AsyncMock()), \
+                patch("app.services.mail_worker.asyncio.sleep", AsyncMock()) as sleep:
+            await asyncio.wait_for(worker.run(stop), timeout=5)
+
+        self.assertEqual(results, [])
+        sleep.assert_awaited_once_with(1)
@@ -0,0 +1,188 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from httpx import AsyncClient
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.auth import AuthService, dump_user_snapshot
+from app.main import app
+from app.models import Contact, User
+from app.services.metrics import (
+    MetricsStore, RequestStats, WorkerSnapshots, instrument_queries, merge, metrics_payload,
+)
+from app.services.pool_metrics import forget, instrument_engine
+
+
+def sample(name, **labels):
+    for family in text_string_to_metric_families(metrics_payload()[0].decode()):
+        for s in family.samples:
+            if s.name == name and s.labels == labels:
+                return s.value
+    return 0
+
+
+@pytest.mark.usefixtures("app_db")
+class TestRequestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        await self.app_db.start(Contact(
+            first_name="John", last_name="Doe", email="john@example.com", phone="123",
+            birthday=date(1990, 1, 1), user_id=1,
+        ))
+        instrument_queries(self.app_db.engine)
+
+    async def asyncTearDown(self):
+        await self.app_db.stop()
+
+    async def test_latency_and_queries_are_recorded_per_route_template(self):
+        route = {"method": "GET", "route": "/api/contacts/{contact_id}"}
+        before = sample("http_request_duration_seconds_count", status="200", **route)
+        queries_before = sample("http_request_db_queries_sum", **route)
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            await ac.get("/api/contacts/1")
+            await ac.get("/nowhere")
+            response = await ac.get("/metrics")
+
+        self.assertEqual(sample("http_request_duration_seconds_count", status="200", **route), before + 1)
+        self.assertGreaterEqual(sample("http_request_db_queries_sum", **route), queries_before + 1)
+        self.assertGreater(sample("http_request_db_seconds_sum", **route), 0)
+        self.assertGreaterEqual(
+            sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404"), 1,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/contacts/{contact_id}"',
+                      response.text)
+        self.assertIn("http_requests_in_progress", response.text)
+
+
+class TestUserCacheMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def test_redis_hits_and_misses_are_counted(self):
+        service = AuthService(redis_client=MagicMock())
+        service.redis_client.get = AsyncMock(side_effect=[None, dump_user_snapshot(User(id=2, email="b@example.com"))])
+        service.redis_client.set = AsyncMock()
+        service.decode_token = AsyncMock(side_effect=["a@example.com", "b@example.com"])
+        hits = sample("user_cache_redis_lookups_total", result="hit")
+        misses = sample("user_cache_redis_lookups_total", result="miss")
+
+        with patch("app.crud.get_user_by_email", new_callable=AsyncMock, return_value=User(id=1, email="a@example.com")):
+            await service.get_current_user(token="a", db=MagicMock())
+            await service.get_current_user(token="b", db=MagicMock())
+
+        self.assertEqual(sample("user_cache_redis_lookups_total", result="hit"), hits + 1)
+        self.assertEqual(sample("user_cache_redis_lookups_total", result="miss"), misses + 1)
+
+
+class TestPoolMetrics(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        instrument_engine(self.engine, "metrics-test")
+
+    async def asyncTearDown(self):
+        forget(self.engine)
+        await self.engine.dispose()
+
+    async def test_pool_counters_are_exported(self):
+        async with AsyncSession(self.engine) as session:
+            await session.execute(text("SELECT 1"))
+
+        self.assertEqual(sample("db_pool_checkouts_total", pool="metrics-test"), 1)
+        self.assertEqual(sample("db_pool_waits_total", pool="metrics-test"), 1)
+
+        forget(self.engine)
+        self.assertEqual(sample("db_pool_checkouts_total", pool="metrics-test"), 0)
+
+    async def test_stats_endpoints_are_gone(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            statuses = [(await ac.get(path)).status_code for path in ("/stats/db", "/stats/cache")]
+
+        self.assertEqual(statuses, [404, 404])
+
+    def test_gauges_of_dead_workers_are_dropped(self):
+        pool = {"size": 5, "checked_out": 2, "overflow": 0, "checkouts": 10, "timeouts": 1}
+        alive = dict(MetricsStore().snapshot(), db_pools=[["primary", pool]])
+        dead = dict(alive, pid=2 ** 22 + 1)
+
+        merged = merge([alive, dead])
+
+        self.assertEqual(merged["db_pools"]["primary"]["checked_out"], 2)
+        self.assertEqual(merged["db_pools"]["primary"]["checkouts"], 20)
+
+
+class TestSnapshots(unittest.TestCase):
+
+    def test_snapshot_is_a_copy(self):
+        store = MetricsStore()
+        store.record_request("GET", "/a", 200, 0.01, RequestStats())
+        snapshot = store.snapshot()
+
+        store.record_request("GET", "/a", 200, 0.01, RequestStats())
+        store.record_request("GET", "/b", 200, 0.01, RequestStats())
+        store.in_progress["GET"] = 1
+
+        (labels, counts, total), = snapshot["histograms"]["http_request_duration_seconds"]
+        self.assertEqual(sum(counts), 1)
+        self.assertEqual(snapshot["in_progress"], {})
+
+    def test_concurrent_writes_leave_newest_complete_file(self):
+        directory = tempfile.mkdtemp()
+        store = MetricsStore()
+        writer = WorkerSnapshots(directory, store)
+        for route in range(50):
+            store.record_request("GET", f"/{route}", 200, 0.01, RequestStats())
+        taken = [store.snapshot() for _ in range(200)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(writer.write, taken))
+
+        self.assertEqual(os.listdir(directory), [os.path.basename(writer.path)])
+        loaded, = writer.load_all()
+        self.assertEqual(loaded["seq"], taken[-1]["seq"])
+
+
+class TestMultiprocess(unittest.TestCase):
+
+    def run_python(self, code, directory):
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+        return subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+
+    def test_workers_are_aggregated(self):
+        directory = tempfile.mkdtemp()
+        record = (
+            "from app.services.metrics import RequestStats, record_request, snapshots\n"
+            "record_request('GET', '/api/contacts/', 200, 0.01, RequestStats())\n"
+            "snapshots.flush()\n"
+        )
+        self.run_python(record, directory)
+        self.run_python(record, directory)
+
+        output = self.run_python(
+            "from app.services.metrics import metrics_payload\nprint(metrics_payload()[0].decode())", directory,
+        )
+
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="/api/contacts/",status="200"} 2.0', output,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{le="0.01",method="GET",route="/api/contacts/",status="200"} 2.0',
+            output,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
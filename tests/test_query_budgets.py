@@ -0,0 +1,220 @@
+"""
+Бюджети SQL-запитів для ендпоінтів router_contacts і router_auth.
+
+Користувач береться з кешу (як get_current_user після першого запиту), тож
+бюджет — це запити самого ендпоінта. Якщо зміна додає запит (лінивий зв'язок,
+зайвий refresh()), тест впаде зі списком SQL; навмисні зміни — через BUDGETS.
+"""
+from datetime import date, timedelta
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi.routing import APIRoute
+from httpx import AsyncClient
+from PIL import Image
+from sqlalchemy import create_engine, text
+
+from app import router_auth, router_contacts
+from app.auth import auth_service, pwd_context
+from app.main import app
+from app.models import Contact, User
+from app.services.avatars import LocalAvatarStorage, avatar_key, content_hash, get_avatar_storage
+from app.services.cache import ContactsCache
+
+# (маршрут, сценарій): максимум SQL-запитів
+BUDGETS = {
+    ("POST /api/contacts/", "created"): 2,
+    ("POST /api/contacts/", "duplicate"): 1,
+    ("POST /api/contacts/import", "3 rows"): 2,
+    ("GET /api/contacts/export", ""): 1,
+    ("GET /api/contacts/", "cache miss"): 1,
+    ("GET /api/contacts/", "cache hit"): 0,
+    ("GET /api/contacts/search", "cache miss"): 1,
+    ("GET /api/contacts/search", "cache hit"): 0,
+    ("GET /api/contacts/birthdays", "cache miss"): 1,
+    ("GET /api/contacts/birthdays", "cache hit"): 0,
+    ("PATCH /api/contacts/bulk", ""): 1,
+    ("DELETE /api/contacts/bulk", ""): 1,
+    ("GET /api/contacts/{contact_id}", "cache miss"): 1,
+    ("GET /api/contacts/{contact_id}", "cache hit"): 0,
+    ("PUT /api/contacts/{contact_id}", ""): 1,
+    ("DELETE /api/contacts/{contact_id}", ""): 1,
+    ("POST /api/auth/register", ""): 3,
+    ("POST /api/auth/login", ""): 1,
+    ("GET /api/auth/refresh", ""): 1,
+    ("GET /api/auth/confirmed_email/{token}", ""): 3,
+    ("PATCH /api/auth/avatar", "new file"): 3,
+    ("PATCH /api/auth/avatar", "same file"): 0,
+    ("POST /api/auth/request_reset_password", ""): 1,
+    ("POST /api/auth/reset_password/{token}", ""): 3,
+}
+
+PASSWORD = "secret123"
+
+
+
+
+def make_png() -> bytes:
+    out = BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def current_user(app_db):
+    return app_db.user
+
+
+@pytest_asyncio.fixture
+async def client(app_db, fake_redis, tmp_path):
+    soon = date.today() + timedelta(days=1)
+    await app_db.start(
+        User(id=2, email="new@example.com", hashed_password="x", confirmed=False),
+        *(
+            Contact(
+                id=i, first_name=f"Name{i}", last_name="Doe", email=f"c{i}@example.com", phone=f"{i}",
+                birthday=soon.replace(year=1990), user_id=1,
+            )
+            for i in range(1, 6)
+        ),
+        password_hash=pwd_context.hash(PASSWORD),
+    )
+    storage = LocalAvatarStorage(f"{tmp_path}/media")
+    storage.configure()
+    app.dependency_overrides[get_avatar_storage] = lambda: storage
+    cache = ContactsCache(fake_redis, ttl=60, max_entry_bytes=64 * 1024)
+    patches = [
+        patch("app.router_contacts.contacts_cache", cache),
+        patch("app.crud.contacts_cache", cache),
+        patch.object(auth_service, "invalidate_user", AsyncMock()),
+        patch("app.router_auth.send_email", AsyncMock()),
+        patch("app.router_auth.send_reset_password_email", AsyncMock()),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            yield ac
+    finally:
+        for p in patches:
+            p.stop()
+        await app_db.stop()
+
+
+@pytest.fixture
+def within(query_budget):
+    def budget(route: str, scenario: str = ""):
+        name = f"{route} ({scenario})" if scenario else route
+        return query_budget(name, BUDGETS[route, scenario])
+    return budget
+
+
+def test_every_endpoint_has_a_budget():
+    declared = {route for route, _ in BUDGETS}
+    missing = [
+        f"{method} /api{route.path}"
+        for router in (router_contacts.router, router_auth.router)
+        for route in router.routes if isinstance(route, APIRoute)
+        for method in route.methods
+        if f"{method} /api{route.path}" not in declared
+    ]
+
+    assert not missing, f"No SQL budget declared for: {missing}"
+
+
+def test_failure_lists_offending_sql(query_budget):
+    engine = create_engine("sqlite://")
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with query_budget("GET /example", 1):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+
+    assert "GET /example: 2 SQL queries, budget is 1" in str(failure.value)
+    assert "2. SELECT 2" in str(failure.value)
+
+
+@pytest.mark.asyncio
+async def test_contact_writes(client, within):
+    contact = {"first_name": "New", "last_name": "One", "email": "new@test.com", "phone": "999", "birthday": "1990-01-01"}
+    with within("POST /api/contacts/", "created"):
+        assert (await client.post("/api/contacts/", json=contact)).status_code == 201
+    with within("POST /api/contacts/", "duplicate"):
+        assert (await client.post("/api/contacts/", json=contact)).status_code == 409
+
+    rows = "\n".join(
+        f'{{"first_name": "I{i}", "last_name": "Imp", "email": "i{i}@test.com", "phone": "7{i}", "birthday": "1990-02-0{i}"}}'
+        for i in range(1, 4)
+    )
+    with within("POST /api/contacts/import", "3 rows"):
+        response = await client.post("/api/contacts/import?format=ndjson", content=rows)
+        assert response.json()["imported"] == 3
+
+    with within("PUT /api/contacts/{contact_id}"):
+        assert (await client.put("/api/contacts/1", json={"last_name": "Updated"})).status_code == 200
+    with within("PATCH /api/contacts/bulk"):
+        response = await client.patch("/api/contacts/bulk", json={"ids": [2, 3], "changes": {"first_name": "Bulk"}})
+        assert response.json()["affected"] == 2
+    with within("DELETE /api/contacts/{contact_id}"):
+        assert (await client.delete("/api/contacts/4")).status_code == 200
+    with within("DELETE /api/contacts/bulk"):
+        response = await client.request("DELETE", "/api/contacts/bulk", json={"ids": [2, 3]})
+        assert response.json()["affected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_contact_reads(client, within):
+    for route, url in (
+            ("GET /api/contacts/", "/api/contacts/"),
+            ("GET /api/contacts/search", "/api/contacts/search?query=Name"),
+            ("GET /api/contacts/birthdays", "/api/contacts/birthdays"),
+            ("GET /api/contacts/{contact_id}", "/api/contacts/1"),
+    ):
+        with within(route, "cache miss"):
+            assert (await client.get(url)).status_code == 200
+        with within(route, "cache hit"):
+            assert (await client.get(url)).status_code == 200
+
+    with within("GET /api/contacts/export"):
+        response = await client.get("/api/contacts/export?format=csv")
+        assert response.text.count("\n") == 6
+
+
+@pytest.mark.asyncio
+async def test_auth_endpoints(client, within):
+    with within("POST /api/auth/register"):
+        response = await client.post("/api/auth/register", json={"email": "other@example.com", "password": PASSWORD})
+        assert response.status_code == 201
+    with within("POST /api/auth/login"):
+        response = await client.post("/api/auth/login", data={"username": "test@example.com", "password": PASSWORD})
+        assert response.status_code == 200
+    with within("GET /api/auth/refresh"):
+        refresh = response.json()["refresh_token"]
+        response = await client.get("/api/auth/refresh", headers={"Authorization": f"Bearer {refresh}"})
+        assert response.status_code == 200
+
+    token = auth_service.create_email_token({"sub": "new@example.com"})
+    with within("GET /api/auth/confirmed_email/{token}"):
+        assert (await client.get(f"/api/auth/confirmed_email/{token}")).json() == {"message": "Email confirmed"}
+
+    with within("POST /api/auth/request_reset_password"):
+        response = await client.post("/api/auth/request_reset_password", json={"email": "test@example.com"})
+        assert response.status_code == 202
+    token = await auth_service.create_reset_token({"sub": "test@example.com"})
+    with within("POST /api/auth/reset_password/{token}"):
+        response = await client.post(f"/api/auth/reset_password/{token}", json={"password": "changed123"})
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_avatar_upload(client, current_user, within):
+    data = make_png()
+    with within("PATCH /api/auth/avatar", "new file"):
+        assert (await client.patch("/api/auth/avatar", files={"file": ("a.png", data, "image/png")})).status_code == 200
+
+    current_user.avatar = avatar_key(current_user.id, content_hash(data))
+    current_user.avatar_hash = content_hash(data)
+    with within("PATCH /api/auth/avatar", "same file"):
+        assert (await client.patch("/api/auth/avatar", files={"file": ("a.png", data, "image/png")})).status_code == 200
@@ -0,0 +1,229 @@
+import unittest
+from unittest.mock import patch
+
+import pytest
+from fastapi import Depends, FastAPI, Form, HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from app.auth import auth_service
+from app.main import app
+from app.services.rate_limit import Limit, RateLimiter, SubjectResolver, rate_limit_dependency, rate_limiter
+
+
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestTokenBuckets(unittest.IsolatedAsyncioTestCase):
+
+    def make_limiter(self):
+        return RateLimiter(
+            self.redis,
+            default=Limit.parse("3/60"),
+            limits={"GET /": Limit.parse("off")},
+        )
+
+    def test_parse(self):
+        self.assertEqual(Limit.parse("10/60"), Limit(10, 60.0))
+        self.assertIsNone(Limit.parse("off"))
+        with self.assertRaises(ValueError):
+            Limit.parse("0/60")
+
+    def test_bucket_denies_then_refills(self):
+        limiter = self.make_limiter()
+
+        decisions = [limiter.hit("GET /api/contacts/", "user:a", now=0) for _ in range(4)]
+
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False])
+        self.assertEqual(decisions[2].remaining, 0)
+        self.assertEqual(decisions[3].retry_after, 20)
+        self.assertEqual(decisions[3].headers()["Retry-After"], "20")
+        self.assertTrue(limiter.hit("GET /api/contacts/", "user:a", now=20).allowed)
+
+    def test_subjects_and_routes_have_separate_buckets(self):
+        limiter = self.make_limiter()
+        for _ in range(3):
+            limiter.hit("GET /api/contacts/", "user:a", now=0)
+
+        self.assertFalse(limiter.hit("GET /api/contacts/", "user:a", now=0).allowed)
+        self.assertTrue(limiter.hit("GET /api/contacts/", "user:b", now=0).allowed)
+        self.assertTrue(limiter.hit("GET /api/contacts/search", "user:a", now=0).allowed)
+        self.assertIsNone(limiter.hit("GET /", "user:a", now=0))
+
+    async def test_sync_batches_usage_and_applies_shared_quota(self):
+        limiter = self.make_limiter()
+        other_worker = self.make_limiter()
+        limiter.hit("GET /api/contacts/", "user:a")
+        limiter.hit("GET /api/contacts/search", "user:a")
+        other_worker.hit("GET /api/contacts/", "user:a")
+        other_worker.hit("GET /api/contacts/", "user:a")
+
+        await other_worker.sync()
+        await limiter.sync()
+
+        self.assertEqual(self.redis.executed, 2)
+        self.assertEqual(sorted(self.redis.data.values()), [1, 3])
+        self.assertFalse(limiter.hit("GET /api/contacts/", "user:a").allowed)
+        self.assertTrue(limiter.hit("GET /api/contacts/search", "user:a").allowed)
+
+    async def test_resolver_prefers_token_subject_and_caches_it(self):
+        calls = []
+
+        def decode(token):
+            calls.append(token)
+            return "a@example.com" if token == "good" else None
+
+        resolver = SubjectResolver(decode)
+        request = lambda headers: type("R", (), {"headers": headers, "client": type("C", (), {"host": "1.2.3.4"})})()
+
+        self.assertEqual(await resolver(request({"authorization": "Bearer good"}), "GET /"), "user:a@example.com")
+        self.assertEqual(await resolver(request({"authorization": "Bearer good"}), "GET /"), "user:a@example.com")
+        self.assertEqual(await resolver(request({"authorization": "Bearer bad"}), "GET /"), "ip:1.2.3.4")
+        self.assertEqual(await resolver(request({}), "GET /"), "ip:1.2.3.4")
+        self.assertEqual(calls, ["good", "bad"])
+
+    def test_forwarded_for_is_trusted_only_from_proxies(self):
+        resolver = SubjectResolver(lambda token: None, trusted_proxies=["10.0.0.0/8"])
+        request = lambda peer, forwarded: type("R", (), {
+            "headers": {"x-forwarded-for": forwarded}, "client": type("C", (), {"host": peer}),
+        })()
+
+        self.assertEqual(resolver.client_ip(request("10.0.0.5", "1.1.1.1, 10.0.0.7")), "1.1.1.1")
+        self.assertEqual(resolver.client_ip(request("10.0.0.5", "6.6.6.6, 1.1.1.1")), "1.1.1.1")
+        self.assertEqual(resolver.client_ip(request("8.8.8.8", "1.1.1.1")), "8.8.8.8")
+        self.assertEqual(SubjectResolver(lambda token: None).client_ip(request("10.0.0.5", "1.1.1.1")), "10.0.0.5")
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestAnonymousRoutes(unittest.IsolatedAsyncioTestCase):
+    """Вхід і реєстрація рахуються по обліковому запису, а не по спільному IP за NAT/проксі."""
+
+    def setUp(self):
+        limiter = RateLimiter(
+            self.redis, default=Limit(3, 60), limits={"POST /login": Limit(1, 60), "POST /register": Limit(1, 60)},
+        )
+        resolver = SubjectResolver(
+            lambda token: None,
+            account_fields={"POST /login": "username", "POST /register": "email"},
+            account_ip_routes=["POST /login"],
+            trusted_proxies=["10.0.0.0/8"],
+        )
+        self.app = FastAPI(dependencies=[Depends(rate_limit_dependency(limiter, resolver))])
+
+        @self.app.post("/login")
+        async def login(username: str = Form(...)):
+            return {}
+
+        @self.app.post("/register")
+        async def register(body: dict):
+            return {}
+
+    def client(self, peer="10.0.0.1"):
+        transport = ASGITransport(app=self.app, client=(peer, 1234))
+        return AsyncClient(transport=transport, base_url="http://test")
+
+    async def test_accounts_behind_one_address_have_separate_buckets(self):
+        async with self.client() as ac:
+            statuses = [
+                (await ac.post("/login", data={"username": name})).status_code
+                for name in ("alice", "bob", " Alice ")
+            ]
+            register = [
+                (await ac.post("/register", json={"email": email})).status_code
+                for email in ("new@example.com", "NEW@example.com")
+            ]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(register, [200, 429])
+
+    async def test_one_client_cannot_spray_accounts(self):
+        async with self.client(peer="10.0.0.5") as ac:
+            statuses = [
+                (await ac.post("/login", data={"username": f"user{i}"}, headers={"X-Forwarded-For": "1.1.1.1"}))
+                .status_code for i in range(4)
+            ]
+            other_client = await ac.post("/login", data={"username": "user9"}, headers={"X-Forwarded-For": "2.2.2.2"})
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(other_client.status_code, 200)
+
+    async def test_others_cannot_lock_an_account_out_of_login(self):
+        async with self.client() as ac:
+            attacker = [
+                (await ac.post("/login", data={"username": "victim"}, headers={"X-Forwarded-For": "1.1.1.1"}))
+                .status_code for _ in range(2)
+            ]
+            victim = await ac.post("/login", data={"username": "victim"}, headers={"X-Forwarded-For": "2.2.2.2"})
+
+        self.assertEqual(attacker, [200, 429])
+        self.assertEqual(victim.status_code, 200)
+
+    async def test_per_ip_cap_does_not_share_the_anonymous_bucket(self):
+        async with self.client() as ac:
+            await ac.post("/login", data={"username": "alice"})
+            # Без облікового запису — bucket IP з лімітом маршруту (1), а не з лімітом per-IP (3)
+            anonymous = [(await ac.post("/login")).status_code for _ in range(2)]
+
+        self.assertEqual(anonymous, [422, 429])
+
+
+class TestRateLimitedApp(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.patches = [
+            patch.object(rate_limiter, "enabled", True),
+            patch.object(rate_limiter, "default", Limit(2, 60)),
+            patch.object(rate_limiter, "limits", {}),
+            patch.object(rate_limiter, "_buckets", {}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_headers_and_429(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            responses = [await ac.get("/") for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertEqual(responses[0].headers["ratelimit-limit"], "2")
+        self.assertEqual(responses[0].headers["ratelimit-remaining"], "1")
+        self.assertEqual(responses[0].headers["ratelimit-policy"], "2;w=60")
+        self.assertNotIn("retry-after", responses[0].headers)
+        self.assertEqual(responses[2].headers["retry-after"], "30")
+
+    async def test_limits_are_looked_up_by_full_route_template(self):
+        def unauthorized():
+            raise HTTPException(status_code=401)
+
+        limits = {"GET /api/contacts/{contact_id}": Limit(1, 60)}
+        with patch.object(rate_limiter, "limits", limits), \
+                patch.dict(app.dependency_overrides, {auth_service.get_current_user: unauthorized}):
+            async with AsyncClient(app=app, base_url="http://test") as ac:
+                first = await ac.get("/api/contacts/1")
+                other_contact = await ac.get("/api/contacts/2")
+                root = await ac.get("/")
+
+        self.assertNotEqual(first.status_code, 429)
+        self.assertEqual(first.headers["ratelimit-limit"], "1")
+        self.assertEqual(other_contact.status_code, 429)
+        self.assertEqual(root.headers["ratelimit-limit"], "2")
+
+    async def test_users_are_limited_separately(self):
+        tokens = {
+            name: await auth_service.create_access_token(data={"sub": f"{name}@example.com"})
+            for name in ("alice", "bob")
+        }
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            for _ in range(2):
+                await ac.get("/", headers={"Authorization": f"Bearer {tokens['alice']}"})
+            alice = await ac.get("/", headers={"Authorization": f"Bearer {tokens['alice']}"})
+            bob = await ac.get("/", headers={"Authorization": f"Bearer {tokens['bob']}"})
+
+        self.assertEqual(alice.status_code, 429)
+        self.assertEqual(bob.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
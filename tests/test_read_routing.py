@@ -0,0 +1,101 @@
+import unittest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import crud, database
+from app.main import app
+from app.models import Contact
+from app.services.cache import ContactsCache, RecentWrites
+
+
+@pytest.mark.usefixtures("app_db", "fake_redis")
+class TestReadReplicaRouting(unittest.IsolatedAsyncioTestCase):
+    """Два файли SQLite виступають як primary і репліка з різними даними."""
+
+    async def asyncSetUp(self):
+        self.replica_db = self.app_db.replica()
+        for db, name in ((self.app_db, "primary"), (self.replica_db, "replica")):
+            await db.start(Contact(
+                id=1, first_name=name, last_name="Doe", email="john@example.com",
+                phone="123", birthday=date(1990, 1, 1), user_id=1,
+            ))
+
+        self.recent_writes = RecentWrites(self.redis, window=60)
+        self.cache = ContactsCache(self.redis, ttl=60, max_entry_bytes=64 * 1024)
+        self.patches = [
+            patch("app.router_contacts.contacts_cache", self.cache),
+            patch("app.crud.contacts_cache", self.cache),
+            patch.object(database, "ReplicaSessionLocal", self.replica_db.session_factory),
+            patch("app.router_contacts.recent_writes", self.recent_writes),
+            patch("app.crud.recent_writes", self.recent_writes),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+        await self.replica_db.stop()
+        await self.app_db.stop()
+
+    async def test_reads_go_to_replica_until_user_writes(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            before = await ac.get("/api/contacts/1")
+            updated = await ac.put("/api/contacts/1", json={"last_name": "Updated"})
+            after = await ac.get("/api/contacts/1")
+
+        self.assertEqual(before.json()["first_name"], "replica")
+        self.assertEqual(updated.json()["first_name"], "primary")
+        self.assertEqual(after.json()["first_name"], "primary")
+        self.assertEqual(after.json()["last_name"], "Updated")
+
+    async def test_redis_failure_falls_back_to_primary(self):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            with patch.object(self.redis, "exists", AsyncMock(side_effect=RedisConnectionError("down"))):
+                response = await ac.get("/api/contacts/1")
+
+        self.assertEqual(response.json()["first_name"], "primary")
+
+    async def test_write_during_replica_read_does_not_poison_cache(self):
+        # Запис фіксується між вибором репліки в get_read_db і читанням версії кешу
+        is_recent = self.recent_writes.is_recent
+
+        async def write_after_routing(user_id):
+            recent = await is_recent(user_id)
+            if not recent:
+                await crud._contacts_changed(self.app_db.user)
+            return recent
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            with patch.object(self.recent_writes, "is_recent", write_after_routing):
+                during = await ac.get("/api/contacts/")
+            after = await ac.get("/api/contacts/")
+
+        self.assertEqual(during.json()[0]["first_name"], "replica")
+        self.assertNotIn("etag", during.headers)
+        self.assertEqual(after.json()[0]["first_name"], "primary")
+
+    async def test_read_during_invalidation_goes_to_primary(self):
+        # Читання приходить між інвалідацією кешу і поверненням відповіді на запис
+        bump = self.cache.bump
+        reads = []
+
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            async def read_after_bump(user_id, recent_writes=None):
+                await bump(user_id, recent_writes)
+                reads.append(await ac.get("/api/contacts/1"))
+
+            with patch.object(self.cache, "bump", read_after_bump):
+                await crud._contacts_changed(self.app_db.user)
+            after = await ac.get("/api/contacts/1")
+
+        self.assertEqual(reads[0].json()["first_name"], "primary")
+        self.assertEqual(after.json()["first_name"], "primary")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import pytest
+
+from app.config import Settings
+from app.services import redis_pool
+from app.services.cache import RedisCache
+from app.services.redis_pool import create_pool
+
+
+class TestPool(unittest.IsolatedAsyncioTestCase):
+
+    def test_pool_is_configured_from_settings(self):
+        settings = Settings(
+            redis_db=2, redis_max_connections=7, redis_pool_timeout=0.25,
+            redis_socket_timeout=0.1, redis_health_check_interval=10,
+        )
+
+        pool = create_pool(settings)
+
+        self.assertEqual(pool.max_connections, 7)
+        self.assertEqual(pool.timeout, 0.25)
+        self.assertEqual(pool.connection_kwargs["db"], 2)
+        self.assertEqual(pool.connection_kwargs["socket_timeout"], 0.1)
+        self.assertEqual(pool.connection_kwargs["health_check_interval"], 10)
+
+    async def test_client_is_created_once_and_dropped_on_close(self):
+        await redis_pool.close()
+
+        client = redis_pool.get_redis()
+
+        self.assertIs(redis_pool.connect(), client)
+        self.assertIs(redis_pool.get_redis(), client)
+        self.assertIs(client.connection_pool, redis_pool.pool)
+        await redis_pool.close()
+        self.assertIsNone(redis_pool.client)
+        self.assertIsNot(redis_pool.get_redis(), client)
+        await redis_pool.close()
+
+
+@pytest.mark.usefixtures("fake_redis")
+class TestRedisCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = RedisCache(self.redis)
+
+    async def test_delete_many_publishes_in_same_pipeline(self):
+        self.redis.data.update({"user:a": b"1", "user:b": b"2", "other": b"3"})
+
+        await self.cache.delete_many(["user:a", "user:b"], channel="invalidate", messages=["a", "b"])
+
+        self.assertEqual(self.redis.data, {"other": b"3"})
+        self.assertEqual(self.redis.published, [("invalidate", "a"), ("invalidate", "b")])
+        self.assertEqual(self.redis.executed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+from datetime import date
+
 import pytest
 from httpx import AsyncClient
 from unittest.mock import AsyncMock, patch
@@ -7,7 +9,7 @@ from app.models import User, Contact
 from app.auth import auth_service
 from app.database import get_db
 
-test_user = User(id=1, email="test@example.com", username="tester")
+test_user = User(id=1, email="test@example.com")
 
 
 async def override_get_current_user():
@@ -26,8 +28,10 @@ async def test_read_contacts_success(mocker):
     )
 
     mock_contacts_data = [
-        Contact(id=1, first_name="John", last_name="Doe", email="johndoe@test.com", user_id=1),
-        Contact(id=2, first_name="Jane", last_name="Smith", email="janesmith@test.com", user_id=1)
+        Contact(id=1, first_name="John", last_name="Doe", email="johndoe@test.com",
+                phone="111", birthday=date(1990, 1, 1), user_id=1),
+        Contact(id=2, first_name="Jane", last_name="Smith", email="janesmith@test.com",
+                phone="222", birthday=date(1991, 2, 2), user_id=1)
     ]
     mock_get_contacts.return_value = mock_contacts_data
 
@@ -38,7 +42,7 @@ async def test_read_contacts_success(mocker):
     data = response.json()
     assert len(data) == 2
     assert data[0]["first_name"] == "John"
-    assert "user_id" not in data[0]
+    assert data[0]["user_id"] == 1
 
     mock_get_contacts.assert_called_once()
 
@@ -57,6 +61,8 @@ async def test_create_contact_success(mocker):
         first_name="New",
         last_name="One",
         email="new@test.com",
+        phone="9876543210",
+        birthday=date(2023, 1, 1),
         user_id=1
     )
     mock_create_contact = mocker.patch(
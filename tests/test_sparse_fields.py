@@ -0,0 +1,79 @@
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app import schemas
+from app.config import settings
+from app.main import app
+from app.models import Contact
+
+
+@pytest.mark.usefixtures("app_db")
+class TestSparseFields(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        soon = date.today() + timedelta(days=1)
+        await self.app_db.start(*(
+            Contact(
+                first_name=f"Name{i}", last_name=f"Doe{i}", email=f"c{i}@example.com", phone=f"{i}",
+                birthday=soon.replace(year=1990), additional_data="long notes", user_id=1,
+            )
+            for i in range(3)
+        ))
+        self.statements = []
+        event.listen(self.app_db.engine.sync_engine, "before_cursor_execute", self.capture)
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    async def asyncTearDown(self):
+        await self.app_db.stop()
+
+    async def get(self, url, **params):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            return await ac.get(url, params=params)
+
+    async def test_list_returns_and_selects_only_requested_fields(self):
+        response = await self.get("/api/contacts/", fields="phone,id,first_name", limit=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(c) for c in response.json()], [{"id", "first_name", "phone"}] * 2)
+        self.assertIn("x-next-cursor", response.headers)
+        select_sql = next(s for s in self.statements if s.lstrip().upper().startswith("SELECT"))
+        self.assertNotIn("additional_data", select_sql)
+        self.assertNotIn("email", select_sql)
+
+    async def test_search_and_birthdays_accept_fields(self):
+        for url, params in (("/api/contacts/search", {"query": "Name"}), ("/api/contacts/birthdays", {})):
+            response = await self.get(url, fields="id,birthday", **params)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 3)
+            self.assertEqual(set(response.json()[0]), {"id", "birthday"})
+
+    async def test_fast_path_matches_validated_path(self):
+        standard = await self.get("/api/contacts/", fields="id,birthday,last_name")
+        with patch.object(settings, "contacts_fast_serialization", True):
+            fast = await self.get("/api/contacts/", fields="id,birthday,last_name")
+
+        self.assertEqual(fast.json(), standard.json())
+
+    async def test_unknown_field_is_rejected(self):
+        response = await self.get("/api/contacts/", fields="id,hashed_password")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("hashed_password", response.json()["detail"])
+
+    def test_adapter_is_built_once_per_fieldset(self):
+        fields = schemas.parse_contact_fields("phone, id")
+
+        self.assertEqual(fields, ("phone", "id"))
+        self.assertIs(schemas.contact_fields_adapter(fields), schemas.contact_fields_adapter(("phone", "id")))
+
+
+if __name__ == '__main__':
+    unittest.main()
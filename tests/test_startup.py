@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from app import database
+from app.auth import auth_service
+from app.main import app
+from app.services import redis_pool
+from app.services.cache import contacts_cache, recent_writes
+from app.services.rate_limit import rate_limiter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Створюються в lifespan або при першому використанні, а не при імпорті
+DEFERRED_MODULES = ("cloudinary", "urllib3", "asyncpg", "PIL.Image")
+
+
+class TestImport(unittest.TestCase):
+
+    def test_import_does_not_create_clients(self):
+        code = (
+            "import sys\n"
+            "import app.main\n"
+            "from app import database\n"
+            "from app.services import redis_pool\n"
+            f"print([m for m in {DEFERRED_MODULES!r} if m in sys.modules], database.engine, redis_pool.pool)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+
+        self.assertEqual(output.strip(), "[] None None")
+
+
+class TestLifespan(unittest.IsolatedAsyncioTestCase):
+
+    async def test_pools_live_for_the_lifespan(self):
+        with patch.object(auth_service, "listen_for_invalidations", AsyncMock()):
+            async with app.router.lifespan_context(app):
+                self.assertIsNotNone(database.engine)
+                self.assertIsNotNone(database.pool_metrics)
+                for service in (auth_service, rate_limiter, contacts_cache, recent_writes):
+                    self.assertIs(service.redis_client, redis_pool.client)
+                self.assertIs(auth_service.redis_cache.redis_client, redis_pool.client)
+
+        self.assertIsNone(database.engine)
+        self.assertIsNone(database.AsyncSessionLocal)
+        self.assertIsNone(redis_pool.pool)
+        self.assertIsNone(redis_pool.client)
+
+
+if __name__ == '__main__':
+    unittest.main()